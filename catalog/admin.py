@@ -1,7 +1,10 @@
-from django.contrib import admin
+import datetime
+
+from django.contrib import admin, messages
 from .models import (
     Genre, Book, Author, BookInstance, Language
     )
+from . import loans
 
 # Register your models here.
 
@@ -44,9 +47,13 @@ class BookAdmin(admin.ModelAdmin):
     referente al modelo Book dentro del panel de
     administrador
     """
-    list_display = ['title', 'author', 'display_genre']
+    list_display = ['title', 'author', 'display_genre', 'copies_available', 'copies_on_loan']
     inlines = [BookInstanceInline]
 
+    def get_queryset(self, request):
+        # author y display_genre sin una consulta por fila
+        return super().get_queryset(request).for_admin()
+
 @admin.register(BookInstance)
 class BookInstanceAdmin(admin.ModelAdmin):
     """
@@ -56,6 +63,8 @@ class BookInstanceAdmin(admin.ModelAdmin):
     """
     list_display = ["book", "status",'due_back', 'borrower', 'id']
     list_filter = ['status', 'due_back']
+    list_select_related = ['book__language', 'borrower']
+    actions = ['mark_returned', 'renew_three_weeks']
     
     fieldsets = (
         ('Info',{
@@ -67,6 +76,34 @@ class BookInstanceAdmin(admin.ModelAdmin):
     )
 
 
+    def report(self, request, result, verb):
+        """
+        Resumen de la operacion en bloque y de las filas rechazadas
+        """
+        self.message_user(request, f'{result.updated} copies {verb}.', messages.SUCCESS)
+        for pk, message in result.failures:
+            self.message_user(request, f'{pk}: {message}', messages.WARNING)
+
+    @admin.action(
+        description='Mark selected copies as returned',
+        permissions=['mark_returned'],
+    )
+    def mark_returned(self, request, queryset):
+        pks = list(queryset.values_list('pk', flat=True))
+        self.report(request, loans.bulk_return(pks), 'returned')
+
+    @admin.action(
+        description='Renew selected loans for 3 weeks',
+        permissions=['mark_returned'],
+    )
+    def renew_three_weeks(self, request, queryset):
+        pks = list(queryset.values_list('pk', flat=True))
+        due_back = datetime.date.today() + datetime.timedelta(weeks=3)
+        self.report(request, loans.bulk_renew(pks, due_back), 'renewed')
+
+    def has_mark_returned_permission(self, request):
+        return request.user.has_perm('catalog.can_mark_returned')
+
 
 admin.site.register(Language)
 admin.site.register(Genre)
@@ -0,0 +1,267 @@
+"""
+API JSON de solo lectura del catalogo.
+
+    /catalog/api/<recurso>/            lista paginada por cursor
+    /catalog/api/<recurso>/<pk>/       un objeto
+    /catalog/api/stats/                contadores del index
+                                       (catalog/async_views.py)
+
+Parametros:
+    fields=title,isbn        solo esos campos (SELECT con .only())
+    include=author,genres    relaciones embebidas, una consulta por
+                             relacion para toda la pagina (prefetch)
+    page_size=100            filas por pagina (maximo CATALOG_API_MAX_PAGE_SIZE)
+    cursor=...               token de la respuesta anterior
+
+Cada peticion hace un numero fijo de consultas: la pagina y una por
+include. No se cuenta el total.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .models import Author, Book, BookInstance, Genre, Language
+from .pagination import CursorPaginator, InvalidCursor
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class ApiError(Exception):
+    """
+    Parametro no valido: se responde 400 con el mensaje
+    """
+
+
+class Include:
+    """
+    Relacion que se puede embeber. attname es el atributo de la
+    relacion en el modelo (para el prefetch); resource, el recurso con
+    el que se serializan los objetos relacionados; requires, el campo
+    local que hace falta cargar (la fk) en las relaciones directas.
+    """
+    def __init__(self, attname, resource, many=False, requires=None):
+        self.attname = attname
+        self.resource = resource
+        self.many = many
+        self.requires = requires
+
+
+class Resource:
+    """
+    fields: {nombre publico: attname del campo local}
+    ordering: orden del cursor (la pk se añade sola)
+    filters: {parametro de la url: lookup}
+    """
+    def __init__(self, model, fields, default_fields, ordering,
+                 includes=None, filters=None):
+        self.model = model
+        self.fields = fields
+        self.default_fields = default_fields
+        self.ordering = ordering
+        self.includes = includes or {}
+        self.filters = filters or {}
+
+    def parse_fields(self, value):
+        if not value:
+            return list(self.default_fields)
+        names = [name for name in value.split(',') if name]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f'Unknown fields: {", ".join(unknown)}')
+        # El id siempre sale
+        return ['id'] + [name for name in names if name != 'id']
+
+    def parse_includes(self, value):
+        names = [name for name in (value or '').split(',') if name]
+        unknown = [name for name in names if name not in self.includes]
+        if unknown:
+            raise ApiError(f'Unknown include: {", ".join(unknown)}')
+        return list(dict.fromkeys(names))
+
+    def queryset(self, fields, includes, params):
+        """
+        Proyeccion con .only(): los campos pedidos, las claves de
+        ordenacion (para el cursor) y las fk de los includes directos
+        """
+        columns = {self.fields[name] for name in fields}
+        columns.update(
+            self.model._meta.get_field(name).attname for name in self.ordering
+        )
+        for name in includes:
+            if self.includes[name].requires:
+                columns.add(self.includes[name].requires)
+        queryset = self.model.objects.only(*columns)
+        for param, attname in self.filters.items():
+            if param in params:
+                queryset = queryset.filter(**{attname: self.to_python(attname, params[param])})
+        return queryset
+
+    def to_python(self, attname, value):
+        try:
+            return self.model._meta.get_field(attname).to_python(value)
+        except ValidationError:
+            raise ApiError(f'Invalid value for {attname}: {value}')
+
+    def prefetch(self, objs, includes):
+        """
+        Una consulta por include para todos los objetos
+        """
+        lookups = []
+        for name in includes:
+            include = self.includes[name]
+            related = RESOURCES[include.resource]
+            lookups.append(Prefetch(
+                include.attname,
+                queryset=related.model.objects.only(
+                    *{related.fields[field] for field in related.default_fields}
+                ),
+            ))
+        if lookups:
+            prefetch_related_objects(objs, *lookups)
+
+    def serialize(self, obj, fields, includes=()):
+        data = {name: getattr(obj, self.fields[name]) for name in fields}
+        for name in includes:
+            include = self.includes[name]
+            related = RESOURCES[include.resource]
+            value = getattr(obj, include.attname)
+            if include.many:
+                data[name] = [
+                    related.serialize(item, related.default_fields)
+                    for item in value.all()
+                ]
+            else:
+                data[name] = None if value is None else related.serialize(
+                    value, related.default_fields
+                )
+        return data
+
+
+RESOURCES = {
+    'books': Resource(
+        Book,
+        fields={
+            'id': 'id',
+            'title': 'title',
+            'summary': 'summary',
+            'isbn': 'isbn',
+            'author_id': 'author_id',
+            'language_id': 'language_id',
+            'copies_available': 'copies_available',
+            'copies_on_loan': 'copies_on_loan',
+            'copies_maintenance': 'copies_maintenance',
+            'copies_reserved': 'copies_reserved',
+            'next_due_back': 'next_due_back',
+            'updated_at': 'updated_at',
+        },
+        default_fields=('id', 'title', 'isbn', 'author_id', 'language_id',
+                        'copies_available', 'next_due_back'),
+        ordering=('title',),
+        includes={
+            'author': Include('author', 'authors', requires='author_id'),
+            'language': Include('language', 'languages', requires='language_id'),
+            'genres': Include('genre', 'genres', many=True),
+            'copies': Include('bookinstance_set', 'copies', many=True),
+        },
+        filters={'author': 'author_id', 'language': 'language_id'},
+    ),
+    'authors': Resource(
+        Author,
+        fields={
+            'id': 'id',
+            'first_name': 'first_name',
+            'last_name': 'last_name',
+            'date_of_birth': 'date_of_birth',
+            'date_of_death': 'date_of_death',
+            'updated_at': 'updated_at',
+        },
+        default_fields=('id', 'first_name', 'last_name'),
+        ordering=('last_name', 'first_name'),
+        includes={
+            'books': Include('book_set', 'books', many=True),
+        },
+    ),
+    'genres': Resource(
+        Genre,
+        fields={'id': 'id', 'name': 'name'},
+        default_fields=('id', 'name'),
+        ordering=('name',),
+    ),
+    'languages': Resource(
+        Language,
+        fields={'id': 'id', 'iso_code': 'iso_code', 'language': 'language'},
+        default_fields=('id', 'iso_code', 'language'),
+        ordering=('iso_code',),
+    ),
+    'copies': Resource(
+        BookInstance,
+        fields={
+            'id': 'id',
+            'book_id': 'book_id',
+            'status': 'status',
+            'due_back': 'due_back',
+            'updated_at': 'updated_at',
+        },
+        default_fields=('id', 'book_id', 'status', 'due_back'),
+        ordering=('book', 'status'),
+        includes={
+            'book': Include('book', 'books', requires='book_id'),
+        },
+        filters={'book': 'book_id', 'status': 'status'},
+    ),
+}
+
+
+def page_size(value):
+    default = getattr(settings, 'CATALOG_API_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    maximum = getattr(settings, 'CATALOG_API_MAX_PAGE_SIZE', MAX_PAGE_SIZE)
+    if not value:
+        return default
+    try:
+        size = int(value)
+    except ValueError:
+        raise ApiError('page_size must be an integer')
+    if not 1 <= size <= maximum:
+        raise ApiError(f'page_size must be between 1 and {maximum}')
+    return size
+
+
+def list_objects(resource, params):
+    """
+    (filas serializadas, cursor siguiente, cursor anterior)
+    """
+    fields = resource.parse_fields(params.get('fields'))
+    includes = resource.parse_includes(params.get('include'))
+    paginator = CursorPaginator(
+        resource.queryset(fields, includes, params),
+        page_size(params.get('page_size')),
+        resource.ordering,
+    )
+    try:
+        page = paginator.page(params.get('cursor'))
+    except InvalidCursor:
+        raise ApiError('Invalid cursor')
+    resource.prefetch(page.object_list, includes)
+    return (
+        [resource.serialize(obj, fields, includes) for obj in page.object_list],
+        page.next_cursor,
+        page.previous_cursor,
+    )
+
+
+def get_object(resource, pk, params):
+    """
+    Objeto serializado o None si no existe
+    """
+    fields = resource.parse_fields(params.get('fields'))
+    includes = resource.parse_includes(params.get('include'))
+    try:
+        pk = resource.model._meta.pk.to_python(pk)
+    except ValidationError:
+        return None
+    obj = resource.queryset(fields, includes, {}).filter(pk=pk).first()
+    if obj is None:
+        return None
+    resource.prefetch([obj], includes)
+    return resource.serialize(obj, fields, includes)
@@ -0,0 +1,230 @@
+"""
+Vistas asincronas de solo lectura del catalogo (servidas bajo ASGI).
+
+Django 3.2 no tiene ORM ni cache asincronos, asi que todo acceso a la
+bbdd pasa por db(): sync_to_async sobre un pool de hilos propio y
+acotado (CATALOG_ASYNC_DB_THREADS). Una consulta lenta ocupa un hilo
+del pool, no el worker: el bucle de eventos sigue atendiendo otras
+conexiones. La cache va por otro pool pequeño, para que una lectura
+de cache no espere detras de las consultas.
+
+Las consultas se evaluan enteras dentro del pool (list(), prefetch)
+y tambien se resuelven ahi el usuario y sus permisos. Las plantillas
+se renderizan despues en el bucle sin tocar la bbdd: si alguna
+intentara una consulta perezosa Django lanzaria
+SynchronousOnlyOperation en vez de bloquear el worker.
+
+Con WSGI tambien funcionan (Django las ejecuta con async_to_sync).
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+
+from . import fragments
+from .models import Author, Book
+from .stats import INDEX_STATS_CACHE_KEY, compute_index_stats
+from .views import (
+    VISITS_COOKIE_MAX_AGE, VISITS_COOKIE_NAME, VISITS_COOKIE_SALT,
+)
+
+DB_EXECUTOR = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'CATALOG_ASYNC_DB_THREADS', 8),
+    thread_name_prefix='catalog-db',
+)
+CACHE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'CATALOG_ASYNC_CACHE_THREADS', 4),
+    thread_name_prefix='catalog-cache',
+)
+
+# Tamaño de pagina de los listados
+PAGE_SIZE = 5
+
+
+def _in_db_thread(func, *args, **kwargs):
+    """
+    Los hilos del pool no reciben request_started/finished: se
+    cierran aqui las conexiones caducadas o rotas (CONN_MAX_AGE)
+    """
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def db(func, *args, **kwargs):
+    """
+    Ejecuta func (que usa el ORM) en el pool de la bbdd
+    """
+    return await sync_to_async(
+        _in_db_thread, thread_sensitive=False, executor=DB_EXECUTOR
+    )(func, *args, **kwargs)
+
+
+async def cache_get(key, default=None):
+    return await sync_to_async(
+        cache.get, thread_sensitive=False, executor=CACHE_EXECUTOR
+    )(key, default)
+
+
+async def cache_set(key, value, timeout):
+    return await sync_to_async(
+        cache.set, thread_sensitive=False, executor=CACHE_EXECUTOR
+    )(key, value, timeout)
+
+
+async def fragment_versions(*scopes):
+    return await sync_to_async(
+        fragments.get_versions, thread_sensitive=False, executor=CACHE_EXECUTOR
+    )(*scopes)
+
+
+async def index_stats():
+    """
+    Como stats.get_index_stats, con la cache y la bbdd asincronas
+    """
+    stats = await cache_get(INDEX_STATS_CACHE_KEY)
+    if stats is None:
+        stats = await db(compute_index_stats)
+        await cache_set(
+            INDEX_STATS_CACHE_KEY, stats,
+            getattr(settings, 'CATALOG_STATS_CACHE_TIMEOUT', 60)
+        )
+    return stats
+
+
+def _resolve_user(request):
+    """
+    Carga el usuario de la sesion y sus permisos, para que la
+    plantilla (barra lateral, perms) no consulte la bbdd
+    """
+    user = request.user
+    if user.is_authenticated:
+        user.get_all_permissions()
+    return user
+
+
+async def render(request, template_name, context):
+    await db(_resolve_user, request)
+    return HttpResponse(render_to_string(template_name, context, request))
+
+
+def _page(queryset, number, per_page):
+    """
+    Pagina ya evaluada (object_list es una lista)
+    """
+    paginator = Paginator(queryset, per_page)
+    try:
+        page = paginator.page(number or 1)
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        raise Http404('Invalid page')
+    page.object_list = list(page.object_list)
+    return page
+
+
+async def index(request):
+    stats = await index_stats()
+    try:
+        num_visits = int(request.get_signed_cookie(
+            VISITS_COOKIE_NAME, default=0, salt=VISITS_COOKIE_SALT
+        ))
+    except ValueError:
+        num_visits = 0
+    response = await render(request, 'index.html', dict(stats, num_visits=num_visits))
+    response.set_signed_cookie(
+        VISITS_COOKIE_NAME,
+        num_visits + 1,
+        salt=VISITS_COOKIE_SALT,
+        max_age=VISITS_COOKIE_MAX_AGE,
+        httponly=True,
+        samesite='Lax',
+    )
+    return response
+
+
+async def book_list(request):
+    page = await db(
+        _page, Book.objects.for_list().order_by('title', 'pk'),
+        request.GET.get('page'), PAGE_SIZE
+    )
+    return await render(request, 'books/list.html', {
+        'book_list': page.object_list,
+        'page_obj': page,
+        'paginator': page.paginator,
+        'is_paginated': page.paginator.num_pages > 1,
+    })
+
+
+async def author_list(request):
+    page = await db(
+        _page, Author.objects.order_by('last_name', 'first_name', 'pk'),
+        request.GET.get('page'), PAGE_SIZE
+    )
+    return await render(request, 'authors/list.html', {
+        'authors_list': page.object_list,
+        'page_obj': page,
+        'paginator': page.paginator,
+        'is_paginated': page.paginator.num_pages > 1,
+    })
+
+
+def _book_detail(pk):
+    book = Book.objects.for_detail().filter(pk=pk).first()
+    if book is None:
+        raise Http404('No book found')
+    return book
+
+
+async def book_detail(request, pk):
+    book = await db(_book_detail, pk)
+    version = await fragment_versions(
+        fragments.scope('book', book.pk),
+        fragments.scope('author', book.author_id),
+        fragments.GLOBAL,
+    )
+    return await render(request, 'books/detail-view.html', {
+        'book': book,
+        'object': book,
+        # Ya prefetcheadas: la plantilla no consulta
+        'copies': book.bookinstance_set.all(),
+        'fragment_timeout': fragments.timeout(),
+        'fragment_version': version,
+    })
+
+
+def _author_detail(pk):
+    author = Author.objects.for_detail().filter(pk=pk).first()
+    if author is None:
+        raise Http404('No author found')
+    return author
+
+
+async def author_detail(request, pk):
+    author = await db(_author_detail, pk)
+    version = await fragment_versions(
+        fragments.scope('author', author.pk), fragments.GLOBAL
+    )
+    return await render(request, 'authors/detail-view.html', {
+        'author': author,
+        'object': author,
+        'books': author.book_set.all(),
+        'fragment_timeout': fragments.timeout(),
+        'fragment_version': version,
+    })
+
+
+# JSON
+async def api_stats(request):
+    """
+    Contadores del index. Los libros, autores y copias se sirven con
+    la API de catalog/api.py (/catalog/api/<recurso>/)
+    """
+    return JsonResponse(await index_stats())
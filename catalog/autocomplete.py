@@ -0,0 +1,152 @@
+"""
+Indice de prefijos para el autocompletado de titulos y autores.
+
+Cada libro y autor guarda en AutocompleteEntry una fila por cada
+palabra de su texto: el texto normalizado (minusculas, sin acentos)
+a partir de esa palabra. Asi "pot" encuentra "Harry Potter" con una
+busqueda de prefijo (LIKE 'pot%') sobre el indice (kind, term), sin
+LIKE '%...%'. En PostgreSQL el indice usa varchar_pattern_ops: con
+una collation que no sea C, un indice normal no sirve para LIKE y un
+rango (term < 'pot\\uffff') podria dejarse coincidencias. SQLite
+solo usa el indice para LIKE en columnas NOCASE, asi que ahi se
+añade el rango equivalente (compara en binario, es exacto).
+
+Las filas se refrescan desde las señales de Book y Author. Lo usan
+la busqueda de la barra lateral y el selector de autor del
+formulario de libros (catalog/forms.py).
+"""
+import re
+import unicodedata
+from itertools import islice
+
+from django.db import connections
+from django.urls import reverse
+
+from .models import AutocompleteEntry, Book, Author
+
+# Palabras por objeto que generan entrada en el indice
+MAX_WORDS = 8
+
+KINDS = {
+    'book': AutocompleteEntry.BOOK,
+    'author': AutocompleteEntry.AUTHOR,
+}
+
+
+def normalize(text):
+    """
+    Minusculas, sin acentos y solo caracteres de palabra y espacios
+    """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'\w+', text.lower()))
+
+
+def terms(text):
+    """
+    Sufijos del texto normalizado que empiezan en cada palabra
+    """
+    words = normalize(text).split()
+    max_length = AutocompleteEntry._meta.get_field('term').max_length
+    return [
+        ' '.join(words[pos:])[:max_length]
+        for pos in range(min(len(words), MAX_WORDS))
+    ]
+
+
+def _label(model, obj):
+    if model is Book:
+        return obj.title
+    return f'{obj.first_name} {obj.last_name}'
+
+
+def _kind(model):
+    return AutocompleteEntry.BOOK if model is Book else AutocompleteEntry.AUTHOR
+
+
+def entries_for(model, objs):
+    kind = _kind(model)
+    max_length = AutocompleteEntry._meta.get_field('label').max_length
+    for obj in objs:
+        label = _label(model, obj)[:max_length]
+        for term in set(terms(label)):
+            yield AutocompleteEntry(
+                kind=kind, object_id=obj.pk, term=term, label=label
+            )
+
+
+def refresh(model, objs):
+    """
+    Sustituye las entradas de los objetos dados
+    """
+    objs = list(objs)
+    remove(model, [obj.pk for obj in objs])
+    AutocompleteEntry.objects.bulk_create(entries_for(model, objs))
+
+
+def remove(model, pks):
+    AutocompleteEntry.objects.filter(
+        kind=_kind(model), object_id__in=pks
+    ).delete()
+
+
+def rebuild(batch_size=1000):
+    """
+    Regenera todo el indice recorriendo libros y autores por lotes
+    """
+    AutocompleteEntry.objects.all().delete()
+    for model, fields in ((Book, ('id', 'title')),
+                          (Author, ('id', 'first_name', 'last_name'))):
+        objs = model.objects.only(*fields).order_by('pk').iterator(
+            chunk_size=batch_size
+        )
+        entries = entries_for(model, objs)
+        # bulk_create convierte su entrada en lista: se le pasan lotes
+        while True:
+            batch = list(islice(entries, batch_size))
+            if not batch:
+                break
+            AutocompleteEntry.objects.bulk_create(batch)
+
+
+def label(kind, pk):
+    """
+    Texto con el que se sugiere el objeto (None si no esta)
+    """
+    return AutocompleteEntry.objects.filter(
+        kind=KINDS[kind], object_id=pk
+    ).values_list('label', flat=True).first()
+
+
+def lookup(query, kind=None, limit=10):
+    """
+    Devuelve hasta `limit` sugerencias cuyo texto tiene una palabra
+    que empieza por la consulta. Una por objeto, por orden alfabetico.
+    """
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    entries = AutocompleteEntry.objects.filter(term__startswith=prefix)
+    if connections[entries.db].vendor == 'sqlite':
+        entries = entries.filter(term__gte=prefix, term__lt=prefix + '\uffff')
+    if kind is not None:
+        entries = entries.filter(kind=KINDS[kind])
+    results, seen = [], set()
+    # Un objeto puede coincidir por varias palabras: se pide de mas
+    rows = entries.order_by('term').values_list(
+        'kind', 'object_id', 'label'
+    )[:limit * MAX_WORDS]
+    for entry_kind, object_id, label in rows:
+        if (entry_kind, object_id) in seen:
+            continue
+        seen.add((entry_kind, object_id))
+        url_name = 'book-detail' if entry_kind == AutocompleteEntry.BOOK else 'author-detail'
+        results.append({
+            'kind': 'book' if entry_kind == AutocompleteEntry.BOOK else 'author',
+            'id': object_id,
+            'label': label,
+            'url': reverse(url_name, args=[str(object_id)]),
+        })
+        if len(results) == limit:
+            break
+    return results
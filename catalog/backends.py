@@ -0,0 +1,71 @@
+"""
+Backend de autenticacion con los permisos resueltos en cache.
+
+ModelBackend ya guarda los permisos en el objeto usuario, pero solo
+durante la peticion: cada peticion autenticada vuelve a consultar
+auth_permission con sus joins de grupos. Aqui el conjunto resuelto
+se guarda en la cache compartida, por usuario. Las señales de
+catalog/signals.py lo invalidan:
+  - cambios en los grupos o permisos de un usuario, o en el propio
+    usuario (is_active, is_superuser): se borra su entrada
+  - cambios en los permisos de un grupo, o altas y bajas de grupos y
+    permisos: se sube la generacion y caducan todas las entradas
+Solo se registra (settings.AUTHENTICATION_BACKENDS) con una cache
+compartida: con LocMemCache la invalidacion no llegaria a los demas
+workers y seguirian concediendo un permiso retirado.
+La generacion inicial sale del reloj, como las versiones de
+catalog/fragments.py, para no reutilizar entradas antiguas si se
+expulsa de la cache.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+GENERATION_KEY = 'catalog:perms-generation'
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _key(generation, user_pk):
+    return f'catalog:perms:{generation}:{user_pk}'
+
+
+def invalidate_user_permissions(user_pks):
+    generation = _generation()
+    cache.delete_many([_key(generation, pk) for pk in user_pks])
+
+
+def invalidate_all_permissions():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend que lee y guarda en cache el conjunto de permisos
+    de get_all_permissions (lo usan has_perm y el contexto `perms`)
+    """
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            key = _key(_generation(), user_obj.pk)
+            perms = cache.get(key)
+            if perms is None:
+                perms = super().get_all_permissions(user_obj, obj)
+                cache.set(
+                    key, perms,
+                    getattr(settings, 'CATALOG_PERMISSION_CACHE_TIMEOUT', 300)
+                )
+            user_obj._perm_cache = perms
+        return user_obj._perm_cache
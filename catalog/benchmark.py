@@ -0,0 +1,183 @@
+"""
+Benchmark de las vistas del catalogo con el cliente de pruebas.
+
+Cada escenario es una peticion (metodo, url, usuario) a una vista
+real: index, listados, fichas, prestamos, renovacion, informes, API
+y changelists del admin, con los ids sacados de la bbdd (pensado para
+los datos de seed_benchmark_data). Por escenario se mide:
+
+  p50_ms / p95_ms / mean_ms   latencia de las iteraciones (en caliente)
+  queries                     consultas SQL de la ultima iteracion
+  peak_memory_kb              pico de memoria Python de una peticion
+                              extra (tracemalloc, fuera de los tiempos)
+
+run() devuelve un dict listo para json.dumps; compare() lo contrasta
+con un resultado anterior para detectar regresiones.
+"""
+import datetime
+import math
+import platform
+import resource
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Author, Book, BookInstance
+
+# Bibliotecario (superusuario) que crea el benchmark si no existe
+LIBRARIAN_USERNAME = 'perf-librarian'
+
+
+def percentile(values, fraction):
+    """
+    Percentil por rango mas cercano
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def librarian():
+    user, created = User.objects.get_or_create(
+        username=LIBRARIAN_USERNAME,
+        defaults={'is_staff': True, 'is_superuser': True},
+    )
+    if created:
+        user.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+    return user
+
+
+def scenarios():
+    """
+    [(nombre, metodo, url, datos, usuario)]. Se omiten los que no
+    tienen datos en la bbdd.
+    """
+    staff = librarian()
+    book = Book.objects.order_by('pk').only('pk').first()
+    author = Author.objects.order_by('pk').only('pk').first()
+    loan = BookInstance.objects.filter(
+        status='o', borrower__isnull=False
+    ).order_by('due_back', 'pk').only('pk', 'borrower').first()
+    reader = loan.borrower if loan else staff
+    result = [
+        ('index', 'get', reverse('index'), None, None),
+        ('books', 'get', reverse('books'), None, None),
+        ('books-deep-page', 'get', reverse('books') + '?page=50', None, None),
+        ('authors', 'get', reverse('authors'), None, None),
+        ('search', 'get', reverse('search') + '?q=sombra', None, None),
+        ('autocomplete', 'get', reverse('autocomplete') + '?q=som', None, None),
+        ('my-borrowed', 'get', reverse('my-borrowed'), None, reader),
+        ('all-borrowed', 'get', reverse('all-borrowed'), None, staff),
+        ('overdue-report', 'get', reverse('overdue-report'), None, staff),
+        ('api-books', 'get', reverse('api-list', args=['books']) + '?include=author,genres', None, None),
+        ('admin-books', 'get', reverse('admin:catalog_book_changelist'), None, staff),
+        ('admin-authors', 'get', reverse('admin:catalog_author_changelist'), None, staff),
+        ('admin-copies', 'get', reverse('admin:catalog_bookinstance_changelist'), None, staff),
+    ]
+    if book:
+        result.append(('book-detail', 'get', book.get_absolute_url(), None, None))
+    if author:
+        result.append(('author-detail', 'get', author.get_absolute_url(), None, None))
+    if loan:
+        url = reverse('renew-book-librarian', args=[loan.pk])
+        result += [
+            ('renew-form', 'get', url, None, staff),
+            # Renovacion valida (a dos semanas): cambia due_back de la copia
+            ('renew-submit', 'post', url,
+             {'due_back': datetime.date.today() + datetime.timedelta(weeks=2)}, staff),
+        ]
+    return result
+
+
+def _client(user):
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+    client = Client(HTTP_HOST=hosts[0] if hosts else 'localhost')
+    if user is not None:
+        client.force_login(user)
+    return client
+
+
+def measure(method, url, data, user, iterations=20, warmup=2, cold=False):
+    client = _client(user)
+    request = getattr(client, method)
+    for _ in range(warmup):
+        request(url, data)
+    timings = []
+    for _ in range(iterations):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = request(url, data)
+            timings.append((time.perf_counter() - started) * 1000)
+        # Antes de la siguiente peticion: request_started vacia el log
+        query_count = len(queries)
+    tracemalloc.start()
+    try:
+        request(url, data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'url': url,
+        'method': method.upper(),
+        'status': response.status_code,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries': query_count,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run(iterations=20, warmup=2, cold=False, only=None):
+    results = {}
+    for name, method, url, data, user in scenarios():
+        if only and name not in only:
+            continue
+        results[name] = measure(method, url, data, user, iterations, warmup, cold)
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'iterations': iterations,
+            'cold_cache': cold,
+            'books': Book.objects.count(),
+            'copies': BookInstance.objects.count(),
+            'users': User.objects.count(),
+            # Pico de memoria residente del proceso (KiB en Linux)
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'scenarios': results,
+    }
+
+
+def compare(current, baseline, tolerance=1.2):
+    """
+    Regresiones respecto a baseline: p95 mas de tolerance veces peor,
+    mas consultas o un codigo de estado distinto
+    """
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        if result['status'] != before['status']:
+            regressions.append(f'{name}: status {before["status"]} -> {result["status"]}')
+        if result['queries'] > before['queries']:
+            regressions.append(f'{name}: queries {before["queries"]} -> {result["queries"]}')
+        if result['p95_ms'] > before['p95_ms'] * tolerance:
+            regressions.append(
+                f'{name}: p95 {before["p95_ms"]:.1f} ms -> {result["p95_ms"]:.1f} ms'
+            )
+    return regressions
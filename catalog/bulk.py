@@ -0,0 +1,57 @@
+"""
+Altas masivas compartidas por los comandos de carga
+(import_catalog y seed_benchmark_data).
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import Max
+
+
+@contextmanager
+def write_transaction(using=DEFAULT_DB_ALIAS):
+    """
+    transaction.atomic() que en SQLite toma el bloqueo de escritura
+    al empezar, como BEGIN IMMEDIATE (Django 3.2 solo emite BEGIN).
+    Asi ninguna otra conexion escribe hasta el final del lote y una
+    transaccion que ya ha leido no falla al pasar a escribir
+    (SQLITE_BUSY_SNAPSHOT en WAL): espera en el BEGIN (busy_timeout).
+    """
+    with transaction.atomic(using=using):
+        connection = connections[using]
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                # Escritura sin efecto; sqlite_sequence existe en cuanto
+                # hay una tabla con AUTOINCREMENT (las de Django)
+                cursor.execute('UPDATE sqlite_sequence SET seq = seq WHERE 0')
+        yield
+
+
+def insert(model, objs):
+    """
+    bulk_create que deja las pk asignadas en todos los motores.
+    Si la bbdd no devuelve las pk de un INSERT multiple (SQLite con
+    Django 3.2) las asigna ella (AUTOINCREMENT, sin reutilizar las de
+    filas borradas) y se leen despues: las filas con pk mayor que el
+    maximo anterior, en orden. Para que no se cuelen filas de otra
+    conexion hay que llamarla dentro de write_transaction().
+    """
+    objs = list(objs)
+    using = router.db_for_write(model)
+    manager = model.objects.db_manager(using)
+    if connections[using].features.can_return_rows_from_bulk_insert:
+        return manager.bulk_create(objs)
+    if not connections[using].in_atomic_block:
+        raise transaction.TransactionManagementError(
+            'bulk.insert() sin pk devueltas necesita write_transaction()'
+        )
+    last = manager.aggregate(m=Max('pk'))['m'] or 0
+    manager.bulk_create(objs)
+    pks = list(manager.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True))
+    if len(pks) != len(objs):
+        raise transaction.TransactionManagementError(
+            f'{model.__name__}: {len(pks)} filas nuevas para {len(objs)} objetos'
+        )
+    for obj, pk in zip(objs, pks):
+        obj.pk = pk
+    return objs
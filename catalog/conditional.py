@@ -0,0 +1,114 @@
+"""
+Validadores HTTP (ETag / Last-Modified) de las paginas del catalogo.
+
+Se usan con django.views.decorators.http.condition: si el cliente ya
+tiene la version actual se responde 304 sin cargar relaciones ni
+renderizar la plantilla. Las funciones solo leen columnas updated_at
+indexadas (y, en los listados, el numero de filas de la tabla).
+
+La barra lateral cambia segun el usuario, asi que el ETag incluye
+su id. Django da prioridad a If-None-Match sobre If-Modified-Since.
+"""
+import hashlib
+
+from django.db import connections, router
+
+from .models import Author, Book
+
+
+def _user_key(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return str(user.pk)
+    return 'anon'
+
+
+def _etag(request, *parts):
+    value = ':'.join([_user_key(request)] + [str(part) for part in parts])
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def _memo(request, key, compute):
+    """
+    etag_func y last_modified_func se llaman seguidas: una consulta
+    """
+    cache = request.__dict__.setdefault('_catalog_validators', {})
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def _book_timestamps(request, pk):
+    return _memo(request, ('book', pk), lambda: Book.objects.filter(
+        pk=pk
+    ).values_list('updated_at', 'author__updated_at').first())
+
+
+def book_etag(request, pk, **kwargs):
+    row = _book_timestamps(request, pk)
+    return _etag(request, 'book', pk, *row) if row else None
+
+
+def book_last_modified(request, pk, **kwargs):
+    row = _book_timestamps(request, pk)
+    return max(filter(None, row)) if row else None
+
+
+def _author_timestamp(request, pk):
+    # Los cambios en sus libros tambien marcan al autor (signals.py)
+    return _memo(request, ('author', pk), lambda: Author.objects.filter(
+        pk=pk
+    ).values_list('updated_at', flat=True).first())
+
+
+def author_etag(request, pk, **kwargs):
+    updated_at = _author_timestamp(request, pk)
+    return _etag(request, 'author', pk, updated_at) if updated_at else None
+
+
+def author_last_modified(request, pk, **kwargs):
+    return _author_timestamp(request, pk)
+
+
+# Listados: solo ETag. Un borrado no deja fecha que anunciar, pero si
+# cambia el numero de filas, que forma parte del ETag.
+def latest_changes(*models, count=None):
+    """
+    Ultimo updated_at de cada modelo en una sola consulta: una
+    subconsulta ORDER BY updated_at DESC LIMIT 1 (sobre el indice)
+    por modelo, como los contadores de catalog/stats.py. Con count
+    se añade al final el numero de filas de ese modelo.
+
+    No se usan los contadores de get_index_stats(): cualquier
+    escritura los invalida y recalcularlos (con la busqueda de
+    "harry") solo para el ETag costaria mas que la pagina.
+    """
+    parts, params = [], []
+    for model in models:
+        sql, sql_params = model.objects.order_by('-updated_at').values(
+            'updated_at'
+        )[:1].query.sql_with_params()
+        parts.append(f'({sql})')
+        params.extend(sql_params)
+    connection = connections[router.db_for_read(Book)]
+    if count is not None:
+        table = connection.ops.quote_name(count._meta.db_table)
+        parts.append(f'(SELECT COUNT(*) FROM {table})')
+    # SQL directo: se elige la bbdd de lectura como haria el ORM
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(parts), params)
+        return cursor.fetchone()
+
+
+def book_list_etag(request, *args, **kwargs):
+    return _etag(
+        request, 'books', request.get_full_path(),
+        *latest_changes(Book, Author, count=Book),
+    )
+
+
+def author_list_etag(request, *args, **kwargs):
+    return _etag(
+        request, 'authors', request.get_full_path(),
+        *latest_changes(Author, count=Author),
+    )
@@ -0,0 +1,152 @@
+"""
+Exportacion en streaming del catalogo (CSV / NDJSON).
+
+Cada conjunto de datos es una proyeccion values_list (sin instanciar
+modelos) recorrida con .iterator(chunk_size): en PostgreSQL se usa un
+cursor de servidor y en SQLite fetchmany, asi la memoria no depende
+del numero de filas. Lo usan las vistas de exportacion y el comando
+export_catalog.
+"""
+import asyncio
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.db import connections
+
+from .models import Book, BookInstance
+
+# Tamaño de bloque por defecto del cursor
+CHUNK_SIZE = 2000
+# Lineas por salto al hilo propio de la exportacion (ver in_own_thread)
+THREAD_BATCH = 100
+
+# (nombre de columna, ruta del campo) por conjunto de datos
+DATASETS = {
+    'books': (
+        lambda: Book.objects.all(),
+        (
+            ('id', 'id'),
+            ('title', 'title'),
+            ('isbn', 'isbn'),
+            ('author_first_name', 'author__first_name'),
+            ('author_last_name', 'author__last_name'),
+            ('language', 'language__iso_code'),
+            ('copies_available', 'copies_available'),
+            ('copies_on_loan', 'copies_on_loan'),
+            ('copies_maintenance', 'copies_maintenance'),
+            ('copies_reserved', 'copies_reserved'),
+            ('next_due_back', 'next_due_back'),
+        ),
+    ),
+    'copies': (
+        lambda: BookInstance.objects.all(),
+        (
+            ('id', 'id'),
+            ('book_id', 'book_id'),
+            ('title', 'book__title'),
+            ('status', 'status'),
+            ('due_back', 'due_back'),
+            ('borrower_id', 'borrower_id'),
+        ),
+    ),
+    'loans': (
+        lambda: BookInstance.objects.on_loan(),
+        (
+            ('id', 'id'),
+            ('book_id', 'book_id'),
+            ('title', 'book__title'),
+            ('isbn', 'book__isbn'),
+            ('borrower_id', 'borrower_id'),
+            ('borrower', 'borrower__username'),
+            ('due_back', 'due_back'),
+        ),
+    ),
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def columns(dataset):
+    return [name for name, _ in DATASETS[dataset][1]]
+
+
+def iter_rows(dataset, chunk_size=CHUNK_SIZE):
+    """
+    Tuplas del conjunto de datos, ordenadas por pk
+    """
+    queryset, fields = DATASETS[dataset]
+    return queryset().order_by('pk').values_list(
+        *[path for _, path in fields]
+    ).iterator(chunk_size=chunk_size)
+
+
+class Echo:
+    """
+    Pseudo-buffer para csv.writer: devuelve la linea en vez de guardarla
+    """
+    def write(self, value):
+        return value
+
+
+def _json_value(value):
+    return value if value is None or isinstance(value, (int, str)) else str(value)
+
+
+def iter_lines(dataset, file_format, chunk_size=CHUNK_SIZE):
+    """
+    Genera el fichero linea a linea. La cabecera sale antes de
+    lanzar la consulta, asi el primer byte se envia enseguida.
+    """
+    names = columns(dataset)
+    if file_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(names)
+        for row in iter_rows(dataset, chunk_size):
+            yield writer.writerow(row)
+    elif file_format == 'ndjson':
+        for row in iter_rows(dataset, chunk_size):
+            yield json.dumps(
+                dict(zip(names, map(_json_value, row))),
+                separators=(',', ':')
+            ) + '\n'
+    else:
+        raise ValueError(f'Formato desconocido: {file_format}')
+
+
+def _close(lines):
+    close = getattr(lines, 'close', None)
+    if close is not None:
+        close()
+    connections.close_all()
+
+
+def in_own_thread(lines, batch=THREAD_BATCH):
+    """
+    Bajo ASGI Django 3.2 recorre el iterador de una respuesta en
+    streaming dentro del bucle de eventos, donde el ORM lanza
+    SynchronousOnlyOperation. En ese caso las lineas se generan por
+    lotes en un hilo solo de esta exportacion, con su propia conexion,
+    que se cierra al terminar. No vale el hilo sincrono compartido: el
+    request_finished de otra peticion cerraria la conexion del cursor
+    a mitad. Sin bucle (WSGI, comandos) se recorren tal cual.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        yield from lines
+        return
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='catalog-export')
+    try:
+        while True:
+            chunk = executor.submit(lambda: list(islice(lines, batch))).result()
+            if not chunk:
+                break
+            yield ''.join(chunk)
+    finally:
+        executor.submit(_close, lines).result()
+        executor.shutdown()
@@ -4,9 +4,26 @@ Trabajando con formularios
 from django import forms
 from django.forms import ModelForm
 from django.core.exceptions import ValidationError
+from django.urls import reverse
 from django.utils.translation import ugettext_lazy as _
 import datetime #for checking renewal date range.
-from .models import BookInstance
+from . import autocomplete
+from .models import Book, BookInstance
+
+
+def validate_renewal_date(data):
+    """
+    4-week renewal rule shared by the single and bulk renewal forms
+    """
+    #Check date is not in past
+    if data < datetime.date.today():
+        raise ValidationError(_('Invalid date - renewal in past'))
+    
+    #Check if date is in available range for a renewal (4 weeks)
+    if data > datetime.date.today() + datetime.timedelta(weeks=4):
+        raise ValidationError(_('Invalid date - renewal more than 4 weeks ahead'))
+    
+    return data
 
 
 class RenewBookForm(forms.Form):
@@ -40,16 +57,7 @@ class RenewBookModelForm(ModelForm):
     """    
     def clean_due_back(self):
         data = self.cleaned_data['due_back']
-        
-        #Check date is not in past
-        if data < datetime.date.today():
-            raise ValidationError(_('Invalid date - renewal in past'))
-        
-        #Check if date is in available range for a renewal (4 weeks)
-        if data > datetime.date.today() + datetime.timedelta(weeks=4):
-            raise ValidationError(_('Invalid date - renewal more than 4 weeks ahead'))
-        
-        return data#always return the cleaned_data
+        return validate_renewal_date(data)#always return the cleaned_data
     
     class Meta:
         model = BookInstance
@@ -61,4 +69,66 @@ class RenewBookModelForm(ModelForm):
             'due_back': _(
                 'Enter a date between now and 4 weeks (default 3).'
             ),
-        }
\ No newline at end of file
+        }
+
+
+class BulkLoanForm(forms.Form):
+    """
+    Bulk renewal / return of several BookInstances at once.
+    The selected ids and the optional per-row dates (due_back_<id>)
+    are read from the POST data by the view.
+    """
+    RENEW = 'renew'
+    RETURN = 'return'
+    ACTION_CHOICES = (
+        (RENEW, _('Renew')),
+        (RETURN, _('Mark returned')),
+    )
+    action = forms.ChoiceField(choices=ACTION_CHOICES)
+    due_back = forms.DateField(
+        required=False,
+        label=_('renewal date'),
+        help_text=_('Default date for renewed copies (at most 4 weeks ahead).')
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('action') == self.RENEW and not cleaned_data.get('due_back'):
+            self.add_error('due_back', _('A renewal date is required to renew.'))
+        return cleaned_data
+
+
+class AutocompleteInput(forms.Widget):
+    """
+    Picks a related object with the autocomplete endpoint instead of
+    a <select> listing every row: a text input with suggestions and
+    a hidden input with the chosen pk (see static/js/autocomplete.js)
+    """
+    template_name = 'catalog/widgets/autocomplete.html'
+
+    def __init__(self, kind, attrs=None):
+        self.kind = kind
+        super().__init__(attrs)
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        pk = context['widget']['value']
+        context['widget'].update({
+            'kind': self.kind,
+            'url': reverse('autocomplete'),
+            'label': autocomplete.label(self.kind, pk) if pk else '',
+        })
+        return context
+
+
+class BookForm(ModelForm):
+    """
+    Book create/update form. The author is searched by name, so the
+    page does not load and render every author
+    """
+    class Meta:
+        model = Book
+        fields = '__all__'
+        widgets = {
+            'author': AutocompleteInput('author'),
+        }
@@ -0,0 +1,83 @@
+"""
+Versiones para la cache de fragmentos de las fichas de libro y autor.
+
+Cada fragmento ({% cache %} en las plantillas) se guarda con una
+clave que incluye la version de los objetos de los que depende:
+  - book:<pk>    datos del libro, su disponibilidad y sus copias
+  - author:<pk>  datos del autor y la lista de sus libros
+  - catalog      generacion global: generos, idiomas y recalculos
+                 en bloque (cambian poco y afectan a muchos libros)
+Las señales de catalog/signals.py suben la version al guardar o
+borrar, asi un fragmento obsoleto nunca se vuelve a leer: se queda
+en la cache hasta que caduca.
+
+Hace falta una cache compartida por todos los workers: con una de
+cada proceso (LocMemCache) la version subida en un worker no llega a
+los demas, que seguirian sirviendo el fragmento antiguo. En ese caso
+timeout() es 0 y los fragmentos no se guardan.
+
+La version inicial se toma del reloj y no de 1, para no reutilizar
+fragmentos antiguos si la clave de version se expulsa de la cache.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY_PREFIX = 'catalog:fragment-version'
+GLOBAL = 'catalog'
+
+
+def _key(scope):
+    return f'{VERSION_KEY_PREFIX}:{scope}'
+
+
+def scope(kind, pk):
+    return f'{kind}:{pk}'
+
+
+def timeout():
+    if not getattr(settings, 'CATALOG_SHARED_CACHE', True):
+        return 0
+    return getattr(settings, 'CATALOG_FRAGMENT_CACHE_TIMEOUT', 3600)
+
+
+def get_versions(*scopes):
+    """
+    Version actual de cada ambito con un solo get_many. Los que no
+    estan en la cache se inicializan.
+    """
+    keys = [_key(name) for name in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    return '-'.join(str(found[key]) for key in keys)
+
+
+def _bump(scopes):
+    for name in scopes:
+        try:
+            cache.incr(_key(name))
+        except ValueError:
+            cache.set(_key(name), time.time_ns(), None)
+
+
+def bump(*scopes):
+    """
+    Sube la version de los ambitos dados. Dentro de una transaccion
+    se vuelve a subir tras el commit: una peticion que lea los datos
+    antiguos entre medias no deja un fragmento con la version nueva.
+    """
+    scopes = [name for name in scopes if name]
+    if not scopes:
+        return
+    _bump(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def bump_books(pks):
+    bump(*(scope('book', pk) for pk in pks if pk is not None))
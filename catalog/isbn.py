@@ -0,0 +1,57 @@
+"""
+Normalizacion de ISBN y busqueda por lotes.
+
+Book.isbn guarda el texto tal cual se introdujo (con guiones,
+espacios, ISBN-10 o ISBN-13). Book.isbn_normalized guarda la forma
+canonica: ISBN-13 solo con digitos, o NULL si el ISBN no es valido.
+Tiene indice unico, asi que cada ISBN valido identifica un libro.
+
+    978-84-376-0494-7  ->  9788437604947
+    84-376-0494-X      ->  9788437604947  (ISBN-10 convertido)
+
+La busqueda por lotes es BookQuerySet.lookup_isbns().
+"""
+
+
+def _digits(code):
+    """
+    Solo 0-9 ASCII: str.isdigit() acepta tambien '²' o '٣', que
+    int() no convierte
+    """
+    return code.isascii() and code.isdigit()
+
+
+def _isbn10_check(digits):
+    total = sum((10 - pos) * int(digit) for pos, digit in enumerate(digits[:9]))
+    check = (11 - total % 11) % 11
+    return 'X' if check == 10 else str(check)
+
+
+def _isbn13_check(digits):
+    total = sum((3 if pos % 2 else 1) * int(digit) for pos, digit in enumerate(digits[:12]))
+    return str((10 - total % 10) % 10)
+
+
+def normalize(value):
+    """
+    ISBN-13 canonico o None si value no es un ISBN-10/13 valido
+    """
+    if not value:
+        return None
+    code = ''.join(
+        char for char in str(value).upper() if char not in ' -‐‑–'
+    )
+    if code.startswith('ISBN'):
+        code = code[4:].lstrip(':')
+    if len(code) == 10:
+        if not _digits(code[:9]) or code[9] != _isbn10_check(code):
+            return None
+        code = '978' + code[:9]
+        return code + _isbn13_check(code)
+    if len(code) == 13:
+        if not _digits(code) or not code.startswith(('978', '979')):
+            return None
+        if code[12] != _isbn13_check(code):
+            return None
+        return code
+    return None
@@ -0,0 +1,118 @@
+"""
+Operaciones de prestamo en bloque (renovar / marcar como devuelto).
+
+Se validan todas las filas de una pasada y los cambios se aplican con
+un UPDATE ... WHERE id IN (...) por cada resultado (una fecha de
+renovacion distinta = un UPDATE). Las filas que no cumplen las reglas
+se devuelven como fallos sin abortar el resto del lote.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import fragments
+from .forms import validate_renewal_date
+from .models import Book, BookInstance
+from .stats import invalidate_index_stats
+
+
+class BulkResult:
+    """
+    Resultado de una operacion en bloque.
+    updated: numero de copias modificadas
+    failures: lista de (id, mensaje) de las filas rechazadas
+    """
+    def __init__(self):
+        self.updated = 0
+        self.failures = []
+
+    def fail(self, pk, message):
+        self.failures.append((pk, str(message)))
+
+    def __repr__(self):
+        return f'<BulkResult updated={self.updated} failures={len(self.failures)}>'
+
+
+def _load_loans(pks, result):
+    """
+    Una consulta con las copias pedidas: {pk: book_id} de las que
+    estan prestadas. El resto se anotan como fallos.
+    """
+    rows = {}
+    for raw in pks:
+        try:
+            rows[BookInstance._meta.pk.to_python(raw)] = raw
+        except ValidationError:
+            result.fail(raw, 'Invalid copy id')
+    found = dict(
+        (pk, (status, book_id)) for pk, status, book_id in
+        BookInstance.objects.filter(pk__in=list(rows))
+        .values_list('pk', 'status', 'book_id')
+    )
+    loans = {}
+    for pk in rows:
+        if pk not in found:
+            result.fail(pk, 'Copy not found')
+        elif found[pk][0] != 'o':
+            result.fail(pk, 'Copy is not on loan')
+        else:
+            loans[pk] = found[pk][1]
+    return loans
+
+
+def after_bulk_change(book_ids):
+    """
+    Los UPDATE en bloque no disparan señales: se refresca lo derivado
+    """
+    book_ids = {pk for pk in book_ids if pk is not None}
+    if book_ids:
+        Book.objects.filter(pk__in=book_ids).refresh_availability(touch=True)
+        fragments.bump_books(book_ids)
+    invalidate_index_stats()
+
+
+def bulk_renew(pks, due_back, due_dates=None):
+    """
+    Renueva las copias prestadas. due_dates permite una fecha por
+    copia ({pk: fecha}); si no, se usa due_back. Cada fecha se valida
+    con la misma regla de 4 semanas que el formulario individual.
+    """
+    result = BulkResult()
+    due_dates = due_dates or {}
+    loans = _load_loans(pks, result)
+    groups = {}
+    for pk in loans:
+        date = due_dates.get(pk, due_back)
+        if date is None:
+            result.fail(pk, 'Invalid date')
+            continue
+        try:
+            validate_renewal_date(date)
+        except ValidationError as exc:
+            result.fail(pk, exc.messages[0])
+            continue
+        groups.setdefault(date, []).append(pk)
+    with transaction.atomic():
+        for date, group in groups.items():
+            result.updated += BookInstance.objects.filter(
+                pk__in=group, status='o'
+            ).update(due_back=date, updated_at=timezone.now())
+        after_bulk_change(loans[pk] for group in groups.values() for pk in group)
+    return result
+
+
+def bulk_return(pks):
+    """
+    Marca como devueltas (disponibles) las copias prestadas
+    """
+    result = BulkResult()
+    loans = _load_loans(pks, result)
+    with transaction.atomic():
+        result.updated = BookInstance.objects.filter(
+            pk__in=list(loans), status='o'
+        ).update(
+            status='a', due_back=None, borrower=None,
+            updated_at=timezone.now()
+        )
+        after_bulk_change(loans.values())
+    return result
@@ -0,0 +1,152 @@
+"""
+Compara el rendimiento de SQLite con lectores y escritores
+concurrentes (procesos, como los workers de gunicorn) para cada
+perfil de PRAGMAs de settings.SQLITE_PROFILES.
+
+Cada perfil usa un fichero nuevo en un directorio temporal con una
+tabla parecida a django_session: los lectores hacen consultas de
+listado por rango y los escritores actualizan filas sueltas, cada
+una en su transaccion (como una sesion o una renovacion). Se cuentan
+operaciones por segundo y errores "database is locked".
+
+    python manage.py benchmark_sqlite --readers 4 --writers 2 --seconds 5
+"""
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.sqlite import apply_pragmas
+
+# Timeout de conexion por defecto de sqlite3 (el de Django sin OPTIONS)
+CONNECT_TIMEOUT = 5.0
+
+
+def _connect(path, pragmas):
+    conn = sqlite3.connect(path, timeout=CONNECT_TIMEOUT, isolation_level=None)
+    apply_pragmas(conn.cursor(), pragmas)
+    return conn
+
+
+def _create(path, pragmas, rows):
+    conn = _connect(path, pragmas)
+    conn.execute(
+        'CREATE TABLE bench (id INTEGER PRIMARY KEY, data TEXT NOT NULL, '
+        'expire INTEGER NOT NULL)'
+    )
+    conn.execute('BEGIN')
+    conn.executemany(
+        'INSERT INTO bench (id, data, expire) VALUES (?, ?, ?)',
+        ((num, 'x' * 200, num) for num in range(1, rows + 1))
+    )
+    conn.execute('COMMIT')
+    conn.close()
+
+
+def _worker(role, path, pragmas, rows, deadline, results):
+    conn = _connect(path, pragmas)
+    rng = random.Random(os.getpid())
+    ops = errors = 0
+    latencies = []
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            if role == 'read':
+                start = rng.randint(1, rows)
+                conn.execute(
+                    'SELECT id, data FROM bench WHERE id >= ? ORDER BY id LIMIT 20',
+                    (start,)
+                ).fetchall()
+            else:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute(
+                    'UPDATE bench SET data = ?, expire = expire + 1 WHERE id = ?',
+                    ('y' * 200, rng.randint(1, rows))
+                )
+                conn.execute('COMMIT')
+            ops += 1
+            latencies.append(time.monotonic() - started)
+        except sqlite3.OperationalError as exc:
+            if 'locked' not in str(exc) and 'busy' not in str(exc):
+                raise
+            errors += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+    conn.close()
+    latencies.sort()
+    results.put({
+        'role': role,
+        'ops': ops,
+        'errors': errors,
+        'p95': latencies[int(len(latencies) * 0.95)] if latencies else None,
+    })
+
+
+class Command(BaseCommand):
+    help = 'Mide lecturas/escrituras concurrentes en SQLite con cada perfil de PRAGMAs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile', action='append', dest='profiles',
+            help='Perfil de SQLITE_PROFILES (repetible; por defecto todos)',
+        )
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--json', action='store_true', help='Salida en JSON')
+
+    def handle(self, *args, **options):
+        profiles = getattr(settings, 'SQLITE_PROFILES', {})
+        names = options['profiles'] or list(profiles)
+        unknown = [name for name in names if name not in profiles]
+        if unknown:
+            raise CommandError(f'Perfiles desconocidos: {", ".join(unknown)}')
+        report = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in names:
+                report[name] = self.run_profile(
+                    os.path.join(tmp, f'{name}.sqlite3'), profiles[name], options
+                )
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for name, result in report.items():
+            self.stdout.write(
+                f'{name:>8}: {result["reads_per_second"]:8.0f} lecturas/s '
+                f'{result["writes_per_second"]:7.0f} escrituras/s '
+                f'p95 escritura {result["write_p95_ms"]:.2f} ms '
+                f'{result["locked_errors"]} errores locked'
+            )
+
+    def run_profile(self, path, pragmas, options):
+        _create(path, pragmas, options['rows'])
+        results = multiprocessing.Queue()
+        deadline = time.monotonic() + options['seconds']
+        workers = [
+            multiprocessing.Process(target=_worker, args=(
+                role, path, pragmas, options['rows'], deadline, results
+            ))
+            for role in ['read'] * options['readers'] + ['write'] * options['writers']
+        ]
+        for worker in workers:
+            worker.start()
+        stats = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        seconds = options['seconds']
+        writes = [s for s in stats if s['role'] == 'write']
+        p95 = max((s['p95'] for s in writes if s['p95'] is not None), default=0)
+        return {
+            'pragmas': pragmas,
+            'reads_per_second': sum(s['ops'] for s in stats if s['role'] == 'read') / seconds,
+            'writes_per_second': sum(s['ops'] for s in writes) / seconds,
+            'write_p95_ms': p95 * 1000,
+            'locked_errors': sum(s['errors'] for s in stats),
+        }
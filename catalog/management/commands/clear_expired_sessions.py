@@ -0,0 +1,56 @@
+"""
+Borra las sesiones caducadas por lotes.
+
+A diferencia de clearsessions, cada lote es un DELETE corto sobre
+un conjunto acotado de claves, asi no se bloquea la tabla
+django_session durante mucho tiempo.
+"""
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Borra las sesiones caducadas en lotes de tamaño fijo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Numero de sesiones a borrar por lote (por defecto 1000)',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Segundos de espera entre lotes (por defecto 0)',
+        )
+
+    def handle(self, *args, **options):
+        engine = import_module(settings.SESSION_ENGINE)
+        store = engine.SessionStore
+        if not hasattr(store, 'get_model_class'):
+            self.stdout.write(
+                'El motor de sesion no usa la bbdd, no hay nada que borrar.'
+            )
+            return
+        model = store.get_model_class()
+        batch_size = options['batch_size']
+        now = timezone.now()
+        total = 0
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+            deleted, _ = model.objects.filter(session_key__in=keys).delete()
+            total += deleted
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Borradas {total} sesiones...')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Sesiones caducadas borradas: {total}'
+        ))
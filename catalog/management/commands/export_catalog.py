@@ -0,0 +1,37 @@
+"""
+Exporta libros, copias o prestamos activos a CSV / NDJSON en streaming.
+Pensado para las exportaciones nocturnas: memoria constante.
+"""
+from django.core.management.base import BaseCommand
+
+from catalog import exports
+
+
+class Command(BaseCommand):
+    help = 'Exporta un conjunto de datos del catalogo (books, copies, loans)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(exports.DATASETS))
+        parser.add_argument(
+            '--format', choices=sorted(exports.FORMATS), default='csv',
+            help='Formato de salida (por defecto csv)',
+        )
+        parser.add_argument(
+            '--output', '-o',
+            help='Fichero de salida (por defecto la salida estandar)',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=exports.CHUNK_SIZE,
+            help=f'Filas por bloque del cursor (por defecto {exports.CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        lines = exports.iter_lines(
+            options['dataset'], options['format'], options['chunk_size']
+        )
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as stream:
+                stream.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,297 @@
+"""
+Importa libros y copias desde un fichero CSV o JSON Lines.
+
+Columnas (CSV) o claves (JSONL) de cada fila:
+    title, summary, isbn, author_first_name, author_last_name,
+    genres (separados por '|'), language (iso_code), language_name,
+    copies (numero de copias a crear), status (estado de las copias,
+    por defecto 'a')
+
+El fichero se lee en streaming y se procesa por lotes: cada lote
+resuelve o crea Authors, Genres y Languages a traves de mapas en
+memoria y da de alta Books, sus generos y sus BookInstances con
+bulk_create dentro de una transaccion. La memoria depende del
+tamaño del lote y del numero de autores/generos/idiomas distintos,
+no del tamaño del fichero.
+
+Los ISBN se normalizan (catalog/isbn.py) y son unicos: se descartan
+las filas cuyo ISBN ya esta en el catalogo o antes en el fichero.
+Tambien, con un aviso por fila, las lineas JSON mal formadas y las
+filas con valores que no caben en sus columnas.
+"""
+import csv
+import json
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import autocomplete, fragments
+from catalog.bulk import insert, write_transaction
+from catalog.isbn import normalize as normalize_isbn
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.search import index_objects
+from catalog.stats import invalidate_index_stats
+
+STATUSES = {code for code, _ in BookInstance.LOAN_STATUS}
+LENGTH_LIMITS = {
+    'title': Book._meta.get_field('title'),
+    'isbn': Book._meta.get_field('isbn'),
+    'author_first_name': Author._meta.get_field('first_name'),
+    'author_last_name': Author._meta.get_field('last_name'),
+    'language': Language._meta.get_field('iso_code'),
+    'language_name': Language._meta.get_field('language'),
+}
+# Limite de cada uno de los generos de la fila
+GENRE_NAME = Genre._meta.get_field('name')
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+class InvalidRow:
+    """
+    Linea que no se ha podido leer: clean() la descarta y avisa como
+    al resto de filas no validas, sin abortar la importacion
+    """
+    def __init__(self, error):
+        self.error = error
+
+
+def read_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield InvalidRow(f'JSON no valido ({exc})')
+            continue
+        yield row if isinstance(row, dict) else InvalidRow('no es un objeto JSON')
+
+
+class Command(BaseCommand):
+    help = 'Importa libros y copias desde CSV o JSON Lines por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Fichero .csv o .jsonl')
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help='Formato del fichero (por defecto segun la extension)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Filas por lote y transaccion (por defecto 1000)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+        )
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size debe ser mayor que 0')
+
+        self.load_lookups()
+        self.totals = {'rows': 0, 'books': 0, 'copies': 0, 'skipped': 0}
+        started = time.monotonic()
+        try:
+            stream = open(path, newline='', encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(exc)
+        with stream:
+            reader = read_jsonl(stream) if file_format == 'jsonl' else read_csv(stream)
+            while True:
+                batch = list(islice(reader, batch_size))
+                if not batch:
+                    break
+                with write_transaction():
+                    self.import_batch(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    '{rows} filas, {books} libros, {copies} copias, '
+                    '{skipped} descartadas'.format(**self.totals) +
+                    f' - {self.totals["rows"] / max(elapsed, 1e-6):.0f} filas/s'
+                )
+        invalidate_index_stats()
+        # Libros nuevos en fichas de autores que ya existian
+        fragments.bump(fragments.GLOBAL)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Importados {self.totals["books"]} libros y '
+            f'{self.totals["copies"]} copias en {elapsed:.1f}s'
+        ))
+
+    # Mapas de busqueda
+    def load_lookups(self):
+        self.authors = {}
+        for pk, first, last in Author.objects.values_list(
+                'pk', 'first_name', 'last_name').iterator():
+            self.authors.setdefault((first.lower(), last.lower()), pk)
+        self.genres = {
+            name.lower(): pk
+            for pk, name in Genre.objects.values_list('pk', 'name').iterator()
+        }
+        self.languages = dict(
+            Language.objects.values_list('iso_code', 'pk').iterator()
+        )
+
+    def resolve(self, rows):
+        """
+        Crea en bloque los autores, generos e idiomas que falten
+        """
+        new_authors, new_genres, new_languages = {}, {}, {}
+        for row in rows:
+            key = (row['author_first_name'].lower(), row['author_last_name'].lower())
+            if any(key) and key not in self.authors:
+                new_authors.setdefault(key, Author(
+                    first_name=row['author_first_name'],
+                    last_name=row['author_last_name'],
+                ))
+            for name in row['genres']:
+                if name.lower() not in self.genres:
+                    new_genres.setdefault(name.lower(), Genre(name=name))
+            iso = row['language']
+            if iso and iso not in self.languages:
+                new_languages.setdefault(iso, Language(
+                    iso_code=iso, language=row['language_name'] or iso
+                ))
+
+        if new_authors:
+            created = insert(Author, list(new_authors.values()))
+            for obj in created:
+                self.authors[(obj.first_name.lower(), obj.last_name.lower())] = obj.pk
+            index_objects(Author, created)
+            autocomplete.refresh(Author, created)
+        if new_genres:
+            for obj in insert(Genre, list(new_genres.values())):
+                self.genres[obj.name.lower()] = obj.pk
+        if new_languages:
+            for obj in insert(Language, list(new_languages.values())):
+                self.languages[obj.iso_code] = obj.pk
+
+    # Filas
+    def clean(self, row, line):
+        """
+        Normaliza una fila. Devuelve None (y avisa) si no es valida.
+        """
+        if isinstance(row, InvalidRow):
+            self.stderr.write(f'Fila {line}: {row.error}, se descarta')
+            return None
+
+        def value(key):
+            return str(row.get(key) or '').strip()
+
+        title = value('title')
+        if not title:
+            self.stderr.write(f'Fila {line}: falta el titulo, se descarta')
+            return None
+        genres = row.get('genres') or []
+        if isinstance(genres, str):
+            genres = genres.split('|')
+        if not isinstance(genres, list):
+            self.stderr.write(f'Fila {line}: genres no valido, se descarta')
+            return None
+        genres = [str(genre).strip() for genre in genres]
+        try:
+            copies = int(row.get('copies') or 0)
+        except (TypeError, ValueError):
+            copies = -1
+        status = value('status') or 'a'
+        if copies < 0 or status not in STATUSES:
+            self.stderr.write(f'Fila {line}: copies o status no validos, se descarta')
+            return None
+        for key, field in LENGTH_LIMITS.items():
+            if len(value(key)) > field.max_length:
+                self.stderr.write(
+                    f'Fila {line}: {key} supera {field.max_length} caracteres, se descarta'
+                )
+                return None
+        if any(len(genre) > GENRE_NAME.max_length for genre in genres):
+            self.stderr.write(
+                f'Fila {line}: genres supera {GENRE_NAME.max_length} caracteres, se descarta'
+            )
+            return None
+        return {
+            'title': title,
+            'summary': value('summary'),
+            'isbn': value('isbn'),
+            'isbn_normalized': normalize_isbn(value('isbn')),
+            'author_first_name': value('author_first_name'),
+            'author_last_name': value('author_last_name'),
+            'genres': [genre for genre in genres if genre],
+            'language': value('language'),
+            'language_name': value('language_name'),
+            'copies': copies,
+            'status': status,
+        }
+
+    def drop_duplicate_isbns(self, rows):
+        """
+        Quita las filas con un ISBN que ya existe (en la bbdd o en el
+        mismo lote): isbn_normalized es unico
+        """
+        existing = Book.objects.only('isbn_normalized').lookup_isbns(
+            row['isbn_normalized'] for row in rows if row['isbn_normalized']
+        )
+        seen = set(existing)
+        kept = []
+        for row in rows:
+            code = row['isbn_normalized']
+            if code in seen:
+                self.stderr.write(f'ISBN {row["isbn"]} duplicado ({row["title"]}), se descarta')
+                continue
+            if code:
+                seen.add(code)
+            kept.append(row)
+        return kept
+
+    def import_batch(self, batch):
+        first_line = self.totals['rows'] + 1
+        self.totals['rows'] += len(batch)
+        rows = [
+            row for row in (
+                self.clean(raw, first_line + pos) for pos, raw in enumerate(batch)
+            ) if row is not None
+        ]
+        rows = self.drop_duplicate_isbns(rows)
+        self.totals['skipped'] += len(batch) - len(rows)
+        if not rows:
+            return
+        self.resolve(rows)
+
+        books = insert(Book, [
+            Book(
+                title=row['title'],
+                summary=row['summary'],
+                isbn=row['isbn'],
+                isbn_normalized=row['isbn_normalized'],
+                author_id=self.authors.get(
+                    (row['author_first_name'].lower(), row['author_last_name'].lower())
+                ),
+                language_id=self.languages.get(row['language']),
+            )
+            for row in rows
+        ])
+        Book.genre.through.objects.bulk_create([
+            Book.genre.through(book_id=book.pk, genre_id=self.genres[name])
+            for book, row in zip(books, rows)
+            for name in dict.fromkeys(g.lower() for g in row['genres'])
+        ])
+        copies = [
+            BookInstance(book_id=book.pk, status=row['status'])
+            for book, row in zip(books, rows)
+            for _ in range(row['copies'])
+        ]
+        BookInstance.objects.bulk_create(copies)
+
+        # bulk_create no dispara señales: se actualiza lo derivado
+        Book.objects.filter(pk__in=[book.pk for book in books]).refresh_availability()
+        index_objects(Book, books)
+        autocomplete.refresh(Book, books)
+
+        self.totals['books'] += len(books)
+        self.totals['copies'] += len(copies)
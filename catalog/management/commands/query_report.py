@@ -0,0 +1,120 @@
+"""
+Informe de las consultas que mas pesan, a partir del registro de
+catalog/querylog.py (CATALOG_QUERY_LOG_FILE y sus rotaciones .1, .2...).
+
+    python manage.py query_report
+    python manage.py query_report --order count --top 10 --view all-borrowed
+    python manage.py query_report --log /var/log/catalog/queries-*.log --json
+
+Por huella: numero de ejecuciones, tiempo total, medio y maximo,
+ejecuciones lentas, las vistas que la lanzan y el ultimo EXPLAIN.
+"""
+import glob
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+ORDERS = {
+    'total': lambda entry: entry['total_ms'],
+    'count': lambda entry: entry['count'],
+    'max': lambda entry: entry['max_ms'],
+    'slow': lambda entry: entry['slow'],
+}
+
+
+def log_files(patterns):
+    paths = []
+    for pattern in patterns:
+        paths += sorted(glob.glob(pattern) + glob.glob(pattern + '.[0-9]*'))
+    return list(dict.fromkeys(paths))
+
+
+def read_entries(paths):
+    for path in paths:
+        with open(path, encoding='utf-8') as stream:
+            for line in stream:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and 'fingerprint' in entry:
+                    yield entry
+
+
+def aggregate(entries, view=None):
+    """
+    {huella: acumulados}, opcionalmente de una sola vista
+    """
+    report = {}
+    for entry in entries:
+        if view is not None and entry.get('view') != view:
+            continue
+        item = report.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'],
+            'sql': entry['sql'],
+            'count': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'slow': 0,
+            'views': {},
+            'explain': None,
+        })
+        name = entry.get('view') or '-'
+        if entry['type'] == 'stats':
+            item['count'] += entry['count']
+            item['total_ms'] += entry['total_ms']
+            item['max_ms'] = max(item['max_ms'], entry['max_ms'])
+            per_view = item['views'].setdefault(name, {'count': 0, 'total_ms': 0.0})
+            per_view['count'] += entry['count']
+            per_view['total_ms'] += entry['total_ms']
+        elif entry['type'] == 'slow':
+            item['slow'] += 1
+            item['max_ms'] = max(item['max_ms'], entry['duration_ms'])
+            if entry.get('explain'):
+                item['explain'] = entry['explain']
+    return report
+
+
+class Command(BaseCommand):
+    help = 'Ranking de huellas de SQL por tiempo total, numero o maximo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', action='append',
+            help='Fichero o patron glob (repetible; por defecto CATALOG_QUERY_LOG_FILE)',
+        )
+        parser.add_argument('--order', choices=sorted(ORDERS), default='total')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--view', help='Solo las consultas de esta vista')
+        parser.add_argument('--json', action='store_true', help='Salida en JSON')
+
+    def handle(self, *args, **options):
+        paths = log_files(options['log'] or [settings.CATALOG_QUERY_LOG_FILE])
+        if not paths:
+            raise CommandError('No hay ficheros de registro de consultas')
+        report = aggregate(read_entries(paths), options['view'])
+        ranked = sorted(report.values(), key=ORDERS[options['order']], reverse=True)
+        ranked = ranked[:options['top']]
+        if options['json']:
+            self.stdout.write(json.dumps(ranked, indent=2))
+            return
+        self.stdout.write(
+            f'{"#":>3} {"total ms":>10} {"count":>7} {"avg ms":>8} {"max ms":>8} '
+            f'{"slow":>5}  fingerprint'
+        )
+        for position, item in enumerate(ranked, 1):
+            average = item['total_ms'] / item['count'] if item['count'] else 0
+            self.stdout.write(
+                f'{position:>3} {item["total_ms"]:>10.1f} {item["count"]:>7} '
+                f'{average:>8.2f} {item["max_ms"]:>8.1f} {item["slow"]:>5}  {item["fingerprint"]}'
+            )
+            self.stdout.write(f'    {item["sql"][:300]}')
+            views = sorted(item['views'].items(), key=lambda pair: -pair[1]['total_ms'])
+            if views:
+                self.stdout.write('    views: ' + ', '.join(
+                    f'{name} ({data["count"]}, {data["total_ms"]:.1f} ms)'
+                    for name, data in views[:5]
+                ))
+            for line in item['explain'] or []:
+                self.stdout.write(f'    EXPLAIN {line}')
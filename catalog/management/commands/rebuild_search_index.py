@@ -0,0 +1,20 @@
+"""
+Reconstruye el indice de texto completo y el de autocompletado
+de libros y autores.
+Util tras cargas masivas que no disparan señales (bulk_create, update).
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog import autocomplete
+from catalog.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los indices de busqueda y autocompletado'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_index()
+            autocomplete.rebuild()
+        self.stdout.write(self.style.SUCCESS('Indice de busqueda reconstruido'))
@@ -0,0 +1,42 @@
+"""
+Recalcula en bloque los contadores de disponibilidad de todos los libros.
+Necesario tras cambios que no disparan señales (update, bulk_create,
+SQL directo) o para corregir cualquier desviacion. Los libros quedan
+marcados como modificados (updated_at) para que los GET condicionales
+no sigan respondiendo 304 con los contadores viejos.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from catalog import fragments
+from catalog.models import Book
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores de copias por estado de cada libro'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Rango de ids de libro por UPDATE (por defecto 5000)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        bounds = Book.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            self.stdout.write('No hay libros.')
+            return
+        total = 0
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            with transaction.atomic():
+                total += Book.objects.filter(
+                    pk__gte=start, pk__lt=start + batch_size
+                ).refresh_availability(touch=True)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{total} libros recalculados...')
+        fragments.bump(fragments.GLOBAL)
+        self.stdout.write(self.style.SUCCESS(
+            f'Disponibilidad recalculada para {total} libros'
+        ))
@@ -0,0 +1,62 @@
+"""
+Mide las vistas del catalogo (ver catalog/benchmark.py) y escribe el
+resultado en JSON.
+
+    python manage.py seed_benchmark_data
+    python manage.py run_benchmark --output baseline.json
+    ...
+    python manage.py run_benchmark --compare baseline.json
+
+Con --compare termina con error si algun escenario empeora (p95 por
+encima de --tolerance veces el anterior, mas consultas u otro
+codigo de estado).
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Latencia p50/p95, consultas y memoria de cada vista, en JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Vacia la cache antes de cada peticion',
+        )
+        parser.add_argument(
+            '--only', action='append',
+            help='Escenario a medir (repetible; por defecto todos)',
+        )
+        parser.add_argument('--output', help='Fichero donde guardar el JSON')
+        parser.add_argument('--compare', help='JSON de una ejecucion anterior')
+        parser.add_argument('--tolerance', type=float, default=1.2)
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations debe ser mayor que 0')
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as stream:
+                    baseline = json.load(stream)
+            except (OSError, ValueError) as exc:
+                raise CommandError(exc)
+        report = benchmark.run(
+            iterations=options['iterations'], warmup=options['warmup'],
+            cold=options['cold'], only=options['only'],
+        )
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(output)
+        self.stdout.write(output)
+        if baseline is not None:
+            regressions = benchmark.compare(report, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Regresiones:\n  ' + '\n  '.join(regressions))
+            self.stderr.write('Sin regresiones respecto a ' + options['compare'])
@@ -0,0 +1,215 @@
+"""
+Genera un catalogo sintetico grande para medir rendimiento
+(ver el comando run_benchmark).
+
+Todo se crea con bulk_create por lotes y con un generador aleatorio
+con semilla fija (--seed): dos ejecuciones con los mismos parametros
+sobre una bbdd vacia dan los mismos datos. Los volumenes por defecto
+son los de referencia:
+
+    python manage.py seed_benchmark_data
+        10k autores, 100k libros, 1M copias, 50k usuarios, 200k prestamos
+
+    python manage.py seed_benchmark_data --books 1000 --copies 10000 ...
+
+Los usuarios se llaman bench<n> y comparten la contraseña de
+--password. Usar una bbdd dedicada: los datos se añaden a los que
+haya y no se borran.
+"""
+import datetime
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+
+from catalog import autocomplete, fragments
+from catalog.bulk import insert, write_transaction
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.search import index_objects
+from catalog.stats import invalidate_index_stats
+
+FIRST_NAMES = (
+    'Ana', 'Luis', 'Marta', 'Jorge', 'Lucia', 'Pablo', 'Elena', 'Carlos',
+    'Sofia', 'Diego', 'Laura', 'Mario', 'Irene', 'Hugo', 'Clara', 'Raul',
+)
+LAST_NAMES = (
+    'Garcia', 'Lopez', 'Martin', 'Sanchez', 'Perez', 'Gomez', 'Ruiz',
+    'Diaz', 'Moreno', 'Alonso', 'Navarro', 'Torres', 'Vega', 'Castro',
+)
+WORDS = (
+    'sombra', 'viento', 'ciudad', 'noche', 'mar', 'memoria', 'camino',
+    'jardin', 'fuego', 'silencio', 'tiempo', 'isla', 'reino', 'espejo',
+    'invierno', 'rio', 'luz', 'piedra', 'bosque', 'cielo', 'guerra', 'sueño',
+)
+GENRES = (
+    'Novela', 'Poesia', 'Ensayo', 'Ciencia ficcion', 'Fantasia', 'Historia',
+    'Policiaca', 'Terror', 'Biografia', 'Teatro', 'Infantil', 'Viajes',
+)
+LANGUAGES = (
+    ('EN', 'English'), ('ES', 'Español'), ('FR', 'Français'), ('DE', 'Deutsch'),
+    ('IT', 'Italiano'), ('PT', 'Português'),
+)
+# Estados de las copias que no estan prestadas, con su peso
+FREE_STATUSES = (('a', 8), ('m', 1), ('r', 1))
+
+
+def isbn13(number):
+    """
+    ISBN-13 valido con prefijo 979 a partir de un numero de serie
+    """
+    digits = f'979{number % 10 ** 9:09d}'
+    total = sum((3 if pos % 2 else 1) * int(digit) for pos, digit in enumerate(digits))
+    return digits + str((10 - total % 10) % 10)
+
+
+class Command(BaseCommand):
+    help = 'Genera un catalogo sintetico grande (bulk_create) para los benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=10000)
+        parser.add_argument('--books', type=int, default=100000)
+        parser.add_argument('--copies', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=50000)
+        parser.add_argument(
+            '--loans', type=int, default=200000,
+            help='Copias prestadas a usuarios (vencidas o no)',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--password', default='benchmark',
+            help='Contraseña de los usuarios bench<n>',
+        )
+
+    def handle(self, *args, **options):
+        for name in ('authors', 'books', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} debe ser mayor que 0')
+        if options['loans'] > options['copies']:
+            raise CommandError('--loans no puede ser mayor que --copies')
+        if min(options['copies'], options['users'], options['loans']) < 0:
+            raise CommandError('Los volumenes no pueden ser negativos')
+        if options['loans'] and not options['users']:
+            raise CommandError('Hacen falta usuarios para los prestamos')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.started = time.monotonic()
+
+        languages = self.seed_lookups()
+        authors = self.seed_authors(options['authors'])
+        users = self.seed_users(options['users'], options['password'])
+        books = self.seed_books(options['books'], authors, languages)
+        self.seed_copies(books, options['copies'], options['loans'], users)
+
+        # bulk_create no dispara señales: derivados e indices a mano
+        self.step('Recalculando disponibilidad')
+        Book.objects.filter(pk__gte=min(books), pk__lte=max(books)).refresh_availability()
+        invalidate_index_stats()
+        fragments.bump(fragments.GLOBAL)
+        self.step('Terminado')
+
+    def step(self, message):
+        self.stdout.write(f'[{time.monotonic() - self.started:7.1f}s] {message}')
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    # Datos
+    def seed_lookups(self):
+        self.step('Generos e idiomas')
+        with write_transaction():
+            existing = set(Genre.objects.values_list('name', flat=True))
+            insert(Genre, [Genre(name=name) for name in GENRES if name not in existing])
+            existing = set(Language.objects.values_list('iso_code', flat=True))
+            insert(Language, [
+                Language(iso_code=code, language=name)
+                for code, name in LANGUAGES if code not in existing
+            ])
+        self.genres = list(Genre.objects.filter(name__in=GENRES).values_list('pk', flat=True))
+        return list(Language.objects.filter(
+            iso_code__in=[code for code, _ in LANGUAGES]
+        ).values_list('pk', flat=True))
+
+    def seed_authors(self, total):
+        self.step(f'{total} autores')
+        pks = []
+        for start, size in self.batches(total):
+            with write_transaction():
+                created = insert(Author, [
+                    Author(
+                        first_name=self.rng.choice(FIRST_NAMES),
+                        last_name=f'{self.rng.choice(LAST_NAMES)} {start + num}',
+                        date_of_birth=datetime.date(1900, 1, 1) + datetime.timedelta(
+                            days=self.rng.randrange(365 * 90)
+                        ),
+                    )
+                    for num in range(size)
+                ])
+                index_objects(Author, created)
+                autocomplete.refresh(Author, created)
+            pks += [obj.pk for obj in created]
+        return pks
+
+    def seed_users(self, total, password):
+        self.step(f'{total} usuarios')
+        # Un solo hash para todos: hashear 50k contraseñas tarda minutos
+        password = make_password(password)
+        first = User.objects.filter(username__startswith='bench').count()
+        for start, size in self.batches(total):
+            User.objects.bulk_create([
+                User(username=f'bench{first + start + num}', password=password)
+                for num in range(size)
+            ], ignore_conflicts=True)
+        return list(User.objects.filter(
+            username__startswith='bench'
+        ).order_by('-pk').values_list('pk', flat=True)[:total])
+
+    def seed_books(self, total, authors, languages):
+        self.step(f'{total} libros')
+        serial = (Book.objects.aggregate(m=Max('pk'))['m'] or 0) + 1
+        pks = []
+        for start, size in self.batches(total):
+            books = []
+            for num in range(size):
+                isbn = isbn13(serial + start + num)
+                books.append(Book(
+                    title=' '.join(self.rng.sample(WORDS, self.rng.randint(2, 4))).capitalize(),
+                    summary=' '.join(self.rng.choices(WORDS, k=40)),
+                    isbn=isbn,
+                    isbn_normalized=isbn,
+                    author_id=self.rng.choice(authors),
+                    language_id=self.rng.choice(languages),
+                ))
+            with write_transaction():
+                created = insert(Book, books)
+                Book.genre.through.objects.bulk_create([
+                    Book.genre.through(book_id=book.pk, genre_id=genre)
+                    for book in created
+                    for genre in self.rng.sample(self.genres, self.rng.randint(1, 3))
+                ])
+                index_objects(Book, created)
+                autocomplete.refresh(Book, created)
+            pks += [book.pk for book in created]
+        return pks
+
+    def seed_copies(self, books, total, loans, users):
+        self.step(f'{total} copias, {loans} prestadas')
+        today = datetime.date.today()
+        statuses, weights = zip(*FREE_STATUSES)
+        for start, size in self.batches(total):
+            copies = []
+            for num in range(start, start + size):
+                copy = BookInstance(book_id=self.rng.choice(books))
+                if num < loans:
+                    # Alrededor de un 20% vencidas
+                    copy.status = 'o'
+                    copy.borrower_id = self.rng.choice(users)
+                    copy.due_back = today + datetime.timedelta(days=self.rng.randint(-7, 28))
+                else:
+                    copy.status = self.rng.choices(statuses, weights)[0]
+                copies.append(copy)
+            BookInstance.objects.bulk_create(copies)
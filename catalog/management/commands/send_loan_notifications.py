@@ -0,0 +1,53 @@
+"""
+Worker de avisos de prestamos (ver catalog/notifications.py).
+
+Sin --loop hace una pasada y termina (para cron). Con --loop se queda
+en marcha y repite la pasada cada --interval segundos.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import notifications
+
+
+class Command(BaseCommand):
+    help = 'Envia por email los avisos de prestamos que vencen o estan vencidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days-ahead', type=int, default=notifications.DAYS_AHEAD,
+            help=f'Dias de antelacion del aviso (por defecto {notifications.DAYS_AHEAD})',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=notifications.CHUNK_SIZE,
+            help=f'Prestatarios por bloque (por defecto {notifications.CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Cuenta los avisos pendientes sin enviarlos',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Repite la pasada indefinidamente',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=300,
+            help='Segundos entre pasadas con --loop (por defecto 300)',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size debe ser mayor que 0')
+        if options['days_ahead'] < 0:
+            raise CommandError('--days-ahead no puede ser negativo')
+        while True:
+            stats = notifications.send_notifications(
+                days_ahead=options['days_ahead'],
+                chunk_size=options['chunk_size'],
+                dry_run=options['dry_run'],
+            )
+            self.stdout.write(self.style.SUCCESS(str(stats)))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,47 @@
+"""
+Copia la bbdd SQLite primaria sobre las replicas SQLite locales con
+la API de backup de sqlite3 (copia consistente aunque haya
+escrituras). Solo para probar el enrutado en local: las replicas
+reales las mantiene la replicacion del motor.
+"""
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = 'Copia la bbdd SQLite primaria en las replicas SQLite (solo en local)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=1024,
+            help='Paginas copiadas por paso del backup (por defecto 1024)',
+        )
+
+    def handle(self, *args, **options):
+        aliases = getattr(settings, 'CATALOG_READ_REPLICAS', [])
+        if not aliases:
+            raise CommandError('No hay replicas configuradas (DATABASE_REPLICA_URLS)')
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Solo se sincronizan bbdd SQLite')
+        source = sqlite3.connect(str(primary.settings_dict['NAME']))
+        try:
+            for alias in aliases:
+                replica = connections[alias]
+                if replica.vendor != 'sqlite':
+                    raise CommandError(f'{alias} no es SQLite')
+                # Cierra la conexion de Django antes de sobrescribir el fichero
+                replica.close()
+                target = sqlite3.connect(str(replica.settings_dict['NAME']))
+                try:
+                    source.backup(target, pages=options['pages'])
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS(
+                    f'{alias}: copiada {primary.settings_dict["NAME"]}'
+                ))
+        finally:
+            source.close()
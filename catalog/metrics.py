@@ -0,0 +1,353 @@
+"""
+Metricas en formato de texto de Prometheus (/metrics).
+
+MetricsMiddleware cuenta cada peticion por nombre de url (view),
+metodo y estado, con un histograma de latencia por vista y el numero
+de consultas SQL (un execute_wrapper por conexion, como en
+catalog/profiling.py). MeteredCache envuelve el backend de cache
+real y cuenta aciertos y fallos de las lecturas.
+
+Varios workers de gunicorn: cada proceso acumula en memoria y vuelca
+su estado, como mucho cada CATALOG_METRICS_FLUSH_SECONDS, a un
+fichero JSON propio (metrics-<pid>.json) en CATALOG_METRICS_DIR. La
+vista /metrics suma los ficheros de todos los procesos, asi que
+cualquier worker responde con el total. Los ficheros de workers
+muertos se conservan (sus contadores siguen sumando); el directorio
+se vacia al arrancar gunicorn, que si no se ha configurado crea uno
+temporal para ese despliegue (locallibrary/gunicorn_conf.py).
+
+Sin CATALOG_METRICS_DIR no se escribe nada: /metrics solo muestra el
+proceso que responde. Asi los tests, migrate o los comandos de
+gestion no dejan ficheros que sumaria el servidor.
+
+Los prestamos activos y vencidos se cuentan al servir /metrics, con
+una consulta.
+"""
+import asyncio
+import atexit
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import BookInstance
+
+# Limites superiores de los buckets del histograma (segundos)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FLUSH_SECONDS = 1
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# [consultas] de la peticion en curso
+_queries = contextvars.ContextVar('catalog_metrics_queries', default=None)
+_MISSING = object()
+
+
+def store_dir():
+    """
+    Directorio de los ficheros de los procesos, o None si no hay
+    """
+    return getattr(settings, 'CATALOG_METRICS_DIR', None) or None
+
+
+class Registry:
+    """
+    Contadores del proceso. Las claves son tuplas de etiquetas
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.exit_hook = False
+        self.reset()
+
+    def reset(self):
+        self.requests = {}
+        self.latency = {}
+        self.queries = {}
+        self.cache = {'hit': 0, 'miss': 0}
+        self.last_flush = 0.0
+
+    def observe_request(self, view, method, status, duration, queries):
+        with self.lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latency.setdefault(view, {
+                'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0,
+            })
+            position = next(
+                (pos for pos, bound in enumerate(BUCKETS) if duration <= bound), len(BUCKETS)
+            )
+            histogram['buckets'][position] += 1
+            histogram['sum'] += duration
+            histogram['count'] += 1
+            self.queries[view] = self.queries.get(view, 0) + queries
+
+    def observe_cache(self, result, count=1):
+        with self.lock:
+            self.cache[result] += count
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': [[*key, value] for key, value in self.requests.items()],
+                'latency': {view: dict(data, buckets=list(data['buckets']))
+                            for view, data in self.latency.items()},
+                'queries': dict(self.queries),
+                'cache': dict(self.cache),
+            }
+
+    def flush(self, force=False):
+        """
+        Vuelca el estado al fichero del proceso (escritura atomica).
+        El volcado final al salir se registra con la primera escritura.
+        """
+        directory = store_dir()
+        if directory is None:
+            return
+        now = time.monotonic()
+        interval = getattr(settings, 'CATALOG_METRICS_FLUSH_SECONDS', FLUSH_SECONDS)
+        if not force and now - self.last_flush < interval:
+            return
+        self.last_flush = now
+        if not self.exit_hook:
+            self.exit_hook = True
+            atexit.register(self.flush, force=True)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as stream:
+            json.dump(self.snapshot(), stream)
+        os.replace(f'{path}.tmp', path)
+
+
+registry = Registry()
+
+
+def clear_store():
+    """
+    Borra los ficheros de todos los procesos (al arrancar el servidor)
+    """
+    if store_dir() is None:
+        return
+    for path in glob.glob(os.path.join(store_dir(), 'metrics-*.json')):
+        os.remove(path)
+
+
+def snapshots():
+    """
+    Estado de cada proceso: los ficheros del directorio o, sin
+    directorio, el del proceso actual
+    """
+    if store_dir() is None:
+        yield registry.snapshot()
+        return
+    for path in glob.glob(os.path.join(store_dir(), 'metrics-*.json')):
+        try:
+            with open(path, encoding='utf-8') as stream:
+                yield json.load(stream)
+        except (OSError, ValueError):
+            continue
+
+
+def merged():
+    """
+    Suma de todos los procesos
+    """
+    total = {'requests': {}, 'latency': {}, 'queries': {}, 'cache': {'hit': 0, 'miss': 0}}
+    for data in snapshots():
+        for *key, value in data['requests']:
+            key = tuple(key)
+            total['requests'][key] = total['requests'].get(key, 0) + value
+        for view, histogram in data['latency'].items():
+            into = total['latency'].setdefault(view, {
+                'buckets': [0] * len(histogram['buckets']), 'sum': 0.0, 'count': 0,
+            })
+            into['buckets'] = [a + b for a, b in zip(into['buckets'], histogram['buckets'])]
+            into['sum'] += histogram['sum']
+            into['count'] += histogram['count']
+        for view, value in data['queries'].items():
+            total['queries'][view] = total['queries'].get(view, 0) + value
+        for result, value in data['cache'].items():
+            total['cache'][result] += value
+    return total
+
+
+def loan_counts():
+    return BookInstance.objects.filter(status='o').aggregate(
+        active=Count('pk'),
+        overdue=Count('pk', filter=Q(due_back__lt=timezone.localdate())),
+    )
+
+
+# Formato de texto
+def _labels(**labels):
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _header(lines, name, kind, help_text):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+
+
+def render(data, loans):
+    lines = []
+    _header(lines, 'catalog_http_requests_total', 'counter',
+            'Peticiones HTTP por vista, metodo y estado')
+    for (view, method, status), value in sorted(data['requests'].items()):
+        lines.append(
+            f'catalog_http_requests_total{_labels(view=view, method=method, status=status)} {value}'
+        )
+    _header(lines, 'catalog_http_request_duration_seconds', 'histogram',
+            'Latencia de las peticiones por vista')
+    for view, histogram in sorted(data['latency'].items()):
+        cumulative = 0
+        for bound, value in zip(BUCKETS + ('+Inf',), histogram['buckets']):
+            cumulative += value
+            lines.append(
+                f'catalog_http_request_duration_seconds_bucket{_labels(view=view, le=bound)} {cumulative}'
+            )
+        lines.append(f'catalog_http_request_duration_seconds_sum{_labels(view=view)} {histogram["sum"]}')
+        lines.append(f'catalog_http_request_duration_seconds_count{_labels(view=view)} {histogram["count"]}')
+    _header(lines, 'catalog_db_queries_total', 'counter', 'Consultas SQL por vista')
+    for view, value in sorted(data['queries'].items()):
+        lines.append(f'catalog_db_queries_total{_labels(view=view)} {value}')
+    _header(lines, 'catalog_cache_requests_total', 'counter', 'Lecturas de cache por resultado')
+    for result in ('hit', 'miss'):
+        lines.append(f'catalog_cache_requests_total{_labels(result=result)} {data["cache"][result]}')
+    reads = data['cache']['hit'] + data['cache']['miss']
+    _header(lines, 'catalog_cache_hit_ratio', 'gauge', 'Aciertos / lecturas de cache')
+    lines.append(f'catalog_cache_hit_ratio {data["cache"]["hit"] / reads if reads else 0}')
+    _header(lines, 'catalog_active_loans', 'gauge', 'Copias prestadas')
+    lines.append(f'catalog_active_loans {loans["active"]}')
+    _header(lines, 'catalog_overdue_loans', 'gauge', 'Copias prestadas con la fecha de devolucion pasada')
+    lines.append(f'catalog_overdue_loans {loans["overdue"]}')
+    return '\n'.join(lines) + '\n'
+
+
+# Recogida
+def record_query(execute, sql, params, many, context):
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install(connection):
+    """
+    Engancha record_query a la conexion (una vez por conexion)
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsMiddleware:
+    """
+    Cuenta peticiones, latencia y consultas por vista.
+    Sirve en modo sincrono y asincrono (ASGI).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        counter = [0]
+        token = _queries.set(counter)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _queries.reset(token)
+        self.observe(request, response, time.perf_counter() - started, counter[0])
+        return response
+
+    async def __acall__(self, request):
+        counter = [0]
+        token = _queries.set(counter)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _queries.reset(token)
+        self.observe(request, response, time.perf_counter() - started, counter[0])
+        return response
+
+    def observe(self, request, response, duration, queries):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        registry.observe_request(view, request.method, response.status_code, duration, queries)
+        registry.flush()
+
+
+class MeteredCache(BaseCache):
+    """
+    Backend de cache que delega en OPTIONS['BACKEND'] y cuenta
+    aciertos y fallos de get/get_many
+    """
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        backend = options.pop('BACKEND')
+        super().__init__(dict(params, OPTIONS={}))
+        self._cache = import_string(backend)(location, dict(params, OPTIONS=options))
+
+    def get(self, key, default=None, version=None):
+        value = self._cache.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            registry.observe_cache('miss')
+            return default
+        registry.observe_cache('hit')
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self._cache.get_many(keys, version=version)
+        registry.observe_cache('hit', len(found))
+        registry.observe_cache('miss', len(keys) - len(found))
+        return found
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.add(key, value, timeout, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.set_many(data, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        return self._cache.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        return self._cache.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self._cache.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self._cache.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self._cache.decr(key, delta, version=version)
+
+    def clear(self):
+        return self._cache.clear()
+
+    def close(self, **kwargs):
+        return self._cache.close(**kwargs)
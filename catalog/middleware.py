@@ -0,0 +1,37 @@
+"""
+Middleware del proyecto que tiene que funcionar tambien bajo ASGI.
+
+Bajo ASGI un middleware solo sincrono obliga a Django a pasar cada
+peticion por el hilo sincrono compartido y lo bloquea mientras dura
+el resto de la peticion. Las vistas asincronas (catalog/async_views.py)
+dejarian de ser concurrentes.
+"""
+import asyncio
+
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise 5 solo es sincrono. Sin autorefresh (DEBUG=False) la
+    busqueda del fichero es un dict en memoria: se puede hacer en el
+    bucle de eventos sin bloquearlo.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        response = self.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
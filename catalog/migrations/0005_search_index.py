@@ -0,0 +1,68 @@
+"""
+Indice de texto completo para libros y autores (ver catalog/search.py).
+SQLite: tablas FTS5. PostgreSQL: indices GIN sobre tsvector.
+"""
+from django.db import migrations
+
+# Copia congelada de las expresiones de catalog/search.py
+PG_BOOK_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(isbn, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(summary, '')), 'C')"
+)
+PG_AUTHOR_VECTOR = (
+    "to_tsvector('simple', coalesce(first_name, '') || ' ' || "
+    "coalesce(last_name, ''))"
+)
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE catalog_book_fts USING fts5("
+    "title, summary, isbn, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE catalog_author_fts USING fts5("
+    "first_name, last_name, tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO catalog_book_fts (rowid, title, summary, isbn) "
+    "SELECT id, coalesce(title, ''), coalesce(summary, ''), coalesce(isbn, '') "
+    "FROM catalog_book",
+    "INSERT INTO catalog_author_fts (rowid, first_name, last_name) "
+    "SELECT id, coalesce(first_name, ''), coalesce(last_name, '') "
+    "FROM catalog_author",
+]
+SQLITE_BACKWARD = [
+    'DROP TABLE IF EXISTS catalog_book_fts',
+    'DROP TABLE IF EXISTS catalog_author_fts',
+]
+POSTGRESQL_FORWARD = [
+    f'CREATE INDEX catalog_book_search_idx ON catalog_book USING GIN (({PG_BOOK_VECTOR}))',
+    f'CREATE INDEX catalog_author_search_idx ON catalog_author USING GIN (({PG_AUTHOR_VECTOR}))',
+]
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS catalog_book_search_idx',
+    'DROP INDEX IF EXISTS catalog_author_search_idx',
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_alter_bookinstance_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({
+                'sqlite': SQLITE_FORWARD,
+                'postgresql': POSTGRESQL_FORWARD,
+            }),
+            run_for_vendor({
+                'sqlite': SQLITE_BACKWARD,
+                'postgresql': POSTGRESQL_BACKWARD,
+            }),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 3.2 on 2026-10-18 03:35
+
+from django.db import migrations, models
+import re
+import unicodedata
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'\w+', text.lower()))
+
+
+def populate_autocomplete(apps, schema_editor):
+    """
+    Rellena el indice de prefijos con los libros y autores existentes
+    """
+    AutocompleteEntry = apps.get_model('catalog', 'AutocompleteEntry')
+    Book = apps.get_model('catalog', 'Book')
+    Author = apps.get_model('catalog', 'Author')
+
+    def entries(kind, rows):
+        for pk, label in rows:
+            label = label[:200]
+            words = normalize(label).split()
+            for term in {' '.join(words[pos:])[:200] for pos in range(min(len(words), 8))}:
+                yield AutocompleteEntry(kind=kind, object_id=pk, term=term, label=label)
+
+    AutocompleteEntry.objects.bulk_create(
+        entries('b', Book.objects.values_list('id', 'title').iterator()),
+        batch_size=1000,
+    )
+    AutocompleteEntry.objects.bulk_create(
+        entries('a', (
+            (pk, f'{first} {last}') for pk, first, last in
+            Author.objects.values_list('id', 'first_name', 'last_name').iterator()
+        )),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutocompleteEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('b', 'Book'), ('a', 'Author')], max_length=1)),
+                ('object_id', models.BigIntegerField()),
+                ('term', models.CharField(max_length=200)),
+                ('label', models.CharField(max_length=200)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='author',
+            name='date_of_death',
+            field=models.DateField(blank=True, null=True, verbose_name='died'),
+        ),
+        migrations.AddIndex(
+            model_name='autocompleteentry',
+            index=models.Index(fields=['term'], name='catalog_ac_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='autocompleteentry',
+            index=models.Index(fields=['kind', 'term'], name='catalog_ac_kind_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='autocompleteentry',
+            index=models.Index(fields=['kind', 'object_id'], name='catalog_ac_object_idx'),
+        ),
+        migrations.RunPython(populate_autocomplete, migrations.RunPython.noop),
+    ]
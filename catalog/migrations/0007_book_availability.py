@@ -0,0 +1,71 @@
+# Generated by Django 3.2 on 2026-10-18 03:36
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_availability(apps, schema_editor):
+    """
+    Calcula los contadores de las copias ya existentes
+    """
+    Book = apps.get_model('catalog', 'Book')
+    BookInstance = apps.get_model('catalog', 'BookInstance')
+    copies = BookInstance.objects.filter(book=OuterRef('pk')).order_by()
+
+    def count(status):
+        return Coalesce(
+            Subquery(
+                copies.filter(status=status).values('book')
+                .annotate(n=Count('pk')).values('n'),
+                output_field=models.IntegerField()
+            ),
+            0
+        )
+
+    Book.objects.update(
+        copies_available=count('a'),
+        copies_on_loan=count('o'),
+        copies_maintenance=count('m'),
+        copies_reserved=count('r'),
+        next_due_back=Subquery(
+            copies.filter(status='o', due_back__isnull=False)
+            .order_by('due_back').values('due_back')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_autocompleteentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='copies_available',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_maintenance',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_on_loan',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_reserved',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='next_due_back',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_availability, migrations.RunPython.noop),
+    ]
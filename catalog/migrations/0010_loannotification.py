@@ -0,0 +1,31 @@
+# Generated by Django 3.2 on 2026-10-18 03:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0009_bookinstance_book_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('d', 'Due soon'), ('o', 'Overdue')], max_length=1)),
+                ('due_back', models.DateField()),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+                ('bookinstance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.bookinstance')),
+                ('borrower', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='loannotification',
+            constraint=models.UniqueConstraint(fields=('bookinstance', 'kind', 'due_back'), name='catalog_loan_notification_once'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+def fill_isbn_normalized(apps, schema_editor):
+    """
+    Rellena isbn_normalized. Si varios libros comparten ISBN se
+    queda con el primero (pk mas baja); el resto queda a NULL.
+    """
+    from catalog.isbn import normalize
+
+    Book = apps.get_model('catalog', 'Book')
+    seen = set()
+    batch = []
+    for pk, isbn in Book.objects.order_by('pk').values_list('pk', 'isbn').iterator():
+        code = normalize(isbn)
+        if code is None or code in seen:
+            continue
+        seen.add(code)
+        batch.append(Book(pk=pk, isbn_normalized=code))
+        if len(batch) >= 1000:
+            Book.objects.bulk_update(batch, ['isbn_normalized'])
+            batch = []
+    Book.objects.bulk_update(batch, ['isbn_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='isbn_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=13, null=True),
+        ),
+        migrations.RunPython(fill_isbn_normalized, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='book',
+            name='isbn_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=13, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-18 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_book_isbn_normalized'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bookinstance',
+            name='catalog_bi_borrower_loan_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='bookinstance',
+            name='catalog_bi_on_loan_due_idx',
+        ),
+        migrations.AddIndex(
+            model_name='bookinstance',
+            index=models.Index(fields=['status', 'due_back', 'id'], name='catalog_bi_status_due_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookinstance',
+            index=models.Index(fields=['borrower', 'status', 'due_back', 'id'], name='catalog_bi_borrower_due_idx'),
+        ),
+    ]
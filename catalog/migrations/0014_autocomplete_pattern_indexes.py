@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-18 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_loan_indexes_with_id'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='autocompleteentry',
+            name='catalog_ac_term_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='autocompleteentry',
+            name='catalog_ac_kind_term_idx',
+        ),
+        migrations.AddIndex(
+            model_name='autocompleteentry',
+            index=models.Index(fields=['term'], name='catalog_ac_term_like_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='autocompleteentry',
+            index=models.Index(fields=['kind', 'term'], name='catalog_ac_kind_term_like_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ),
+    ]
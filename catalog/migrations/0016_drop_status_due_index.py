@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-18 04:50
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_book_isbn_length'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bookinstance',
+            name='catalog_bi_status_due_idx',
+        ),
+    ]
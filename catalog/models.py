@@ -1,13 +1,189 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (
+    Case, Count, ExpressionWrapper, F, OuterRef, Q, Subquery, Value, When
+)
+from django.db.models.functions import Coalesce
+from django.core.exceptions import ValidationError
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth.models import User
 from datetime import date
 
 import uuid
+
+from .isbn import normalize as normalize_isbn
 """
 fuente resolucion:
 https://github.com/mdn/django-locallibrary-tutorial
 """
+class BookQuerySet(models.QuerySet):
+    """
+    QuerySet de Book con "formas" de consulta con nombre.
+    Cada forma carga de una vez las relaciones que usa su
+    plantilla, para no lanzar una consulta por fila (N+1).
+    """
+    SHAPES = ('list', 'detail', 'admin')
+
+    def for_list(self):
+        """
+        Listados: __str__ usa language y la lista muestra author
+        """
+        return self.select_related('author', 'language')
+
+    def for_detail(self):
+        """
+        Ficha del libro: generos y copias en una consulta cada uno
+        """
+        return self.select_related('author', 'language').prefetch_related(
+            'genre', 'bookinstance_set'
+        )
+
+    def for_admin(self):
+        """
+        Changelist del admin: author y display_genre
+        """
+        return self.select_related('author', 'language').prefetch_related(
+            'genre'
+        )
+
+    def refresh_availability(self, touch=False):
+        """
+        Recalcula los contadores de copias por estado y la proxima
+        fecha de devolucion de los libros del queryset, con un unico
+        UPDATE ... SET col = (SELECT COUNT(*) ...) en la bbdd.
+        touch=True marca tambien los libros como modificados
+        (updated_at), en el mismo UPDATE.
+
+        Antes se bloquean las filas de los libros (SELECT ... FOR
+        UPDATE): en PostgreSQL (READ COMMITTED) dos transacciones que
+        cambian copias del mismo libro contarian cada una con su foto
+        y la ultima en confirmar pisaria el recuento de la otra. Con
+        el bloqueo la segunda espera y su UPDATE, una sentencia
+        posterior, ya ve las copias de la primera. SQLite ignora el
+        FOR UPDATE (sus escrituras ya van en serie).
+        """
+        copies = BookInstance.objects.filter(book=OuterRef('pk')).order_by()
+        
+        def count(status):
+            return Coalesce(
+                Subquery(
+                    copies.filter(status=status).values('book')
+                    .annotate(n=Count('pk')).values('n'),
+                    output_field=models.IntegerField()
+                ),
+                0
+            )
+        
+        touched = {'updated_at': timezone.now()} if touch else {}
+        locked = self.select_for_update().order_by('pk')
+        with transaction.atomic(using=locked.db):
+            list(locked.values_list('pk', flat=True))
+            return self.order_by().update(
+                copies_available=count('a'),
+                copies_on_loan=count('o'),
+                copies_maintenance=count('m'),
+                copies_reserved=count('r'),
+                next_due_back=Subquery(
+                    copies.filter(status='o', due_back__isnull=False)
+                    .order_by('due_back').values('due_back')[:1]
+                ),
+                **touched
+            )
+
+    def touch(self):
+        """
+        Marca los libros como modificados sin pasar por save().
+        Fecha de Python como auto_now (CURRENT_TIMESTAMP de SQLite
+        solo tiene segundos).
+        """
+        return self.order_by().update(updated_at=timezone.now())
+
+    def lookup_isbns(self, values, chunk_size=500):
+        """
+        Busqueda por lotes: {ISBN normalizado: libro} de los que
+        existen, con consultas IN de chunk_size valores (SQLite
+        antiguo admite 999 parametros). Se ignoran los no validos.
+        """
+        codes = list(dict.fromkeys(filter(None, map(normalize_isbn, values))))
+        found = {}
+        for start in range(0, len(codes), chunk_size):
+            for book in self.filter(isbn_normalized__in=codes[start:start + chunk_size]):
+                found[book.isbn_normalized] = book
+        return found
+
+    def shaped(self, shape):
+        """
+        Aplica la forma indicada por nombre ('list', 'detail', 'admin')
+        """
+        if shape not in self.SHAPES:
+            raise ValueError(f'Forma de consulta desconocida: {shape}')
+        return getattr(self, f'for_{shape}')()
+
+
+class BookInstanceQuerySet(models.QuerySet):
+    """
+    QuerySet de BookInstance para los listados de prestamos
+    """
+    def for_list(self):
+        """
+        Los listados muestran el libro (con su idioma) y el prestatario
+        """
+        return self.select_related('book__language', 'borrower')
+
+    def on_loan(self):
+        return self.filter(status__exact='o')
+
+    def overdue(self, today=None):
+        """
+        Copias prestadas con fecha de devolucion pasada.
+        Usa el indice (status, due_back, id).
+        """
+        today = today or date.today()
+        return self.filter(status__exact='o', due_back__lt=today)
+
+    def with_overdue(self, today=None):
+        """
+        Anota en la bbdd si la copia esta vencida (overdue) y desde
+        hace cuanto (days_overdue, timedelta; None si no lo esta),
+        para poder filtrar, ordenar y contar sin recorrer las filas.
+        """
+        today = today or date.today()
+        is_overdue = Q(status__exact='o', due_back__lt=today)
+        return self.annotate(
+            overdue=Case(
+                When(is_overdue, then=Value(True)),
+                default=Value(False),
+                output_field=models.BooleanField()
+            ),
+            days_overdue=Case(
+                When(is_overdue, then=ExpressionWrapper(
+                    Value(today, output_field=models.DateField()) - F('due_back'),
+                    output_field=models.DurationField()
+                )),
+                default=None,
+                output_field=models.DurationField()
+            ),
+        )
+
+
+class AuthorQuerySet(models.QuerySet):
+    """
+    QuerySet de Author
+    """
+    def touch(self):
+        return self.order_by().update(updated_at=timezone.now())
+
+    def for_detail(self):
+        """
+        Ficha del autor: sus libros (con idioma) en una sola consulta
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                'book_set',
+                queryset=Book.objects.select_related('language')
+            )
+        )
+
 class Genre(models.Model):
     """
     Modelo que representa el género literario.
@@ -50,7 +226,13 @@ class Book(models.Model):
         help_text="Introduzca un resumen del libro"
     )
     # imprint = models.CharField(max_length=200)
-    isbn = models.CharField("ISBN",max_length=13)
+    # Tal cual se introdujo: "ISBN 978-84-376-0494-7" no cabe en 13
+    isbn = models.CharField("ISBN",max_length=32, db_index=True)
+    # ISBN-13 canonico (catalog/isbn.py), NULL si isbn no es valido.
+    # Lo rellena la señal pre_save; bulk_create lo tiene que poner
+    isbn_normalized = models.CharField(
+        max_length=13, unique=True, null=True, blank=True, editable=False
+    )
     genre = models.ManyToManyField(
         Genre,
         help_text="Seleccione un género de la lista"
@@ -60,8 +242,35 @@ class Book(models.Model):
         on_delete=models.SET_NULL,
         null=True
     )
+    # Disponibilidad desnormalizada: la mantienen las señales de
+    # BookInstance (catalog/signals.py) y reconcile_book_availability
+    copies_available = models.PositiveIntegerField(default=0, editable=False)
+    copies_on_loan = models.PositiveIntegerField(default=0, editable=False)
+    copies_maintenance = models.PositiveIntegerField(default=0, editable=False)
+    copies_reserved = models.PositiveIntegerField(default=0, editable=False)
+    next_due_back = models.DateField(null=True, blank=True, editable=False)
+    # Ultimo cambio del libro o de sus copias (Last-Modified / ETag)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    objects = BookQuerySet.as_manager()
+    
+    class Meta():
+        """
+        Indice para el listado ordenado por titulo (id como desempate)
+        """
+        indexes = [
+            models.Index(fields=['title', 'id'], name='catalog_book_title_idx'),
+        ]
     
     #metodos
+    def clean(self):
+        """
+        El ISBN no puede estar ya en otro libro (en cualquier formato)
+        """
+        code = normalize_isbn(self.isbn)
+        if code and Book.objects.filter(isbn_normalized=code).exclude(pk=self.pk).exists():
+            raise ValidationError({'isbn': 'Ya existe un libro con este ISBN.'})
+
     def __str__(self):
         """
         Se devuelve el titulo  + iso code como representacion
@@ -79,8 +288,9 @@ class Book(models.Model):
         """
         Devuelve una concatenacion de los generos del libro
         """
+        # Se corta en Python para aprovechar el prefetch de genre
         return(
-            ', '.join([genre.name for genre in self.genre.all()[:3]])
+            ', '.join([genre.name for genre in list(self.genre.all())[:3]])
         )
     """
     short_description establece la descripcion corta a mostrar
@@ -88,6 +298,13 @@ class Book(models.Model):
     """
     display_genre.short_description = 'Genres'
     
+    @property
+    def copies_total(self):
+        return (
+            self.copies_available + self.copies_on_loan +
+            self.copies_maintenance + self.copies_reserved
+        )
+    
 class BookInstance(models.Model):
     """
     Modelo que representa una copia específica de un libro
@@ -127,6 +344,9 @@ class BookInstance(models.Model):
         null=True,
         blank=True
         )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    objects = BookInstanceQuerySet.as_manager()
         
     @property
     def is_overdue(self):
@@ -141,6 +361,29 @@ class BookInstance(models.Model):
         """
         ordering = ["status","due_back"]
         permissions = (("can_mark_returned","Set book as returned"),)
+        """
+        Indices segun los accesos de las vistas de prestamos:
+        - ordering por defecto y listado de todos los prestamos
+        - prestamos de un usuario ordenados por fecha
+        - copias de un libro por estado (contadores de disponibilidad)
+        Los listados ordenan por (due_back, id): con el id al final del
+        indice SQLite no necesita ordenar aparte (el id es un UUID, no
+        el rowid que SQLite añade solo a cada indice).
+        """
+        indexes = [
+            models.Index(
+                fields=['book', 'status', 'due_back'],
+                name='catalog_bi_book_status_idx'
+            ),
+            models.Index(
+                fields=['status', 'due_back', 'id'],
+                name='catalog_bi_status_due_id_idx'
+            ),
+            models.Index(
+                fields=['borrower', 'status', 'due_back', 'id'],
+                name='catalog_bi_borrower_due_idx'
+            ),
+        ]
     
     def __str__(self):
         """
@@ -170,6 +413,20 @@ class Author(models.Model):
         null=True,
         blank=True
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    objects = AuthorQuerySet.as_manager()
+    
+    class Meta():
+        """
+        Indice para el listado ordenado por apellido y nombre
+        """
+        indexes = [
+            models.Index(
+                fields=['last_name', 'first_name', 'id'],
+                name='catalog_author_name_idx'
+            ),
+        ]
     
     #Metodos
     def get_absolute_url(self):
@@ -207,3 +464,71 @@ class Language(models.Model):
     def __str__(self):
         return self.language
     
+
+class AutocompleteEntry(models.Model):
+    """
+    Indice de prefijos para el autocompletado (ver catalog/autocomplete.py)
+    Una fila por objeto y palabra de su titulo o nombre.
+    """
+    BOOK = 'b'
+    AUTHOR = 'a'
+    KIND_CHOICES = (
+        (BOOK, 'Book'),
+        (AUTHOR, 'Author'),
+    )
+    kind = models.CharField(max_length=1, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # Texto normalizado desde una palabra hasta el final
+    term = models.CharField(max_length=200)
+    label = models.CharField(max_length=200)
+    
+    class Meta():
+        """
+        Los indices de term sirven para LIKE 'prefijo%' en PostgreSQL
+        con cualquier collation (las opclasses solo se aplican ahi)
+        """
+        indexes = [
+            models.Index(
+                fields=['term'], opclasses=['varchar_pattern_ops'],
+                name='catalog_ac_term_like_idx'
+            ),
+            models.Index(
+                fields=['kind', 'term'],
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+                name='catalog_ac_kind_term_like_idx'
+            ),
+            models.Index(fields=['kind', 'object_id'], name='catalog_ac_object_idx'),
+        ]
+    
+    def __str__(self):
+        return self.term
+
+
+class LoanNotification(models.Model):
+    """
+    Aviso enviado al prestatario de una copia (ver catalog/notifications.py).
+    Una fila por copia, tipo de aviso y fecha de devolucion: si la
+    fecha cambia (renovacion) se vuelve a avisar; si no, no se repite.
+    """
+    DUE_SOON = 'd'
+    OVERDUE = 'o'
+    KIND_CHOICES = (
+        (DUE_SOON, 'Due soon'),
+        (OVERDUE, 'Overdue'),
+    )
+    bookinstance = models.ForeignKey(BookInstance, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=1, choices=KIND_CHOICES)
+    due_back = models.DateField()
+    borrower = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    sent_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta():
+        constraints = [
+            models.UniqueConstraint(
+                fields=['bookinstance', 'kind', 'due_back'],
+                name='catalog_loan_notification_once'
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.bookinstance_id} {self.kind} {self.due_back}'
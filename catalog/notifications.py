@@ -0,0 +1,155 @@
+"""
+Avisos por email de prestamos que vencen pronto o estan vencidos.
+
+No hay broker: la cola de trabajo es la propia bbdd. Son pendientes
+las copias prestadas con fecha de devolucion dentro del horizonte
+que aun no tienen su LoanNotification (copia, tipo, fecha). Se
+recorren por bloques de prestatarios (keyset sobre borrower_id) y
+cada bloque hace:
+  - una consulta con los ids de los siguientes prestatarios
+  - una consulta con todas sus copias pendientes
+  - un solo mensaje por prestatario, enviados con send_mass_mail
+    sobre una misma conexion del EMAIL_BACKEND
+  - un bulk_create con el estado enviado
+Volver a ejecutarlo no repite avisos (restriccion unica en la bbdd).
+"""
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection, send_mass_mail
+from django.db.models import Case, CharField, Exists, OuterRef, Value, When
+from django.template.loader import render_to_string
+
+from .models import BookInstance, LoanNotification
+
+# Dias de antelacion del aviso "vence pronto"
+DAYS_AHEAD = 3
+# Prestatarios por bloque
+CHUNK_SIZE = 200
+
+
+class NotificationStats:
+    """
+    Contadores de una pasada del worker
+    """
+    def __init__(self):
+        self.chunks = 0
+        self.borrowers = 0
+        self.messages = 0
+        self.loans = 0
+        self.elapsed = 0.0
+
+    @property
+    def messages_per_second(self):
+        return self.messages / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def loans_per_second(self):
+        return self.loans / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f'{self.messages} mensajes ({self.loans} prestamos, '
+            f'{self.borrowers} prestatarios, {self.chunks} bloques) en '
+            f'{self.elapsed:.2f}s - {self.messages_per_second:.0f} mensajes/s, '
+            f'{self.loans_per_second:.0f} prestamos/s'
+        )
+
+
+def pending(today=None, days_ahead=DAYS_AHEAD):
+    """
+    Copias prestadas con aviso pendiente, anotadas con el tipo de
+    aviso (notice_kind). Solo prestatarios con email.
+    """
+    today = today or date.today()
+    horizon = today + timedelta(days=days_ahead)
+    return BookInstance.objects.on_loan().filter(
+        due_back__lte=horizon,
+        borrower__isnull=False,
+    ).exclude(borrower__email='').annotate(
+        notice_kind=Case(
+            When(due_back__lt=today, then=Value(LoanNotification.OVERDUE)),
+            default=Value(LoanNotification.DUE_SOON),
+            output_field=CharField()
+        ),
+    ).annotate(
+        notified=Exists(LoanNotification.objects.filter(
+            bookinstance=OuterRef('pk'),
+            kind=OuterRef('notice_kind'),
+            due_back=OuterRef('due_back'),
+        )),
+    ).filter(notified=False)
+
+
+def build_message(borrower, loans, today):
+    """
+    (asunto, cuerpo, remitente, destinatarios) para send_mass_mail
+    """
+    overdue = [loan for loan in loans if loan.notice_kind == LoanNotification.OVERDUE]
+    due_soon = [loan for loan in loans if loan.notice_kind == LoanNotification.DUE_SOON]
+    if overdue:
+        subject = f'Local Library: {len(overdue)} overdue book(s)'
+    else:
+        subject = f'Local Library: {len(due_soon)} book(s) due soon'
+    body = render_to_string('user/loan_notification.txt', {
+        'borrower': borrower,
+        'overdue': overdue,
+        'due_soon': due_soon,
+        'today': today,
+    })
+    return (subject, body, settings.DEFAULT_FROM_EMAIL, [borrower.email])
+
+
+def send_chunk(borrower_ids, today, days_ahead, connection, stats, dry_run=False):
+    loans = pending(today, days_ahead).filter(
+        borrower_id__in=borrower_ids
+    ).select_related('book', 'borrower').order_by('borrower_id', 'due_back', 'id')
+    groups = {}
+    for loan in loans:
+        groups.setdefault(loan.borrower_id, []).append(loan)
+    if not groups:
+        return
+    messages = [
+        build_message(group[0].borrower, group, today) for group in groups.values()
+    ]
+    if not dry_run:
+        send_mass_mail(messages, connection=connection)
+        # Si el envio falla no se registra nada: el bloque se reintenta
+        LoanNotification.objects.bulk_create([
+            LoanNotification(
+                bookinstance_id=loan.pk, kind=loan.notice_kind,
+                due_back=loan.due_back, borrower_id=loan.borrower_id,
+            )
+            for group in groups.values() for loan in group
+        ], ignore_conflicts=True)
+    stats.chunks += 1
+    stats.borrowers += len(groups)
+    stats.messages += len(messages)
+    stats.loans += sum(len(group) for group in groups.values())
+
+
+def send_notifications(today=None, days_ahead=DAYS_AHEAD, chunk_size=CHUNK_SIZE,
+                       dry_run=False, connection=None):
+    """
+    Una pasada completa sobre los avisos pendientes. Devuelve
+    NotificationStats.
+    """
+    today = today or date.today()
+    stats = NotificationStats()
+    started = time.monotonic()
+    connection = connection or get_connection()
+    last_borrower = 0
+    with connection:
+        while True:
+            borrower_ids = list(
+                pending(today, days_ahead).filter(borrower_id__gt=last_borrower)
+                .order_by('borrower_id').values_list('borrower_id', flat=True)
+                .distinct()[:chunk_size]
+            )
+            if not borrower_ids:
+                break
+            send_chunk(borrower_ids, today, days_ahead, connection, stats, dry_run)
+            last_borrower = borrower_ids[-1]
+    stats.elapsed = time.monotonic() - started
+    return stats
@@ -0,0 +1,237 @@
+"""
+Paginacion por cursor (keyset / seek).
+
+En vez de OFFSET + COUNT(*), cada pagina se pide con un token
+opaco que guarda los valores de las columnas de ordenacion de la
+ultima (o primera) fila vista. La consulta filtra con
+WHERE (col1, ..., id) > (valores) y un LIMIT, asi el coste no
+crece con el numero de pagina y no hace falta contar el total.
+"""
+from django.core import signing
+from django.db.models import F, Q
+from django.http import Http404
+
+CURSOR_SALT = 'catalog.pagination.cursor'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    """
+    Pagina obtenida con un cursor.
+    Expone la misma API basica que django.core.paginator.Page
+    (object_list, has_next, has_previous...) mas los tokens.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def resolve_keys(model, ordering):
+    """
+    Convierte la ordenacion en una lista de (field, desc) y añade
+    la pk como desempate si no esta incluida.
+    """
+    opts = model._meta
+    keys = []
+    for name in ordering:
+        desc = name.startswith('-')
+        name = name.lstrip('-')
+        field = opts.pk if name == 'pk' else opts.get_field(name)
+        keys.append((field, desc))
+    if not any(field == opts.pk for field, _ in keys):
+        keys.append((opts.pk, False))
+    return keys
+
+
+def keyset_order_by(keys, reverse=False):
+    """
+    Expresiones ORDER BY del recorrido hacia delante (o al reves).
+    Los NULL quedan siempre al final del recorrido hacia delante.
+    """
+    exprs = []
+    for field, desc in keys:
+        col = F(field.attname)
+        # Solo se fija la posicion de los NULL en columnas que los admiten:
+        # en las demas el ORDER BY sigue pudiendo recorrer un indice
+        nulls = {'nulls_first': reverse, 'nulls_last': not reverse} if field.null else {}
+        if desc != reverse:
+            exprs.append(col.desc(**nulls))
+        else:
+            exprs.append(col.asc(**nulls))
+    return exprs
+
+
+class CursorPaginator:
+    """
+    Paginador keyset sobre un queryset.
+
+    ordering: nombres de campos locales del modelo, con '-' para orden
+    descendente. Se añade la pk como desempate si no esta incluida.
+    count_total: si es True, `count` hace un COUNT(*) (opcional).
+    """
+    def __init__(self, queryset, per_page, ordering, count_total=False):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.count_total = count_total
+        self.keys = resolve_keys(queryset.model, ordering)
+
+    # Tokens
+    def encode_cursor(self, direction, obj):
+        values = []
+        for field, _ in self.keys:
+            value = getattr(obj, field.attname)
+            values.append(None if value is None else field.value_to_string(obj))
+        return signing.dumps([direction, values], salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, token):
+        try:
+            direction, values = signing.loads(token, salt=CURSOR_SALT)
+            if direction not in ('n', 'p') or len(values) != len(self.keys):
+                raise ValueError
+            values = [
+                None if value is None else field.to_python(value)
+                for (field, _), value in zip(self.keys, values)
+            ]
+        except (signing.BadSignature, ValueError, TypeError) as exc:
+            raise InvalidCursor(str(exc)) from exc
+        return direction, values
+
+    # Condiciones keyset
+    def _strictly(self, field, desc, value, after):
+        """
+        Condicion "field va estrictamente despues/antes de value"
+        en el orden hacia delante (NULL al final).
+        """
+        name = field.attname
+        if after:
+            if value is None:
+                return None
+            q = Q(**{f'{name}__{"lt" if desc else "gt"}': value})
+            if field.null:
+                q |= Q(**{f'{name}__isnull': True})
+            return q
+        if value is None:
+            return Q(**{f'{name}__isnull': False})
+        return Q(**{f'{name}__{"gt" if desc else "lt"}': value})
+
+    def _equal(self, field, value):
+        if value is None:
+            return Q(**{f'{field.attname}__isnull': True})
+        return Q(**{field.attname: value})
+
+    def seek(self, values, after=True):
+        """
+        Q con las filas posteriores (o anteriores) a la clave dada
+        """
+        condition = Q(pk__in=[])
+        prefix = Q()
+        for (field, desc), value in zip(self.keys, values):
+            strictly = self._strictly(field, desc, value, after)
+            if strictly is not None:
+                condition |= prefix & strictly
+            prefix &= self._equal(field, value)
+        return condition
+
+    # Paginas
+    def count(self):
+        if not self.count_total:
+            return None
+        return self.queryset.count()
+
+    def page(self, cursor=None):
+        """
+        Devuelve la CursorPage para el token dado (None = primera pagina)
+        """
+        direction, values = ('n', None) if not cursor else self.decode_cursor(cursor)
+        queryset = self.queryset
+        if direction == 'n':
+            if values is not None:
+                queryset = queryset.filter(self.seek(values, after=True))
+            queryset = queryset.order_by(*keyset_order_by(self.keys))
+        else:
+            queryset = queryset.filter(self.seek(values, after=False))
+            queryset = queryset.order_by(*keyset_order_by(self.keys, reverse=True))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'n':
+            has_next, has_previous = has_more, values is not None
+        else:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor('n', rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor('p', rows[0])
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin:
+    """
+    Mixin para ListView que añade el modo de paginacion por cursor.
+
+    cursor_ordering: columnas de ordenacion (la pk se añade sola).
+    pagination_mode: 'page' (OFFSET, por defecto) o 'cursor'.
+    Pasando ?cursor= en la url se usa el modo cursor en cualquier caso.
+    cursor_count_total: hacer tambien el COUNT(*) en modo cursor.
+    """
+    cursor_ordering = ()
+    pagination_mode = 'page'
+    cursor_kwarg = 'cursor'
+    cursor_count_total = False
+
+    def get_cursor_paginator(self, queryset, page_size):
+        return CursorPaginator(
+            queryset, page_size, self.cursor_ordering,
+            count_total=self.cursor_count_total
+        )
+
+    def get_pagination_mode(self):
+        if self.cursor_kwarg in self.request.GET:
+            return 'cursor'
+        return self.pagination_mode
+
+    def get_ordering(self):
+        # Mismo orden en ambos modos para que los enlaces sean coherentes
+        return keyset_order_by(resolve_keys(self.model, self.cursor_ordering))
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.get_pagination_mode() != 'cursor':
+            return super().paginate_queryset(queryset, page_size)
+        paginator = self.get_cursor_paginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Cursor de paginacion no valido')
+        return (paginator, page, page.object_list, page.has_other_pages())
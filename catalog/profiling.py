@@ -0,0 +1,192 @@
+"""
+Perfilado por peticion con cabecera Server-Timing.
+
+ProfilingMiddleware (opcional, ver settings) mide una fraccion de las
+peticiones (CATALOG_PROFILING_SAMPLE_RATE, de 0 a 1) y para cada una
+añade la cabecera
+
+    Server-Timing: total;dur=41.2, view;dur=35.0, db;dur=12.3;desc="7 queries",
+                   tpl;dur=18.9, mw;dur=6.2
+
+y escribe una linea JSON en el logger 'catalog.profiling':
+
+  total  toda la peticion desde este middleware
+  view   desde process_view hasta la respuesta (vista + plantilla
+         de TemplateResponse + middleware posteriores a la vista)
+  db     tiempo y numero de consultas SQL
+  tpl    render de plantillas (las de primer nivel; los include y
+         extends van dentro)
+  mw     total - view: sesion, autenticacion, csrf...
+
+Las consultas se cuentan con un execute_wrapper que se instala en cada
+conexion al abrirla (catalog/signals.py) y solo hace algo si la
+peticion esta muestreada. El estado va en una ContextVar, asi que
+tambien cuenta las consultas que las vistas asincronas lanzan en su
+pool de hilos (sync_to_async copia el contexto).
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template import TemplateDoesNotExist
+
+logger = logging.getLogger('catalog.profiling')
+
+_current = contextvars.ContextVar('catalog_profile', default=None)
+
+
+class Profile:
+    __slots__ = ('started', 'view_started', 'view', 'db_time', 'db_count', 'template')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view = 0.0
+        self.db_time = 0.0
+        self.db_count = 0
+        self.template = 0.0
+
+    def timings(self):
+        """
+        (nombre, ms, descripcion) de cada metrica
+        """
+        total = (time.perf_counter() - self.started) * 1000
+        view = self.view * 1000
+        return [
+            ('total', total, None),
+            ('view', view, None),
+            ('db', self.db_time * 1000, f'{self.db_count} queries'),
+            ('tpl', self.template * 1000, None),
+            ('mw', max(total - view, 0.0), None),
+        ]
+
+
+def current():
+    return _current.get()
+
+
+def sample_rate():
+    return getattr(settings, 'CATALOG_PROFILING_SAMPLE_RATE', 0)
+
+
+# Base de datos
+def record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_time += time.perf_counter() - started
+        profile.db_count += 1
+
+
+def install(connection):
+    """
+    Engancha record_query a la conexion (una vez por conexion)
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Plantillas
+class ProfiledTemplate(Template):
+
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template += time.perf_counter() - started
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """
+    Backend DjangoTemplates que mide el render (TEMPLATES['BACKEND'])
+    """
+    def from_string(self, template_code):
+        return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return ProfiledTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+# Middleware
+def server_timing(timings):
+    parts = []
+    for name, duration, description in timings:
+        part = f'{name};dur={duration:.1f}'
+        if description:
+            part += f';desc="{description}"'
+        parts.append(part)
+    return ', '.join(parts)
+
+
+class ProfilingMiddleware:
+    """
+    Mide las peticiones muestreadas (ver docstring del modulo).
+    Sirve en modo sincrono y asincrono (ASGI).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if random.random() >= sample_rate():
+            return self.get_response(request)
+        token = _current.set(Profile())
+        try:
+            response = self.get_response(request)
+            return self.finish(request, response)
+        finally:
+            _current.reset(token)
+
+    async def __acall__(self, request):
+        if random.random() >= sample_rate():
+            return await self.get_response(request)
+        token = _current.set(Profile())
+        try:
+            response = await self.get_response(request)
+            return self.finish(request, response)
+        finally:
+            _current.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current.get()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
+
+    def finish(self, request, response):
+        profile = _current.get()
+        if profile.view_started is not None:
+            profile.view = time.perf_counter() - profile.view_started
+        timings = profile.timings()
+        response['Server-Timing'] = server_timing(timings)
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': profile.db_count,
+            **{f'{name}_ms': round(duration, 2) for name, duration, _ in timings},
+        }))
+        return response
@@ -0,0 +1,236 @@
+"""
+Registro de consultas lentas y estadisticas por huella de SQL.
+
+Con CATALOG_QUERY_LOG activo, un execute_wrapper en cada conexion
+(catalog/signals.py) agrupa todas las consultas por huella: el SQL
+normalizado (literales y listas IN sustituidos por ?), de modo que
+las N consultas de un N+1 caen en la misma huella. Por huella y vista
+(QueryLogMiddleware pone el nombre de la url) se acumulan numero,
+tiempo total y maximo.
+
+Cada CATALOG_QUERY_LOG_FLUSH_SECONDS (y al salir del proceso) se
+escribe una linea JSON por huella y vista en el logger
+'catalog.querylog' (en settings, un RotatingFileHandler):
+
+    {"type": "stats", "fingerprint": ..., "view": ..., "count": ...,
+     "total_ms": ..., "max_ms": ..., "sql": ...}
+
+Las sentencias SELECT que pasan de CATALOG_QUERY_LOG_SLOW_MS se
+escriben al momento con su plan (EXPLAIN, una vez por huella y
+periodo):
+
+    {"type": "slow", ..., "duration_ms": ..., "explain": [...]}
+
+`manage.py query_report` lee el fichero (y sus rotaciones) y ordena
+las huellas que mas tiempo consumen.
+"""
+import asyncio
+import atexit
+import contextvars
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger('catalog.querylog')
+
+SLOW_MS = 100
+FLUSH_SECONDS = 60
+# Prefijo de EXPLAIN por motor (sin ANALYZE: no ejecuta la consulta)
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+}
+
+# [nombre de la vista] de la peticion en curso
+_view = contextvars.ContextVar('catalog_querylog_view', default=None)
+_explaining = contextvars.ContextVar('catalog_querylog_explaining', default=False)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def normalize(sql):
+    """
+    SQL sin literales: 'a' y 42 pasan a ?, IN (?, ?, ...) a IN (...)
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    return hashlib.md5(normalize(sql).encode()).hexdigest()[:12]
+
+
+def enabled():
+    return getattr(settings, 'CATALOG_QUERY_LOG', False)
+
+
+class Collector:
+    """
+    Acumulados en memoria del proceso, protegidos con un lock (las
+    vistas asincronas consultan desde varios hilos)
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stats = {}
+        self.explained = set()
+        self.last_flush = time.monotonic()
+
+    def add(self, sql, duration, view):
+        key = (fingerprint(sql), view)
+        with self.lock:
+            entry = self.stats.get(key)
+            if entry is None:
+                entry = self.stats[key] = {'sql': normalize(sql), 'count': 0, 'total': 0.0, 'max': 0.0}
+            entry['count'] += 1
+            entry['total'] += duration
+            entry['max'] = max(entry['max'], duration)
+            due = time.monotonic() - self.last_flush >= getattr(
+                settings, 'CATALOG_QUERY_LOG_FLUSH_SECONDS', FLUSH_SECONDS
+            )
+        if due:
+            self.flush()
+
+    def should_explain(self, sql):
+        with self.lock:
+            code = fingerprint(sql)
+            if code in self.explained:
+                return False
+            self.explained.add(code)
+            return True
+
+    def flush(self):
+        with self.lock:
+            stats = self.stats
+            self.reset()
+        for (code, view), entry in stats.items():
+            logger.info(json.dumps({
+                'type': 'stats',
+                'fingerprint': code,
+                'view': view,
+                'count': entry['count'],
+                'total_ms': round(entry['total'] * 1000, 3),
+                'max_ms': round(entry['max'] * 1000, 3),
+                'sql': entry['sql'],
+            }))
+
+
+collector = Collector()
+atexit.register(collector.flush)
+
+
+def explain(connection, sql, params):
+    prefix = EXPLAIN_PREFIXES.get(connection.vendor)
+    if prefix is None:
+        return None
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except Exception as exc:
+        return [f'EXPLAIN failed: {exc}']
+    finally:
+        _explaining.reset(token)
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail): basta con el detalle
+        return [row[-1] for row in rows]
+    return [' '.join(str(col) for col in row) for row in rows]
+
+
+def record_query(execute, sql, params, many, context):
+    if _explaining.get() or not enabled():
+        return execute(sql, params, many, context)
+    holder = _view.get()
+    view = holder[0] if holder else None
+    started = time.perf_counter()
+    try:
+        result = execute(sql, params, many, context)
+    except Exception:
+        collector.add(sql, time.perf_counter() - started, view)
+        raise
+    duration = time.perf_counter() - started
+    collector.add(sql, duration, view)
+    # EXPLAIN solo tras una ejecucion correcta (en PostgreSQL un
+    # error abortaria la transaccion)
+    if duration * 1000 >= getattr(settings, 'CATALOG_QUERY_LOG_SLOW_MS', SLOW_MS):
+        log_slow(context['connection'], sql, params, many, duration, view)
+    return result
+
+
+def log_slow(connection, sql, params, many, duration, view):
+    plan = None
+    if not many and sql.lstrip()[:6].upper() == 'SELECT' and collector.should_explain(sql):
+        plan = explain(connection, sql, params)
+    logger.info(json.dumps({
+        'type': 'slow',
+        'fingerprint': fingerprint(sql),
+        'view': view,
+        'duration_ms': round(duration * 1000, 3),
+        'sql': normalize(sql),
+        'explain': plan,
+    }))
+
+
+def install(connection):
+    """
+    Engancha record_query a la conexion (una vez por conexion)
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class QueryLogMiddleware:
+    """
+    Asocia las consultas de la peticion al nombre de su url.
+    Sirve en modo sincrono y asincrono (ASGI).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = _view.set([None])
+        try:
+            return self.get_response(request)
+        finally:
+            _view.reset(token)
+
+    async def __acall__(self, request):
+        token = _view.set([None])
+        try:
+            return await self.get_response(request)
+        finally:
+            _view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Se modifica la lista en vez de la ContextVar: bajo ASGI
+        # process_view puede ir en otro hilo con una copia del contexto
+        holder = _view.get()
+        if holder is not None:
+            match = request.resolver_match
+            holder[0] = match.view_name if match else request.path
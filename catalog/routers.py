@@ -0,0 +1,124 @@
+"""
+Enrutado de lecturas a replicas y escrituras al primario.
+
+Las replicas se declaran en settings.CATALOG_READ_REPLICAS (alias de
+DATABASES). Sin replicas todo va a 'default', como antes.
+
+Lectura de lo propio escrito: tras un POST (o cualquier metodo que
+no sea seguro) ReplicaPinMiddleware fija el primario para el resto
+de esa peticion y deja una cookie que lo mantiene durante
+CATALOG_REPLICA_PIN_SECONDS, el retraso de replicacion aceptado.
+Dentro de una transaccion en el primario tambien se lee de el.
+"""
+import asyncio
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE_NAME = 'catalog_pin_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_pinned = contextvars.ContextVar('catalog_pin_primary', default=False)
+
+
+def replicas():
+    return list(getattr(settings, 'CATALOG_READ_REPLICAS', []))
+
+
+def pin_primary():
+    """
+    Lecturas al primario en el contexto actual. Devuelve el token
+    para unpin()
+    """
+    return _pinned.set(True)
+
+
+def unpin(token):
+    _pinned.reset(token)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+class ReplicaRouter:
+    """
+    Lecturas a una replica al azar, escrituras y migraciones al primario
+    """
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or is_pinned():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Todas las bbdd tienen los mismos datos
+        pool = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    """
+    Fija el primario tras una escritura (ver docstring del modulo).
+    Sirve en modo sincrono y asincrono (ASGI).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Como MiddlewareMixin: Django tiene que verlo como corrutina
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not replicas():
+            return self.get_response(request)
+        token = self.pin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                unpin(token)
+        return self.remember(request, response)
+
+    async def __acall__(self, request):
+        if not replicas():
+            return await self.get_response(request)
+        token = self.pin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                unpin(token)
+        return self.remember(request, response)
+
+    def pin(self, request):
+        if request.method not in SAFE_METHODS or PIN_COOKIE_NAME in request.COOKIES:
+            return pin_primary()
+        return None
+
+    def remember(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE_NAME, '1',
+                max_age=getattr(settings, 'CATALOG_REPLICA_PIN_SECONDS', 15),
+                httponly=True, samesite='Lax',
+            )
+        return response
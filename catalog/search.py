@@ -0,0 +1,260 @@
+"""
+Busqueda de texto completo sobre libros y autores.
+
+Se apoya en un indice invertido de la propia bbdd:
+- SQLite: tablas virtuales FTS5 (catalog_book_fts, catalog_author_fts)
+  con rowid = pk, mantenidas desde las señales de catalog/signals.py.
+- PostgreSQL: indices GIN sobre la expresion tsvector de cada tabla,
+  que la bbdd mantiene sola.
+Con cualquier otro motor se recurre a icontains (sin indice).
+
+Las tablas e indices se crean en la migracion 0005_search_index.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Book, Author
+
+BOOK_FTS_TABLE = 'catalog_book_fts'
+AUTHOR_FTS_TABLE = 'catalog_author_fts'
+
+# Expresiones tsvector de PostgreSQL. Deben coincidir con las de los
+# indices GIN de la migracion para que el planificador los use.
+PG_BOOK_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(isbn, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(summary, '')), 'C')"
+)
+PG_AUTHOR_VECTOR = (
+    "to_tsvector('simple', coalesce(first_name, '') || ' ' || "
+    "coalesce(last_name, ''))"
+)
+
+
+def tokenize(query):
+    """
+    Palabras de la consulta del usuario, en minusculas.
+    Todo lo que no sea \\w se descarta, asi no se cuela sintaxis
+    de FTS5 ni de tsquery.
+    """
+    return re.findall(r'\w+', query.lower())
+
+
+class SQLiteBackend:
+    """
+    FTS5. Cada palabra se busca como prefijo y se combinan con AND.
+    El ranking es bm25 con mas peso para title e isbn que para summary.
+    """
+    tables = {
+        Book: (BOOK_FTS_TABLE, ('title', 'summary', 'isbn'), 'bm25({t}, 10.0, 1.0, 5.0)'),
+        Author: (AUTHOR_FTS_TABLE, ('first_name', 'last_name'), 'bm25({t})'),
+    }
+
+    def match(self, tokens):
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def count(self, model, tokens):
+        table = self.tables[model][0]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {table} WHERE {table} MATCH %s',
+                [self.match(tokens)]
+            )
+            return cursor.fetchone()[0]
+
+    def ranked_ids(self, model, tokens, offset, limit):
+        table, _, rank = self.tables[model]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {table} WHERE {table} MATCH %s '
+                f'ORDER BY {rank.format(t=table)}, rowid LIMIT %s OFFSET %s',
+                [self.match(tokens), limit, offset]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index(self, model, objs):
+        table, columns, _ = self.tables[model]
+        objs = list(objs)
+        if not objs:
+            return
+        placeholders = ', '.join(['%s'] * (len(columns) + 1))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {table} WHERE rowid = %s',
+                [[obj.pk] for obj in objs]
+            )
+            cursor.executemany(
+                f'INSERT INTO {table} (rowid, {", ".join(columns)}) '
+                f'VALUES ({placeholders})',
+                [[obj.pk] + [getattr(obj, c) or '' for c in columns] for obj in objs]
+            )
+
+    def unindex(self, model, pks):
+        table = self.tables[model][0]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {table} WHERE rowid = %s', [[pk] for pk in pks]
+            )
+
+    def rebuild(self, model):
+        table, columns, _ = self.tables[model]
+        source = model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(
+                f'INSERT INTO {table} (rowid, {", ".join(columns)}) '
+                f'SELECT id, {", ".join(f"coalesce({c}, %s)" for c in columns)} '
+                f'FROM {source}',
+                [''] * len(columns)
+            )
+
+
+class PostgreSQLBackend:
+    """
+    tsvector + GIN. Cada palabra se busca como prefijo (:*) con AND.
+    """
+    vectors = {
+        Book: PG_BOOK_VECTOR,
+        Author: PG_AUTHOR_VECTOR,
+    }
+
+    def tsquery(self, tokens):
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def count(self, model, tokens):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {model._meta.db_table} '
+                f"WHERE {self.vectors[model]} @@ to_tsquery('simple', %s)",
+                [self.tsquery(tokens)]
+            )
+            return cursor.fetchone()[0]
+
+    def ranked_ids(self, model, tokens, offset, limit):
+        vector = self.vectors[model]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM {model._meta.db_table}, "
+                f"to_tsquery('simple', %s) query "
+                f'WHERE {vector} @@ query '
+                f'ORDER BY ts_rank({vector}, query) DESC, id '
+                f'LIMIT %s OFFSET %s',
+                [self.tsquery(tokens), limit, offset]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    # La bbdd mantiene los indices GIN por si sola
+    def index(self, model, objs):
+        pass
+
+    def unindex(self, model, pks):
+        pass
+
+    def rebuild(self, model):
+        pass
+
+
+class FallbackBackend:
+    """
+    Motores sin indice de texto: icontains sobre cada campo.
+    """
+    fields = {
+        Book: ('title', 'summary', 'isbn'),
+        Author: ('first_name', 'last_name'),
+    }
+
+    def queryset(self, model, tokens):
+        queryset = model.objects.all()
+        for token in tokens:
+            condition = Q()
+            for field in self.fields[model]:
+                condition |= Q(**{f'{field}__icontains': token})
+            queryset = queryset.filter(condition)
+        return queryset
+
+    def count(self, model, tokens):
+        return self.queryset(model, tokens).count()
+
+    def ranked_ids(self, model, tokens, offset, limit):
+        return list(
+            self.queryset(model, tokens).order_by('pk')
+            .values_list('pk', flat=True)[offset:offset + limit]
+        )
+
+    def index(self, model, objs):
+        pass
+
+    def unindex(self, model, pks):
+        pass
+
+    def rebuild(self, model):
+        pass
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'postgresql': PostgreSQLBackend,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, FallbackBackend)()
+
+
+class SearchResults:
+    """
+    Resultados ordenados por relevancia, paginables con
+    django.core.paginator.Paginator: count() y slicing piden a la
+    bbdd solo la pagina de ids y luego cargan esos objetos.
+    """
+    def __init__(self, model, query, queryset=None):
+        self.model = model
+        self.tokens = tokenize(query)
+        self.queryset = queryset if queryset is not None else model.objects.all()
+        self.backend = get_backend()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = (
+                self.backend.count(self.model, self.tokens) if self.tokens else 0
+            )
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        if not self.tokens or stop <= start:
+            return []
+        ids = self.backend.ranked_ids(self.model, self.tokens, start, stop - start)
+        objs = self.queryset.in_bulk(ids)
+        return [objs[pk] for pk in ids if pk in objs]
+
+
+def search_books(query):
+    return SearchResults(Book, query, Book.objects.for_list())
+
+
+def search_authors(query):
+    return SearchResults(Author, query)
+
+
+def index_objects(model, objs):
+    get_backend().index(model, objs)
+
+
+def unindex_objects(model, pks):
+    get_backend().unindex(model, pks)
+
+
+def rebuild_index():
+    backend = get_backend()
+    for model in (Book, Author):
+        backend.rebuild(model)
@@ -0,0 +1,250 @@
+"""
+Receptores de señales del catalogo.
+Se conectan en CatalogConfig.ready()
+"""
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete, pre_delete, pre_save
+from django.contrib.auth.models import Group, Permission, User
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import autocomplete, fragments, metrics, profiling, querylog, sqlite
+from .isbn import normalize as normalize_isbn
+from .backends import invalidate_all_permissions, invalidate_user_permissions
+from .models import Book, BookInstance, Author, Genre, Language
+from .search import index_objects, unindex_objects
+from .stats import invalidate_index_stats
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_index_stats_on_change(sender, **kwargs):
+    """
+    Cualquier alta, cambio o baja invalida los contadores del index
+    """
+    invalidate_index_stats()
+
+
+@receiver(pre_save, sender=Book)
+def normalize_book_isbn(sender, instance, **kwargs):
+    instance.isbn_normalized = normalize_isbn(instance.isbn)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+def update_search_index(sender, instance, **kwargs):
+    """
+    Mantiene al dia el indice de texto completo (SQLite FTS5)
+    """
+    index_objects(sender, [instance])
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_objects(sender, [instance.pk])
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+def update_autocomplete(sender, instance, **kwargs):
+    """
+    Refresca las entradas de autocompletado del objeto guardado
+    """
+    autocomplete.refresh(sender, [instance])
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    autocomplete.remove(sender, [instance.pk])
+
+
+@receiver(post_init, sender=BookInstance)
+def remember_loaded_book(sender, instance, **kwargs):
+    """
+    Guarda el libro con el que se cargo la copia, para refrescar
+    tambien sus contadores si la copia cambia de libro. Con .only()
+    sin book se deja en None para no lanzar una consulta por copia.
+    """
+    instance._loaded_book_id = instance.__dict__.get('book_id')
+
+
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+def refresh_book_availability(sender, instance, **kwargs):
+    """
+    Recalcula en la bbdd la disponibilidad de los libros afectados
+    (marcandolos como modificados) y sube la version de sus
+    fragmentos cacheados
+    """
+    book_ids = {instance.book_id, getattr(instance, '_loaded_book_id', None)}
+    book_ids.discard(None)
+    if book_ids:
+        Book.objects.filter(pk__in=book_ids).refresh_availability(touch=True)
+        fragments.bump_books(book_ids)
+    instance._loaded_book_id = instance.book_id
+
+
+@receiver(post_init, sender=Book)
+def remember_loaded_author(sender, instance, **kwargs):
+    """
+    Autor con el que se cargo el libro: si cambia, las dos fichas
+    de autor tienen que invalidarse (None si author esta diferido)
+    """
+    instance._loaded_author_id = instance.__dict__.get('author_id')
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def bump_book_fragments(sender, instance, **kwargs):
+    """
+    La ficha del autor lista sus libros: se marca como modificada
+    """
+    author_ids = {instance.author_id, getattr(instance, '_loaded_author_id', None)}
+    author_ids.discard(None)
+    if author_ids:
+        Author.objects.filter(pk__in=author_ids).touch()
+    fragments.bump(
+        fragments.scope('book', instance.pk),
+        *(fragments.scope('author', pk) for pk in author_ids)
+    )
+    instance._loaded_author_id = instance.author_id
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def bump_genre_fragments(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Generos de un libro (book.genre) o libros de un genero (genre.book_set)
+    """
+    if action == 'pre_clear' and reverse:
+        # genre.book_set.clear(): despues ya no se sabe que libros tenia
+        Book.objects.filter(genre=instance).touch()
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        Book.objects.filter(pk=instance.pk).touch()
+        fragments.bump_books([instance.pk])
+    elif pk_set:
+        Book.objects.filter(pk__in=pk_set).touch()
+        fragments.bump_books(pk_set)
+    else:
+        fragments.bump(fragments.GLOBAL)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def bump_author_fragments(sender, instance, **kwargs):
+    fragments.bump(fragments.scope('author', instance.pk))
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Language)
+def bump_global_fragments(sender, **kwargs):
+    """
+    Generos e idiomas aparecen en muchas fichas: generacion global
+    """
+    fragments.bump(fragments.GLOBAL)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Genre)
+def touch_genre_books(sender, instance, **kwargs):
+    """
+    Los libros del genero muestran su nombre
+    """
+    Book.objects.filter(genre=instance).touch()
+
+
+@receiver(post_save, sender=Language)
+@receiver(pre_delete, sender=Language)
+def touch_language_books(sender, instance, **kwargs):
+    """
+    Libros del idioma y las fichas de sus autores (titulo[iso_code])
+    """
+    books = Book.objects.filter(language=instance)
+    Author.objects.filter(pk__in=books.values('author_id')).touch()
+    books.touch()
+
+
+@receiver(pre_delete, sender=Author)
+def touch_author_books(sender, instance, **kwargs):
+    """
+    Al borrar el autor sus libros quedan sin autor (SET_NULL sin señales)
+    """
+    Book.objects.filter(author=instance).touch()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_permission_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    user.groups / user.user_permissions y sus inversas
+    (group.user_set, permission.user_set)
+    """
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_user_permissions([instance.pk])
+    elif pk_set:
+        invalidate_user_permissions(pk_set)
+    else:
+        invalidate_all_permissions()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_saved_user_permissions(sender, instance, **kwargs):
+    """
+    is_active e is_superuser cambian el resultado
+    """
+    invalidate_user_permissions([instance.pk])
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_all_permission_cache(sender, **kwargs):
+    if kwargs.get('action', 'post_').startswith('post_'):
+        invalidate_all_permissions()
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    PRAGMAs de settings.SQLITE_PRAGMAS (ver catalog/sqlite.py)
+    """
+    sqlite.configure_connection(connection)
+
+
+@receiver(connection_created)
+def profile_connection_queries(sender, connection, **kwargs):
+    """
+    Cuenta las consultas de las peticiones perfiladas (catalog/profiling.py)
+    """
+    profiling.install(connection)
+
+
+@receiver(connection_created)
+def log_connection_queries(sender, connection, **kwargs):
+    """
+    Huellas y consultas lentas (catalog/querylog.py)
+    """
+    querylog.install(connection)
+
+
+@receiver(connection_created)
+def count_connection_queries(sender, connection, **kwargs):
+    """
+    Consultas por vista para /metrics (catalog/metrics.py)
+    """
+    metrics.install(connection)
@@ -0,0 +1,54 @@
+"""
+PRAGMAs de SQLite aplicados al abrir cada conexion.
+
+El receptor de connection_created (catalog/signals.py) ejecuta los
+de settings.SQLITE_PRAGMAS en cada conexion SQLite nueva. Con
+CONN_MAX_AGE la conexion se reutiliza entre peticiones y esto solo
+ocurre una vez por proceso y alias.
+
+  journal_mode=WAL      los lectores no bloquean al escritor ni al
+                        reves (persistente en el fichero)
+  synchronous=NORMAL    en WAL, fsync solo en los checkpoints
+  busy_timeout          ms de espera a que se libere el bloqueo
+                        antes de "database is locked"
+  cache_size            paginas (o KiB si es negativo) en memoria
+  mmap_size             bytes leidos via mmap en vez de read()
+
+El comando benchmark_sqlite compara perfiles.
+"""
+from django.conf import settings
+
+# Orden de aplicacion: journal_mode antes que synchronous
+PRAGMA_ORDER = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size')
+
+
+def configured_pragmas():
+    return getattr(settings, 'SQLITE_PRAGMAS', {})
+
+
+def apply_pragmas(cursor, pragmas):
+    """
+    Ejecuta los PRAGMA sobre un cursor DB-API (de Django o de sqlite3)
+    """
+    names = sorted(
+        pragmas,
+        key=lambda name: PRAGMA_ORDER.index(name) if name in PRAGMA_ORDER else len(PRAGMA_ORDER)
+    )
+    for name in names:
+        if not name.isidentifier():
+            raise ValueError(f'PRAGMA no valido: {name}')
+        value = pragmas[name]
+        if not isinstance(value, int) and not str(value).isidentifier():
+            raise ValueError(f'Valor no valido para PRAGMA {name}: {value}')
+        cursor.execute(f'PRAGMA {name} = {value}')
+        # journal_mode devuelve una fila; hay que consumirla
+        cursor.fetchall()
+
+
+def configure_connection(connection):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = configured_pragmas()
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, pragmas)
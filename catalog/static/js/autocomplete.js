@@ -0,0 +1,49 @@
+// Autocompletado de los campos con data-autocomplete-url.
+// Pide sugerencias al endpoint JSON y rellena su <datalist>.
+// Con data-autocomplete-target (selector de objetos de los formularios)
+// guarda ademas el id de la sugerencia elegida en ese input oculto.
+(function () {
+  function attach(input) {
+    var list = document.getElementById(input.getAttribute('list'));
+    var target = document.getElementById(input.dataset.autocompleteTarget);
+    var timer = null;
+    var lastQuery = '';
+    input.addEventListener('input', function () {
+      if (target) {
+        var chosen = Array.prototype.find.call(list.options, function (option) {
+          return option.value === input.value;
+        });
+        target.value = chosen ? chosen.dataset.id : '';
+        if (chosen) {
+          return;
+        }
+      }
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var query = input.value.trim();
+        if (!query || query === lastQuery) {
+          return;
+        }
+        lastQuery = query;
+        var url = input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query);
+        if (input.dataset.autocompleteKind) {
+          url += '&kind=' + input.dataset.autocompleteKind;
+        }
+        fetch(url, {credentials: 'same-origin'})
+          .then(function (resp) { return resp.json(); })
+          .then(function (data) {
+            list.innerHTML = '';
+            data.results.forEach(function (item) {
+              var option = document.createElement('option');
+              option.value = item.label;
+              option.dataset.id = item.id;
+              list.appendChild(option);
+            });
+          });
+      }, 150);
+    });
+  }
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('input[data-autocomplete-url]').forEach(attach);
+  });
+})();
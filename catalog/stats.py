@@ -0,0 +1,84 @@
+"""
+Contadores de la pagina de inicio.
+
+Los seis COUNT del index se resuelven en una sola consulta
+(subconsultas escalares) y el resultado se guarda en cache un
+tiempo corto. Las señales de catalog/signals.py invalidan la
+entrada cuando cambia Book, BookInstance, Author o Genre.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+
+from .models import Book, BookInstance, Author, Genre
+
+INDEX_STATS_CACHE_KEY = 'catalog:index-stats'
+
+# Texto buscado en el contador de titulos del index
+INDEX_TITLE_SEARCH = 'harry'
+
+
+def _count_sql(queryset):
+    """
+    Devuelve (sql, params) de un SELECT COUNT(*) sobre el queryset.
+    Se proyecta solo la pk para que la subconsulta sea ligera.
+    """
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    return f'SELECT COUNT(*) FROM ({sql}) U', params
+
+
+def _index_querysets():
+    """
+    Querysets a contar, en el orden en que se devuelven los contadores.
+    """
+    return (
+        ('num_books', Book.objects.all()),
+        ('num_instances', BookInstance.objects.all()),
+        ('num_instances_available', BookInstance.objects.filter(
+            status__exact='a'
+        )),
+        ('num_authors', Author.objects.all()),
+        ('num_genres', Genre.objects.all()),
+        ('num_titles_search', Book.objects.filter(
+            title__icontains=INDEX_TITLE_SEARCH
+        )),
+    )
+
+
+def compute_index_stats():
+    """
+    Calcula todos los contadores del index con una unica consulta.
+    """
+    names, parts, params = [], [], []
+    for name, queryset in _index_querysets():
+        sql, sql_params = _count_sql(queryset)
+        names.append(name)
+        parts.append(f'({sql})')
+        params.extend(sql_params)
+    # SQL directo: se elige la bbdd de lectura como haria el ORM
+    with connections[router.db_for_read(Book)].cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(parts), params)
+        row = cursor.fetchone()
+    return dict(zip(names, row))
+
+
+def get_index_stats():
+    """
+    Contadores del index, servidos desde cache si estan disponibles.
+    """
+    stats = cache.get(INDEX_STATS_CACHE_KEY)
+    if stats is None:
+        stats = compute_index_stats()
+        cache.set(
+            INDEX_STATS_CACHE_KEY,
+            stats,
+            getattr(settings, 'CATALOG_STATS_CACHE_TIMEOUT', 60)
+        )
+    return stats
+
+
+def invalidate_index_stats():
+    """
+    Borra los contadores cacheados (se recalculan en la siguiente visita).
+    """
+    cache.delete(INDEX_STATS_CACHE_KEY)
@@ -0,0 +1,27 @@
+"""
+Runner de los tests: la cache (de ficheros por defecto) va a un
+directorio temporal, para no leer ni pisar la de la instalacion
+"""
+import copy
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class CatalogTestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='locallibrary-test-cache-')
+        caches = copy.deepcopy(settings.CACHES)
+        caches['default']['LOCATION'] = self.cache_dir
+        self.cache_settings = override_settings(CACHES=caches)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
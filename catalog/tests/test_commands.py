@@ -0,0 +1,320 @@
+from django.test import TestCase
+
+# Tests de los comandos de manage.py
+
+import datetime
+from io import StringIO
+from django.core.management import call_command
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+
+class ClearExpiredSessionsCommandTest(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        for num in range(7):
+            Session.objects.create(
+                session_key='expired%s' % num, session_data='',
+                expire_date=now - datetime.timedelta(days=1))
+        Session.objects.create(
+            session_key='alive', session_data='',
+            expire_date=now + datetime.timedelta(days=1))
+
+    def test_deletes_only_expired_sessions_in_batches(self):
+        out = StringIO()
+        call_command('clear_expired_sessions', batch_size=3, stdout=out)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['alive'])
+        self.assertIn('7', out.getvalue())
+
+
+"""
+Importador de catalogo
+"""
+import json
+import os
+import tempfile
+from catalog.models import Author, Book, BookInstance, Genre, Language
+from catalog.search import search_books
+
+
+class ImportCatalogCommandTest(TestCase):
+
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_csv(self):
+        Author.objects.create(first_name='Frank', last_name='Herbert')
+        path = self.write('.csv', (
+            'title,summary,isbn,author_first_name,author_last_name,genres,language,language_name,copies,status\n'
+            'Dune,Desert,9780441013593,Frank,Herbert,Sci-Fi|Classic,EN,English,3,a\n'
+            'Dune Messiah,Desert again,9780593098233,frank,herbert,sci-fi,EN,,2,o\n'
+            ',no title,123,A,B,,EN,,1,a\n'
+            'Hamlet,Drama,9780140714548,William,Shakespeare,Drama|drama,EN,,0,\n'
+        ))
+        out, err = StringIO(), StringIO()
+        call_command('import_catalog', path, batch_size=2, stdout=out, stderr=err)
+
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(Language.objects.count(), 1)
+        self.assertEqual(sorted(Genre.objects.values_list('name', flat=True)), ['Classic', 'Drama', 'Sci-Fi'])
+        dune = Book.objects.get(title='Dune')
+        self.assertEqual(dune.author.last_name, 'Herbert')
+        self.assertEqual(dune.genre.count(), 2)
+        self.assertEqual(Book.objects.get(title='Hamlet').genre.count(), 1)
+        self.assertEqual(BookInstance.objects.count(), 5)
+        # Contadores e indice de busqueda al dia pese al bulk_create
+        self.assertEqual(dune.copies_available, 3)
+        self.assertEqual(Book.objects.get(title='Dune Messiah').copies_on_loan, 2)
+        self.assertEqual(len(search_books('messiah')[0:10]), 1)
+        self.assertIn('Fila 3', err.getvalue())
+        self.assertIn('Importados 3 libros y 5 copias', out.getvalue())
+
+    def test_import_jsonl(self):
+        rows = [
+            {'title': 'Book %s' % num, 'author_first_name': 'Ann', 'author_last_name': 'Smith',
+             'genres': ['Poetry'], 'language': 'ES', 'copies': 1}
+            for num in range(5)
+        ]
+        path = self.write('.jsonl', '\n'.join(json.dumps(row) for row in rows))
+        call_command('import_catalog', path, batch_size=2, stdout=StringIO())
+        self.assertEqual(Book.objects.filter(author__last_name='Smith', language__iso_code='ES').count(), 5)
+        self.assertEqual(BookInstance.objects.filter(status='a').count(), 5)
+
+    def test_invalid_rows_reported(self):
+        path = self.write('.jsonl', '\n'.join([
+            json.dumps({'title': 'Dune'}),
+            '{"title": "Broken',
+            '[1, 2]',
+            json.dumps({'title': 'Long genre', 'genres': ['x' * 201]}),
+            json.dumps({'title': 'Long language', 'language': 'ES', 'language_name': 'x' * 31}),
+            json.dumps({'title': 'Hamlet'}),
+        ]))
+        out, err = StringIO(), StringIO()
+        call_command('import_catalog', path, stdout=out, stderr=err)
+        self.assertEqual(sorted(Book.objects.values_list('title', flat=True)), ['Dune', 'Hamlet'])
+        self.assertIn('Fila 2: JSON no valido', err.getvalue())
+        self.assertIn('Fila 3: no es un objeto JSON', err.getvalue())
+        self.assertIn('Fila 4: genres supera 200', err.getvalue())
+        self.assertIn('Fila 5: language_name supera 30', err.getvalue())
+        self.assertIn('4 descartadas', out.getvalue())
+
+
+from django.contrib.auth.models import User
+from django.core import mail
+from catalog.models import LoanNotification
+
+
+class SendLoanNotificationsCommandTest(TestCase):
+
+    def setUp(self):
+        book = Book.objects.create(title='Dune', summary='Summary', isbn='1')
+        today = datetime.date.today()
+        self.ann = User.objects.create_user(username='ann', email='ann@example.com')
+        bob = User.objects.create_user(username='bob', email='bob@example.com')
+        nomail = User.objects.create_user(username='nomail')
+        for days, borrower in ((-5, self.ann), (2, self.ann), (1, bob), (20, bob), (-1, nomail)):
+            BookInstance.objects.create(book=book, status='o', borrower=borrower,
+                                        due_back=today + datetime.timedelta(days=days))
+
+    def test_one_message_per_borrower_and_idempotent(self):
+        out = StringIO()
+        call_command('send_loan_notifications', chunk_size=1, stdout=out)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['ann@example.com', 'bob@example.com'])
+        ann_mail = [m for m in mail.outbox if m.to == ['ann@example.com']][0]
+        self.assertIn('overdue', ann_mail.subject)
+        self.assertEqual(ann_mail.body.count('Dune'), 2)
+        self.assertEqual(LoanNotification.objects.count(), 3)
+        self.assertIn('2 mensajes', out.getvalue())
+
+        call_command('send_loan_notifications', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_renewal_notifies_again(self):
+        call_command('send_loan_notifications', stdout=StringIO())
+        loan = BookInstance.objects.get(borrower=self.ann, due_back__gt=datetime.date.today())
+        loan.due_back += datetime.timedelta(days=1)
+        loan.save()
+        call_command('send_loan_notifications', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_dry_run_sends_nothing(self):
+        call_command('send_loan_notifications', dry_run=True, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(LoanNotification.objects.exists())
+
+
+from django.db import connection
+
+
+class SqlitePragmasTest(TestCase):
+
+    def test_pragmas_applied_to_connection(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_benchmark_compares_profiles(self):
+        out = StringIO()
+        call_command('benchmark_sqlite', seconds=0.2, readers=1, writers=1,
+                     rows=50, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report), {'stock', 'wal'})
+        self.assertGreater(report['wal']['writes_per_second'], 0)
+
+
+class ImportCatalogIsbnTest(TestCase):
+
+    def test_duplicate_isbns_skipped(self):
+        Book.objects.create(title='Dune', summary='Summary', isbn='9780441013593')
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', encoding='utf-8') as stream:
+            stream.write(
+                'title,isbn,copies\n'
+                'Dune again,0-441-01359-7,1\n'
+                'Hamlet,9780140714548,1\n'
+                'Hamlet copy,978-0-14-071454-8,1\n'
+                'No isbn,,1\n'
+            )
+        self.addCleanup(os.remove, path)
+        err = StringIO()
+        call_command('import_catalog', path, stdout=StringIO(), stderr=err)
+        self.assertEqual(
+            sorted(Book.objects.values_list('title', flat=True)), ['Dune', 'Hamlet', 'No isbn']
+        )
+        self.assertEqual(Book.objects.get(title='Hamlet').isbn_normalized, '9780140714548')
+        self.assertIn('duplicado', err.getvalue())
+
+    def test_hyphenated_isbn13(self):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', encoding='utf-8') as stream:
+            stream.write('title,isbn,copies\nRayuela,978-84-376-0494-7,1\n')
+        self.addCleanup(os.remove, path)
+        err = StringIO()
+        call_command('import_catalog', path, stdout=StringIO(), stderr=err)
+        book = Book.objects.get(title='Rayuela')
+        self.assertEqual((book.isbn, book.isbn_normalized), ('978-84-376-0494-7', '9788437604947'))
+        self.assertEqual(err.getvalue(), '')
+
+
+from catalog import bulk
+
+class BulkInsertTest(TestCase):
+
+    def test_pks_from_database(self):
+        first, last = bulk.insert(Genre, [Genre(name='Drama'), Genre(name='Poesia')])
+        last.delete()
+        with bulk.write_transaction():
+            created = bulk.insert(Genre, [Genre(name='Ensayo'), Genre(name='Teatro')])
+        # Los pk son los de la bbdd, sin reutilizar el de la fila borrada
+        self.assertEqual(
+            [(obj.pk, obj.name) for obj in created],
+            list(Genre.objects.filter(pk__gt=first.pk).order_by('pk').values_list('pk', 'name'))
+        )
+        self.assertNotIn(last.pk, [obj.pk for obj in created])
+
+
+from catalog import benchmark
+
+class BenchmarkCommandsTest(TestCase):
+
+    def test_seed_and_run(self):
+        call_command(
+            'seed_benchmark_data', authors=5, books=20, copies=100, users=4,
+            loans=30, batch_size=8, stdout=StringIO(),
+        )
+        self.assertEqual(Book.objects.count(), 20)
+        self.assertEqual(BookInstance.objects.count(), 100)
+        self.assertEqual(BookInstance.objects.filter(status='o', borrower__isnull=False).count(), 30)
+        self.assertEqual(User.objects.filter(username__startswith='bench').count(), 4)
+        # Contadores al dia pese al bulk_create
+        self.assertEqual(sum(Book.objects.values_list('copies_on_loan', flat=True)), 30)
+        self.assertEqual(Book.objects.filter(isbn_normalized__isnull=True).count(), 0)
+
+        out = StringIO()
+        call_command('run_benchmark', iterations=2, warmup=0, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['books'], 20)
+        for name in ('index', 'books', 'book-detail', 'author-detail', 'all-borrowed',
+                     'renew-submit', 'admin-books', 'admin-copies'):
+            result = report['scenarios'][name]
+            self.assertIn(result['status'], (200, 302), name)
+            self.assertGreaterEqual(result['p95_ms'], result['p50_ms'])
+            self.assertGreater(result['peak_memory_kb'], 0)
+        self.assertGreater(report['scenarios']['admin-books']['queries'], 0)
+        self.assertEqual(report['scenarios']['renew-submit']['status'], 302)
+
+    def test_compare(self):
+        baseline = {'scenarios': {'books': {'status': 200, 'queries': 3, 'p95_ms': 10}}}
+        current = {'scenarios': {'books': {'status': 200, 'queries': 4, 'p95_ms': 20}}}
+        self.assertEqual(len(benchmark.compare(current, baseline)), 2)
+        self.assertEqual(benchmark.compare(baseline, baseline), [])
+
+
+import logging
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from catalog import querylog
+
+@override_settings(
+    CATALOG_QUERY_LOG=True, CATALOG_QUERY_LOG_SLOW_MS=0,
+    MIDDLEWARE=settings.MIDDLEWARE[:1] + ['catalog.querylog.QueryLogMiddleware'] + settings.MIDDLEWARE[1:],
+)
+class QueryReportCommandTest(TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.log')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        handler = logging.FileHandler(self.path)
+        logger = logging.getLogger('catalog.querylog')
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        self.addCleanup(logger.removeHandler, handler)
+        self.addCleanup(handler.close)
+        querylog.install(connection)
+        querylog.collector.reset()
+
+    def test_normalize(self):
+        self.assertEqual(
+            querylog.normalize("SELECT \"t1\".\"id\" FROM t1 WHERE a = 'x''y' AND b IN (%s, %s, %s) LIMIT 21"),
+            'SELECT "t1"."id" FROM t1 WHERE a = ? AND b IN (...) LIMIT ?',
+        )
+        self.assertEqual(
+            querylog.fingerprint('SELECT 1 WHERE id IN (%s)'),
+            querylog.fingerprint('SELECT 2 WHERE id IN (%s, %s)'),
+        )
+
+    def test_report_ranks_fingerprints_with_views_and_explain(self):
+        books = [Book.objects.create(title=f'Book {num}', summary='S', isbn=str(num)) for num in range(5)]
+        self.client.get(reverse('api-list', args=['books']))
+        querylog.collector.reset()
+        # N+1: cinco consultas con la misma huella
+        for book in books:
+            Book.objects.filter(pk=book.pk).first()
+        self.client.get(reverse('api-list', args=['books']))
+        querylog.collector.flush()
+
+        out = StringIO()
+        call_command('query_report', log=[self.path], order='count', json=True, stdout=out)
+        ranked = json.loads(out.getvalue())
+        top = ranked[0]
+        self.assertEqual(top['count'], 5)
+        self.assertIn('WHERE "catalog_book"."id" = ?', top['sql'])
+        # Umbral 0: todas son lentas, pero el EXPLAIN se hace una vez
+        self.assertEqual(top['slow'], 5)
+        self.assertTrue(top['explain'])
+        self.assertEqual(list(top['views']), ['-'])
+        self.assertTrue(any('api-list' in item['views'] for item in ranked))
+
+        out = StringIO()
+        call_command('query_report', log=[self.path], stdout=out)
+        self.assertIn('EXPLAIN', out.getvalue())
@@ -41,3 +41,59 @@ class RenewBookFormTest(TestCase):
         self.assertTrue(form.is_valid())
 
 
+
+
+from catalog.forms import BulkLoanForm
+
+class BulkLoanFormTest(TestCase):
+
+    def test_return_needs_no_date(self):
+        self.assertTrue(BulkLoanForm(data={'action': 'return'}).is_valid())
+
+    def test_renew_needs_date(self):
+        self.assertFalse(BulkLoanForm(data={'action': 'renew'}).is_valid())
+        date = datetime.date.today() + datetime.timedelta(weeks=1)
+        self.assertTrue(BulkLoanForm(data={'action': 'renew', 'due_back': date}).is_valid())
+
+
+
+from catalog.forms import BookForm
+from catalog.models import Author, Book, Genre, Language
+
+class BookFormTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='Joanne', last_name='Rowling')
+        Author.objects.create(first_name='William', last_name='Shakespeare')
+        cls.language = Language.objects.create(iso_code='EN', language='English')
+        cls.genre = Genre.objects.create(name='Fantasy')
+
+    def test_author_is_not_a_select(self):
+        html = BookForm().as_p()
+        self.assertNotIn('Shakespeare', html)
+        self.assertIn('data-autocomplete-kind="author"', html)
+        self.assertIn('type="hidden" name="author"', html)
+
+    def test_existing_author_label(self):
+        book = Book.objects.create(title='Harry Potter', summary='Magia', isbn='1', author=self.author)
+        html = BookForm(instance=book).as_p()
+        self.assertIn('value="Joanne Rowling"', html)
+        self.assertIn('value="%s"' % self.author.pk, html)
+        self.assertNotIn('Shakespeare', html)
+
+    def test_posted_author_pk(self):
+        form = BookForm(data={
+            'title': 'Harry Potter', 'summary': 'Magia', 'isbn': '1',
+            'author': self.author.pk, 'language': self.language.pk,
+            'genre': [self.genre.pk],
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['author'], self.author)
+
+    def test_hyphenated_isbn(self):
+        form = BookForm(data={
+            'title': 'Rayuela', 'summary': 'Novela', 'isbn': 'ISBN 978-84-376-0494-7',
+            'author': self.author.pk, 'language': self.language.pk, 'genre': [self.genre.pk],
+        })
+        self.assertTrue(form.is_valid(), form.errors)
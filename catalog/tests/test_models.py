@@ -34,4 +34,128 @@ class AuthorModelTest(TestCase):
     def test_get_absolute_url(self):
         author=Author.objects.get(id=1)
         #This will also fail if the urlconf is not defined.
-        self.assertEquals(author.get_absolute_url(),'/catalog/author/1')
\ No newline at end of file
+        self.assertEquals(author.get_absolute_url(),'/catalog/author/1')
+
+"""
+Contadores de disponibilidad de Book
+"""
+import datetime
+from io import StringIO
+from django.core.management import call_command
+from catalog.models import Book, BookInstance
+
+class BookAvailabilityTest(TestCase):
+
+    def setUp(self):
+        self.book = Book.objects.create(title='Book', summary='Summary', isbn='1')
+        self.other = Book.objects.create(title='Other', summary='Summary', isbn='2')
+
+    def counts(self, book):
+        book.refresh_from_db()
+        return (book.copies_available, book.copies_on_loan,
+                book.copies_maintenance, book.copies_reserved)
+
+    def test_counts_follow_create_change_and_delete(self):
+        due = datetime.date.today() + datetime.timedelta(days=3)
+        copy = BookInstance.objects.create(book=self.book, status='a')
+        BookInstance.objects.create(book=self.book, status='r')
+        self.assertEqual(self.counts(self.book), (1, 0, 0, 1))
+
+        copy.status = 'o'
+        copy.due_back = due
+        copy.save()
+        self.assertEqual(self.counts(self.book), (0, 1, 0, 1))
+        self.assertEqual(self.book.next_due_back, due)
+        self.assertEqual(self.book.copies_total, 2)
+
+        copy.delete()
+        self.assertEqual(self.counts(self.book), (0, 0, 0, 1))
+        self.assertIsNone(self.book.next_due_back)
+
+    def test_moving_copy_refreshes_both_books(self):
+        copy = BookInstance.objects.create(book=self.book, status='m')
+        copy = BookInstance.objects.get(pk=copy.pk)
+        copy.book = self.other
+        copy.save()
+        self.assertEqual(self.counts(self.book), (0, 0, 0, 0))
+        self.assertEqual(self.counts(self.other), (0, 0, 1, 0))
+
+    def test_reconcile_command_fixes_bulk_changes(self):
+        BookInstance.objects.create(book=self.book, status='a')
+        BookInstance.objects.filter(book=self.book).update(status='o')
+        self.assertEqual(self.counts(self.book), (1, 0, 0, 0))
+        call_command('reconcile_book_availability', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.counts(self.book), (0, 1, 0, 0))
+
+    def test_refresh_locks_books_before_counting(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            Book.objects.filter(pk=self.book.pk).refresh_availability()
+        statements = [query['sql'] for query in queries if not query['sql'].startswith('SAVEPOINT')]
+        self.assertTrue(statements[0].startswith('SELECT'))
+        self.assertTrue(statements[1].startswith('UPDATE'))
+        if connection.features.has_select_for_update:
+            self.assertIn('FOR UPDATE', statements[0])
+
+
+class BookInstanceOverdueTest(TestCase):
+
+    def setUp(self):
+        book = Book.objects.create(title='Book', summary='Summary', isbn='1')
+        today = datetime.date.today()
+        self.late = BookInstance.objects.create(book=book, status='o', due_back=today - datetime.timedelta(days=4))
+        self.on_time = BookInstance.objects.create(book=book, status='o', due_back=today + datetime.timedelta(days=4))
+        # Fecha pasada pero no prestada: no esta vencida
+        self.available = BookInstance.objects.create(book=book, status='a', due_back=today - datetime.timedelta(days=9))
+
+    def test_with_overdue_annotations(self):
+        copies = {c.pk: c for c in BookInstance.objects.with_overdue()}
+        self.assertTrue(copies[self.late.pk].overdue)
+        self.assertEqual(copies[self.late.pk].days_overdue, datetime.timedelta(days=4))
+        self.assertFalse(copies[self.on_time.pk].overdue)
+        self.assertIsNone(copies[self.on_time.pk].days_overdue)
+        self.assertFalse(copies[self.available.pk].overdue)
+
+    def test_filter_and_count_in_database(self):
+        self.assertEqual(BookInstance.objects.with_overdue().filter(overdue=True).count(), 1)
+        self.assertEqual(list(BookInstance.objects.overdue()), [self.late])
+
+
+from django.core.exceptions import ValidationError
+from catalog.isbn import normalize
+
+class BookIsbnTest(TestCase):
+
+    def test_normalize(self):
+        self.assertEqual(normalize('978-84-376-0494-7'), '9788437604947')
+        self.assertEqual(normalize('84-376-0494-X'), '9788437604947')
+        self.assertEqual(normalize('ISBN 84 376 0494 x'), '9788437604947')
+        self.assertIsNone(normalize('84-376-0494-1'))
+        self.assertIsNone(normalize('9788437604940'))
+        self.assertIsNone(normalize(''))
+        # Digitos no ASCII: no es un ISBN (antes, ValueError en int())
+        self.assertIsNone(normalize('12345678²X'))
+        self.assertIsNone(normalize('978843760494٧'))
+
+    def test_saved_and_unique(self):
+        book = Book.objects.create(title='Book', summary='Summary', isbn='84-376-0494-X')
+        self.assertEqual(book.isbn_normalized, '9788437604947')
+        other = Book(title='Other', summary='Summary', isbn='9788437604947')
+        with self.assertRaises(ValidationError):
+            other.full_clean()
+        book.clean()
+        # Los ISBN no validos no ocupan el indice unico
+        Book.objects.create(title='A', summary='Summary', isbn='1')
+        self.assertIsNone(Book.objects.create(title='B', summary='Summary', isbn='1').isbn_normalized)
+
+    def test_lookup_in_chunks(self):
+        for num, isbn in enumerate(['978-84-376-0494-7', '0-306-40615-2', '9780441013593']):
+            Book.objects.create(title=f'Book {num}', summary='Summary', isbn=isbn)
+        # Tres ISBN validos (uno repetido en otro formato) en bloques de 2
+        with self.assertNumQueries(2):
+            found = Book.objects.lookup_isbns(
+                ['84-376-0494-X', '9788437604947', '0306406152', '9780441013593', 'nope'],
+                chunk_size=2,
+            )
+        self.assertEqual(set(found), {'9788437604947', '9780306406157', '9780441013593'})
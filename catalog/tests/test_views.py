@@ -120,7 +120,9 @@ class LoanedBookInstancesByUserListViewTest(TestCase):
         self.assertEqual( len(resp.context['bookinstance_list']),0)
 
         #Now change all books to be on loan
-        get_eight_books = BookInstance.objects.all()[:8]
+        # Orden explicito: los empates de due_back van por id (UUID)
+        get_eight_books = list(BookInstance.objects.order_by('due_back', 'id')[:8])
+        loaned_to_user1 = sum(copy.borrower.username == 'testuser1' for copy in get_eight_books)
 
         for copy in get_eight_books:
             copy.status='o'
@@ -135,8 +137,8 @@ class LoanedBookInstancesByUserListViewTest(TestCase):
 
         self.assertTrue('bookinstance_list' in resp.context)
         
-        # PG Check: four copies loaned to user1
-        self.assertEqual( len(resp.context['bookinstance_list']),4)
+        # PG Check: the copies among those eight loaned to user1
+        self.assertEqual( len(resp.context['bookinstance_list']),loaned_to_user1)
         #Confirm all books belong to testuser1 and are on loan
         for bookitem in resp.context['bookinstance_list']:
             self.assertEqual(resp.context['user'], bookitem.borrower)
@@ -308,4 +310,1085 @@ class RenewBookInstancesViewTest(TestCase):
 
 """
 Falta reto de testing
-"""
\ No newline at end of file
+"""
+
+"""
+Contadores del index
+"""
+from django.core.cache import cache
+from catalog.stats import get_index_stats
+
+class IndexViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        test_author = Author.objects.create(first_name='John', last_name='Smith')
+        Genre.objects.create(name='Fantasy')
+        test_language = Language.objects.create(iso_code='EN', language='English')
+        harry = Book.objects.create(title='Harry Potter', summary='Magia', isbn='1234567890', author=test_author, language=test_language)
+        Book.objects.create(title='Otro libro', summary='Resumen', isbn='0987654321', author=test_author, language=test_language)
+        BookInstance.objects.create(book=harry, status='a')
+        BookInstance.objects.create(book=harry, status='o')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts(self):
+        resp = self.client.get(reverse('index'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['num_books'], 2)
+        self.assertEqual(resp.context['num_instances'], 2)
+        self.assertEqual(resp.context['num_instances_available'], 1)
+        self.assertEqual(resp.context['num_authors'], 1)
+        self.assertEqual(resp.context['num_genres'], 1)
+        self.assertEqual(resp.context['num_titles_search'], 1)
+
+    def test_stats_use_one_query_then_cache(self):
+        with self.assertNumQueries(1):
+            get_index_stats()
+        with self.assertNumQueries(0):
+            get_index_stats()
+
+    def test_stats_invalidated_on_save(self):
+        self.assertEqual(get_index_stats()['num_genres'], 1)
+        Genre.objects.create(name='Drama')
+        self.assertEqual(get_index_stats()['num_genres'], 2)
+        BookInstance.objects.filter(status='o').first().delete()
+        self.assertEqual(get_index_stats()['num_instances'], 1)
+
+    def test_visits_counted_without_session_write(self):
+        from django.contrib.sessions.models import Session
+        resp = self.client.get(reverse('index'))
+        self.assertEqual(resp.context['num_visits'], 0)
+        resp = self.client.get(reverse('index'))
+        self.assertEqual(resp.context['num_visits'], 1)
+        self.assertEqual(Session.objects.count(), 0)
+
+    def test_tampered_visits_cookie_is_ignored(self):
+        self.client.cookies['num_visits'] = '99'
+        resp = self.client.get(reverse('index'))
+        self.assertEqual(resp.context['num_visits'], 0)
+
+
+"""
+Numero de consultas constante en listados y fichas
+"""
+class QueryCountTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        genres = [Genre.objects.create(name='Genre %s' % num) for num in range(3)]
+        language = Language.objects.create(iso_code='EN', language='English')
+        for book_num in range(5):
+            book = Book.objects.create(title='Book %s' % book_num, summary='Summary', isbn='123456789%s' % book_num, author=cls.author, language=language)
+            book.genre.set(genres)
+            for copy in range(3):
+                BookInstance.objects.create(book=book, status='a')
+        cls.book = book
+
+    def setUp(self):
+        cache.clear()
+
+    def test_book_list_constant_queries(self):
+        # ETag (ultimos cambios + numero de libros) + COUNT del
+        # paginador + pagina de libros con author y language
+        with self.assertNumQueries(3):
+            resp = self.client.get(reverse('books'))
+        self.assertEqual(len(resp.context['book_list']), 5)
+
+    def test_book_detail_constant_queries(self):
+        # ETag + libro + generos + copias
+        with self.assertNumQueries(4):
+            resp = self.client.get(self.book.get_absolute_url())
+        self.assertEqual(resp.status_code, 200)
+        # con los fragmentos en cache solo se lee el libro
+        with self.assertNumQueries(2):
+            resp = self.client.get(self.book.get_absolute_url())
+        self.assertContains(resp, 'Genre 0')
+
+    def test_author_detail_constant_queries(self):
+        # autor + sus libros con idioma
+        # ETag + autor + sus libros con idioma
+        with self.assertNumQueries(3):
+            resp = self.client.get(self.author.get_absolute_url())
+        self.assertContains(resp, 'Book 4[EN]')
+        with self.assertNumQueries(2):
+            resp = self.client.get(self.author.get_absolute_url())
+        self.assertContains(resp, 'Book 4[EN]')
+
+    def test_unknown_shape(self):
+        self.assertEqual(Book.objects.shaped('list').count(), 5)
+        with self.assertRaises(ValueError):
+            Book.objects.shaped('nope')
+
+
+"""
+Paginacion por cursor
+"""
+from catalog.pagination import CursorPaginator
+
+class CursorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = User.objects.create_user(username='librarian', password='12345')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        test_author = Author.objects.create(first_name='John', last_name='Smith')
+        test_language = Language.objects.create(iso_code='EN', language='English')
+        test_book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG', author=test_author, language=test_language)
+        # 12 copias prestadas, varias con la misma fecha (desempate por id)
+        for copy in range(12):
+            BookInstance.objects.create(
+                book=test_book, status='o', borrower=cls.librarian,
+                due_back=datetime.date.today() + datetime.timedelta(days=copy % 4))
+        # copias sin fecha: van al final
+        for copy in range(2):
+            BookInstance.objects.create(book=test_book, status='o', borrower=cls.librarian)
+
+    def expected_order(self):
+        copies = list(BookInstance.objects.filter(status='o'))
+        return sorted(copies, key=lambda c: (c.due_back is None, c.due_back or datetime.date.min, c.id))
+
+    def walk(self, url):
+        # Recorre todas las paginas siguiendo los enlaces next
+        seen, pages = [], []
+        resp = self.client.get(url)
+        while True:
+            self.assertEqual(resp.status_code, 200)
+            page = resp.context['page_obj']
+            self.assertTrue(page.is_cursor)
+            pages.append(page)
+            seen.extend(resp.context['bookinstance_list'])
+            if not page.has_next():
+                return seen, pages
+            resp = self.client.get(url.split('?')[0] + '?cursor=' + page.next_cursor)
+
+    def test_all_borrowed_walks_every_copy_once_in_order(self):
+        self.client.login(username='librarian', password='12345')
+        seen, pages = self.walk(reverse('all-borrowed'))
+        self.assertEqual([c.id for c in seen], [c.id for c in self.expected_order()])
+        self.assertEqual(len(pages), 3)
+        self.assertFalse(pages[0].has_previous())
+
+    def test_previous_cursor_returns_previous_page(self):
+        self.client.login(username='librarian', password='12345')
+        seen, pages = self.walk(reverse('all-borrowed'))
+        resp = self.client.get(reverse('all-borrowed') + '?cursor=' + pages[2].previous_cursor)
+        self.assertEqual(
+            [c.id for c in resp.context['bookinstance_list']],
+            [c.id for c in pages[1].object_list])
+        self.assertTrue(resp.context['page_obj'].has_next())
+
+    def test_cursor_mode_skips_count(self):
+        self.client.login(username='librarian', password='12345')
+        paginator = CursorPaginator(BookInstance.objects.all(), 5, ('due_back',))
+        with self.assertNumQueries(1):
+            paginator.page()
+        self.assertIsNone(paginator.count())
+
+    def test_cursor_opt_in_on_page_mode_views(self):
+        self.client.login(username='librarian', password='12345')
+        seen, pages = self.walk(reverse('my-borrowed') + '?cursor=')
+        self.assertEqual(len(seen), 14)
+
+    def test_invalid_cursor_is_404(self):
+        self.client.login(username='librarian', password='12345')
+        resp = self.client.get(reverse('all-borrowed') + '?cursor=garbage')
+        self.assertEqual(resp.status_code, 404)
+
+
+"""
+Busqueda de texto completo
+"""
+from io import StringIO
+from django.core.management import call_command
+
+class SearchViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='Joanne', last_name='Rowling')
+        language = Language.objects.create(iso_code='EN', language='English')
+        cls.in_summary = Book.objects.create(title='Fantastic Beasts', summary='Written before Harry existed', isbn='9780000000001', author=cls.author, language=language)
+        cls.in_title = Book.objects.create(title='Harry Potter', summary='A wizard', isbn='9780000000002', author=cls.author, language=language)
+        for num in range(12):
+            Book.objects.create(title='Dune %s' % num, summary='Desert planet', isbn='97810000000%02d' % num, author=cls.author, language=language)
+
+    def search(self, query, page=1):
+        return self.client.get(reverse('search'), {'q': query, 'page': page})
+
+    def test_prefix_search_ranks_title_first(self):
+        resp = self.search('harr')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(list(resp.context['book_list']), [self.in_title, self.in_summary])
+
+    def test_search_by_isbn_and_author(self):
+        resp = self.search('9780000000002')
+        self.assertEqual(list(resp.context['book_list']), [self.in_title])
+        resp = self.search('rowl')
+        self.assertEqual(list(resp.context['author_list']), [self.author])
+
+    def test_results_are_paginated(self):
+        resp = self.search('dune')
+        self.assertEqual(resp.context['paginator'].count, 12)
+        self.assertEqual(len(resp.context['book_list']), 10)
+        resp = self.search('dune', page=2)
+        self.assertEqual(len(resp.context['book_list']), 2)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.in_title.title = 'Philosopher Stone'
+        self.in_title.save()
+        self.assertEqual(list(self.search('philosopher').context['book_list']), [self.in_title])
+        self.in_title.delete()
+        self.assertEqual(list(self.search('philosopher').context['book_list']), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        resp = self.search('"dune*) (')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context['book_list']), 10)
+
+    def test_rebuild_command(self):
+        Book.objects.filter(pk=self.in_title.pk).update(title='Bulk Updated')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(list(self.search('bulk').context['book_list']), [self.in_title])
+
+
+"""
+Autocompletado
+"""
+class AutocompleteViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='Joanne', last_name='Rowling')
+        language = Language.objects.create(iso_code='EN', language='English')
+        cls.book = Book.objects.create(title='Harry Potter and the Potter Stone', summary='Magia', isbn='1', author=cls.author, language=language)
+        Book.objects.create(title='Hamlet', summary='Drama', isbn='2', author=cls.author, language=language)
+
+    def lookup(self, **params):
+        resp = self.client.get(reverse('autocomplete'), params)
+        self.assertEqual(resp.status_code, 200)
+        return [item['label'] for item in resp.json()['results']]
+
+    def test_prefix_of_any_word(self):
+        self.assertEqual(self.lookup(q='ha'), ['Hamlet', 'Harry Potter and the Potter Stone'])
+        # Una sugerencia por libro aunque coincidan varias palabras
+        self.assertEqual(self.lookup(q='POT'), ['Harry Potter and the Potter Stone'])
+
+    def test_filter_by_kind(self):
+        self.assertEqual(self.lookup(q='row'), ['Joanne Rowling'])
+        self.assertEqual(self.lookup(q='row', kind='book'), [])
+        resp = self.client.get(reverse('autocomplete'), {'q': 'x', 'kind': 'genre'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_refreshed_on_save_and_delete(self):
+        self.book.title = 'Ñandú'
+        self.book.save()
+        self.assertEqual(self.lookup(q='nan'), ['Ñandú'])
+        self.assertEqual(self.lookup(q='pot'), [])
+        self.book.delete()
+        self.assertEqual(self.lookup(q='nan'), [])
+
+    def test_result_links_to_detail(self):
+        resp = self.client.get(reverse('autocomplete'), {'q': 'hamlet'})
+        item = resp.json()['results'][0]
+        self.assertEqual(item['kind'], 'book')
+        self.assertEqual(item['url'], reverse('book-detail', args=[str(item['id'])]))
+
+
+"""
+Uso de indices en las consultas principales (EXPLAIN)
+"""
+from django.db import connection
+from django.test import RequestFactory
+from catalog import views
+
+class IndexUsageTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser1', password='12345')
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='9780000000001', author=author)
+        for copy in range(20):
+            BookInstance.objects.create(
+                book=book, borrower=cls.user, status='oamr'[copy % 4],
+                due_back=datetime.date.today() + datetime.timedelta(days=copy))
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Con tablas tan pequeñas Postgres preferiria un seq scan
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def view_queryset(self, view_class):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        view = view_class()
+        view.setup(request)
+        return view.get_queryset()
+
+    def assertUsesIndex(self, queryset, table):
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            scans = [line for line in plan.splitlines() if table in line]
+            self.assertTrue(scans, plan)
+            for line in scans:
+                self.assertIn('USING', line, plan)
+            # El orden tiene que salir del indice, sin ordenar aparte
+            self.assertNotIn('USE TEMP B-TREE', plan)
+        elif connection.vendor == 'postgresql':
+            self.assertIn('Index', plan)
+            self.assertNotIn('Seq Scan on %s' % table, plan)
+
+    def test_all_loaned_view_uses_index(self):
+        self.assertUsesIndex(
+            self.view_queryset(views.AllLoanedBooksListView)[:6],
+            'catalog_bookinstance')
+
+    def test_loaned_by_user_view_uses_index(self):
+        self.assertUsesIndex(
+            self.view_queryset(views.LoanedBooksByUserListView)[:6],
+            'catalog_bookinstance')
+
+    def test_default_ordering_uses_index(self):
+        self.assertUsesIndex(
+            BookInstance.objects.filter(status__in=['o', 'a'])[:5],
+            'catalog_bookinstance')
+
+    def test_book_list_and_isbn_use_index(self):
+        self.assertUsesIndex(self.view_queryset(views.BookListView)[:6], 'catalog_book')
+        self.assertUsesIndex(Book.objects.filter(isbn='9780000000001'), 'catalog_book')
+
+    def test_author_list_uses_index(self):
+        self.assertUsesIndex(self.view_queryset(views.AuthorListView)[:6], 'catalog_author')
+
+
+"""
+Exportaciones en streaming
+"""
+import json
+
+class ExportViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = User.objects.create_user(username='librarian', password='12345')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        language = Language.objects.create(iso_code='EN', language='English')
+        book = Book.objects.create(title='Book, with comma', summary='Summary', isbn='9780000000001', author=author, language=language)
+        cls.loan = BookInstance.objects.create(book=book, status='o', borrower=cls.librarian, due_back=datetime.date(2030, 1, 2))
+        BookInstance.objects.create(book=book, status='a')
+
+    def test_requires_permission(self):
+        resp = self.client.get(reverse('export', args=['books', 'csv']))
+        self.assertEqual(resp.status_code, 302)
+
+    def test_books_csv_is_streamed(self):
+        self.client.login(username='librarian', password='12345')
+        resp = self.client.get(reverse('export', args=['books', 'csv']))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith('id,title,isbn'))
+        self.assertIn('"Book, with comma",9780000000001,John,Smith,EN,1,1,0,0,2030-01-02', lines[1])
+
+    def test_loans_ndjson(self):
+        self.client.login(username='librarian', password='12345')
+        resp = self.client.get(reverse('export', args=['loans', 'ndjson']))
+        rows = [json.loads(line) for line in b''.join(resp.streaming_content).splitlines()]
+        self.assertEqual(rows, [{
+            'id': str(self.loan.id), 'book_id': self.loan.book_id, 'title': 'Book, with comma',
+            'isbn': '9780000000001', 'borrower_id': self.librarian.pk,
+            'borrower': 'librarian', 'due_back': '2030-01-02',
+        }])
+
+    def test_unknown_dataset_is_404(self):
+        self.client.login(username='librarian', password='12345')
+        self.assertEqual(self.client.get(reverse('export', args=['users', 'csv'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export', args=['books', 'xml'])).status_code, 404)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_catalog', 'copies', format='csv', chunk_size=1, stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+
+"""
+Renovacion / devolucion en bloque
+"""
+from django.test.utils import CaptureQueriesContext
+class BulkLoanViewTest(TestCase):
+
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='12345')
+        self.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.reader = User.objects.create_user(username='reader', password='12345')
+        language = Language.objects.create(iso_code='EN', language='English')
+        self.book = Book.objects.create(title='Book Title', summary='Summary', isbn='1', language=language)
+        today = datetime.date.today()
+        self.loans = [
+            BookInstance.objects.create(book=self.book, status='o', borrower=self.reader,
+                                        due_back=today + datetime.timedelta(days=num))
+            for num in range(4)
+        ]
+        self.available = BookInstance.objects.create(book=self.book, status='a')
+        self.client.login(username='librarian', password='12345')
+
+    def post(self, data):
+        return self.client.post(reverse('bulk-loans'), data)
+
+    def test_requires_permission(self):
+        self.client.login(username='reader', password='12345')
+        self.assertEqual(self.client.get(reverse('bulk-loans')).status_code, 403)
+
+    def test_lists_loans(self):
+        BookInstance.objects.filter(pk=self.loans[0].pk).update(due_back=datetime.date.today() - datetime.timedelta(days=2))
+        resp = self.client.get(reverse('bulk-loans'))
+        self.assertEqual(resp.status_code, 200)
+        loans = resp.context['bookinstance_list']
+        self.assertEqual(len(loans), 4)
+        # Vencida segun la anotacion de la bbdd
+        self.assertEqual([loan.overdue for loan in loans], [True, False, False, False])
+        self.assertContains(resp, 'class="text-danger"', count=1)
+
+    def test_bulk_renew_reports_failures_and_updates_rest(self):
+        today = datetime.date.today()
+        new_date = today + datetime.timedelta(weeks=3)
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.post({
+                'action': 'renew', 'due_back': new_date,
+                'ids': [l.pk for l in self.loans] + [self.available.pk, 'not-a-uuid'],
+                'due_back_%s' % self.loans[0].pk: today + datetime.timedelta(weeks=1),
+                'due_back_%s' % self.loans[1].pk: today + datetime.timedelta(weeks=6),
+            })
+        # Un UPDATE por fecha de renovacion distinta
+        updates = [q for q in queries if q['sql'].startswith('UPDATE "catalog_bookinstance"')]
+        self.assertEqual(len(updates), 2)
+        result = resp.context['result']
+        self.assertEqual(result.updated, 3)
+        failed = dict(result.failures)
+        self.assertEqual(failed[self.loans[1].pk], 'Invalid date - renewal more than 4 weeks ahead')
+        self.assertEqual(failed[self.available.pk], 'Copy is not on loan')
+        self.assertEqual(failed['not-a-uuid'], 'Invalid copy id')
+        self.assertEqual(
+            [BookInstance.objects.get(pk=l.pk).due_back for l in self.loans],
+            [today + datetime.timedelta(weeks=1), today + datetime.timedelta(days=1), new_date, new_date])
+
+    def test_bulk_return(self):
+        resp = self.post({'action': 'return', 'ids': [l.pk for l in self.loans[:2]]})
+        self.assertEqual(resp.context['result'].updated, 2)
+        self.assertEqual(BookInstance.objects.filter(status='a', borrower=None).count(), 3)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.copies_available, self.book.copies_on_loan), (3, 2))
+
+    def test_admin_mark_returned_action(self):
+        User.objects.create_superuser(username='admin', password='12345', email='a@example.com')
+        self.client.login(username='admin', password='12345')
+        resp = self.client.post(reverse('admin:catalog_bookinstance_changelist'), {
+            'action': 'mark_returned',
+            '_selected_action': [str(l.pk) for l in self.loans] + [str(self.available.pk)],
+        }, follow=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(BookInstance.objects.filter(status='o').count(), 0)
+        self.assertContains(resp, 'Copy is not on loan')
+
+    def test_renew_requires_date(self):
+        resp = self.post({'action': 'renew', 'ids': [self.loans[0].pk]})
+        self.assertIsNone(resp.context['result'])
+        self.assertFormError(resp, 'form', 'due_back', 'A renewal date is required to renew.')
+
+
+"""
+Informe de prestamos vencidos
+"""
+class OverdueReportViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = User.objects.create_user(username='librarian', password='12345')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        ann = User.objects.create_user(username='ann', password='12345')
+        bob = User.objects.create_user(username='bob', password='12345')
+        book = Book.objects.create(title='Book', summary='Summary', isbn='1')
+        today = datetime.date.today()
+        for days, borrower in ((10, ann), (2, ann), (5, bob), (-3, bob)):
+            BookInstance.objects.create(book=book, status='o', borrower=borrower,
+                                        due_back=today - datetime.timedelta(days=days))
+
+    def test_grouped_by_borrower(self):
+        self.client.login(username='librarian', password='12345')
+        resp = self.client.get(reverse('overdue-report'))
+        self.assertEqual(resp.status_code, 200)
+        rows = [(r['borrower__username'], r['num_overdue'], r['max_overdue'].days)
+                for r in resp.context['borrower_list']]
+        self.assertEqual(rows, [('ann', 2, 10), ('bob', 1, 5)])
+        self.assertEqual(resp.context['total_overdue'], 3)
+
+    def test_requires_permission(self):
+        User.objects.create_user(username='reader', password='12345')
+        self.client.login(username='reader', password='12345')
+        self.assertEqual(self.client.get(reverse('overdue-report')).status_code, 403)
+
+
+
+"""
+Cache de fragmentos de las fichas, invalidada por señales
+"""
+from django.test import override_settings
+
+class FragmentCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+        self.genre = Genre.objects.create(name='Fantasy')
+        self.language = Language.objects.create(iso_code='EN', language='English')
+        self.book = Book.objects.create(title='Old title', summary='Summary', isbn='1', author=self.author, language=self.language)
+        self.book.genre.add(self.genre)
+        # calienta la cache
+        self.client.get(self.book.get_absolute_url())
+        self.client.get(self.author.get_absolute_url())
+
+    def test_book_change(self):
+        self.book.title = 'New title'
+        self.book.save()
+        self.assertContains(self.client.get(self.book.get_absolute_url()), 'New title')
+        self.assertContains(self.client.get(self.author.get_absolute_url()), 'New title')
+
+    def test_copies_change(self):
+        copy = BookInstance.objects.create(book=self.book, status='o', due_back=datetime.date.today())
+        resp = self.client.get(self.book.get_absolute_url())
+        self.assertContains(resp, str(copy.id))
+        self.assertContains(resp, '0 of 1 available')
+        from catalog.loans import bulk_return
+        bulk_return([copy.pk])
+        self.assertContains(self.client.get(self.book.get_absolute_url()), '1 of 1 available')
+
+    def test_related_changes(self):
+        self.author.first_name = 'Jane'
+        self.author.save()
+        self.assertContains(self.client.get(self.book.get_absolute_url()), 'Jane')
+        self.genre.name = 'Horror'
+        self.genre.save()
+        self.assertContains(self.client.get(self.book.get_absolute_url()), 'Horror')
+        self.book.genre.add(Genre.objects.create(name='Poetry'))
+        self.assertContains(self.client.get(self.book.get_absolute_url()), 'Poetry')
+        self.language.iso_code = 'ES'
+        self.language.save()
+        self.assertContains(self.client.get(self.author.get_absolute_url()), 'Old title[ES]')
+
+    def test_book_moved_to_other_author(self):
+        other = Author.objects.create(first_name='Ann', last_name='Other')
+        self.book.author = other
+        self.book.save()
+        self.assertNotContains(self.client.get(self.author.get_absolute_url()), 'Old title')
+        self.assertContains(self.client.get(other.get_absolute_url()), 'Old title')
+
+    @override_settings(CATALOG_SHARED_CACHE=False)
+    def test_not_cached_without_shared_cache(self):
+        from catalog import fragments
+        self.assertEqual(fragments.timeout(), 0)
+        cache.clear()
+        self.client.get(self.book.get_absolute_url())
+        # Otro worker cambia el libro: su version no llega a este
+        Book.objects.filter(pk=self.book.pk).update(title='New title')
+        self.assertContains(self.client.get(self.book.get_absolute_url()), 'New title')
+
+
+
+"""
+GET condicional (ETag / Last-Modified)
+"""
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+        self.genre = Genre.objects.create(name='Fantasy')
+        language = Language.objects.create(iso_code='EN', language='English')
+        self.book = Book.objects.create(title='Book', summary='Summary', isbn='1', author=self.author, language=language)
+        self.book.genre.add(self.genre)
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_book_detail_not_modified(self):
+        url = self.book.get_absolute_url()
+        resp = self.client.get(url)
+        self.assertTrue(resp.has_header('Last-Modified'))
+        etag = resp['ETag']
+        # solo la consulta de los validadores, sin plantilla
+        with self.assertNumQueries(1):
+            resp = self.revalidate(url, etag)
+        self.assertEqual(resp.status_code, 304)
+        resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=resp['Last-Modified'])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_book_detail_changes(self):
+        url = self.book.get_absolute_url()
+        etag = self.client.get(url)['ETag']
+        BookInstance.objects.create(book=self.book, status='a')
+        etag2 = self.client.get(url)['ETag']
+        self.assertNotEqual(etag, etag2)
+        self.genre.name = 'Horror'
+        self.genre.save()
+        etag3 = self.client.get(url)['ETag']
+        self.assertNotEqual(etag2, etag3)
+        self.author.last_name = 'Jones'
+        self.author.save()
+        self.assertEqual(self.revalidate(url, etag3).status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        url = self.book.get_absolute_url()
+        etag = self.client.get(url)['ETag']
+        User.objects.create_user(username='reader', password='12345')
+        self.client.login(username='reader', password='12345')
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_author_detail_changes_with_books(self):
+        url = self.author.get_absolute_url()
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        self.book.title = 'Renamed'
+        self.book.save()
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_lists(self):
+        for url in (reverse('books'), reverse('authors')):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.revalidate(url, etag).status_code, 304)
+            self.assertEqual(self.revalidate(url + '?page=1', etag).status_code, 200)
+        url = reverse('books')
+        etag = self.client.get(url)['ETag']
+        self.book.delete()
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_list_etag_skips_index_stats(self):
+        url = reverse('books')
+        self.client.get(url)
+        # La copia invalida los contadores del index: el ETag no los
+        # recalcula (ETag + COUNT del paginador + pagina)
+        BookInstance.objects.create(book=self.book, status='a')
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_reconcile_changes_etags(self):
+        copy = BookInstance.objects.create(book=self.book, status='a')
+        urls = (reverse('books'), self.book.get_absolute_url())
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        # update() no dispara señales: los contadores los corrige el comando
+        BookInstance.objects.filter(pk=copy.pk).update(status='o')
+        call_command('reconcile_book_availability', stdout=StringIO())
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_missing_object(self):
+        self.assertEqual(self.client.get(reverse('book-detail', args=['999'])).status_code, 404)
+
+
+"""
+Permisos resueltos en cache (catalog/backends.py)
+"""
+from django.contrib.auth.models import Group
+
+class PermissionCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='librarian', password='12345')
+        self.group = Group.objects.create(name='Librarians')
+        self.permission = Permission.objects.get(codename='can_mark_returned')
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_permissions_served_from_cache(self):
+        self.group.permissions.add(self.permission)
+        self.user.groups.add(self.group)
+        user = self.fresh_user()
+        self.assertTrue(user.has_perm('catalog.can_mark_returned'))
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('catalog.can_mark_returned'))
+            self.assertFalse(user.has_perm('catalog.add_book'))
+
+    def test_invalidated_on_group_changes(self):
+        self.user.groups.add(self.group)
+        self.assertFalse(self.fresh_user().has_perm('catalog.can_mark_returned'))
+        self.group.permissions.add(self.permission)
+        self.assertTrue(self.fresh_user().has_perm('catalog.can_mark_returned'))
+        self.group.user_set.remove(self.user)
+        self.assertFalse(self.fresh_user().has_perm('catalog.can_mark_returned'))
+
+    def test_invalidated_on_user_changes(self):
+        self.assertFalse(self.fresh_user().has_perm('catalog.can_mark_returned'))
+        self.user.user_permissions.add(self.permission)
+        self.assertTrue(self.fresh_user().has_perm('catalog.can_mark_returned'))
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.fresh_user().has_perm('catalog.can_mark_returned'))
+
+    def test_view_permission_check_without_permission_queries(self):
+        self.user.user_permissions.add(self.permission)
+        self.client.login(username='librarian', password='12345')
+        self.client.get(reverse('all-borrowed'))
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('all-borrowed'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse([q for q in queries if 'auth_permission' in q['sql']])
+
+
+"""
+Enrutado lectura/escritura con replicas (catalog/routers.py)
+"""
+from django.db import router
+from django.http import HttpResponse
+from django.test import SimpleTestCase, override_settings
+from catalog.routers import PIN_COOKIE_NAME, ReplicaPinMiddleware
+
+@override_settings(CATALOG_READ_REPLICAS=['replica1'])
+class ReplicaRouterTest(SimpleTestCase):
+
+    def routed_read(self, request):
+        seen = []
+
+        def view(request):
+            seen.append(router.db_for_read(Book))
+            return HttpResponse()
+        response = ReplicaPinMiddleware(view)(request)
+        return seen[0], response
+
+    def test_reads_to_replica_writes_to_primary(self):
+        self.assertEqual(router.db_for_read(Book), 'replica1')
+        self.assertEqual(router.db_for_write(Book), 'default')
+        self.assertFalse(router.allow_migrate('replica1', 'catalog'))
+
+    def test_post_pins_primary(self):
+        factory = RequestFactory()
+        db, response = self.routed_read(factory.get('/'))
+        self.assertEqual(db, 'replica1')
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+        db, response = self.routed_read(factory.post('/'))
+        self.assertEqual(db, 'default')
+        self.assertIn(PIN_COOKIE_NAME, response.cookies)
+        # La cookie mantiene las lecturas en el primario
+        request = factory.get('/')
+        request.COOKIES[PIN_COOKIE_NAME] = '1'
+        self.assertEqual(self.routed_read(request)[0], 'default')
+        # Fuera de la peticion se vuelve a la replica
+        self.assertEqual(router.db_for_read(Book), 'replica1')
+
+    @override_settings(CATALOG_READ_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(router.db_for_read(Book), 'default')
+
+
+"""
+Vistas asincronas (catalog/async_views.py). La bbdd se consulta desde
+los hilos del pool, con otras conexiones: hace falta TransactionTestCase
+para que vean los datos.
+"""
+from django.test import TransactionTestCase
+from catalog.async_views import db
+from django.conf import settings
+
+PROFILED_MIDDLEWARE = settings.MIDDLEWARE[:1] + ['catalog.profiling.ProfilingMiddleware'] + settings.MIDDLEWARE[1:]
+
+class AsyncViewsTest(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        language = Language.objects.create(iso_code='EN', language='English')
+        self.book = Book.objects.create(title='Dune', summary='Summary', isbn='1', author=author, language=language)
+        self.book.genre.add(Genre.objects.create(name='Fantasy'))
+        BookInstance.objects.create(book=self.book, status='a')
+        self.author = author
+
+    async def test_pages(self):
+        resp = await self.async_client.get(reverse('async-index'))
+        self.assertContains(resp, 'Books: </strong>1')
+        resp = await self.async_client.get(reverse('async-books'))
+        self.assertContains(resp, 'Dune[EN]')
+        resp = await self.async_client.get(reverse('async-book-detail', args=[self.book.pk]))
+        self.assertContains(resp, 'Fantasy')
+        self.assertContains(resp, '1 of 1 available')
+        resp = await self.async_client.get(reverse('async-author-detail', args=[self.author.pk]))
+        self.assertContains(resp, 'Dune[EN]')
+        resp = await self.async_client.get(reverse('async-authors'))
+        self.assertContains(resp, 'Smith')
+        resp = await self.async_client.get(reverse('async-book-detail', args=[999]))
+        self.assertEqual(resp.status_code, 404)
+
+    async def test_stats_json(self):
+        resp = await self.async_client.get(reverse('api-stats'))
+        self.assertEqual(resp.json()['num_instances_available'], 1)
+
+    @override_settings(MIDDLEWARE=PROFILED_MIDDLEWARE, CATALOG_PROFILING_SAMPLE_RATE=1)
+    async def test_profiled_queries_from_pool(self):
+        with self.assertLogs('catalog.profiling', 'INFO'):
+            resp = await self.async_client.get(reverse('async-book-detail', args=[self.book.pk]))
+        self.assertRegex(resp['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    async def test_logged_in_sidebar(self):
+        await db(User.objects.create_user, username='reader', password='12345')
+        await db(self.client.login, username='reader', password='12345')
+        self.async_client.cookies = self.client.cookies
+        resp = await self.async_client.get(reverse('async-books'))
+        self.assertContains(resp, 'User: reader')
+
+    async def test_export_through_asgi_handler(self):
+        """
+        La exportacion llega entera por la aplicacion ASGI del
+        proyecto, no solo la cabecera
+        """
+        from asgiref.testing import ApplicationCommunicator
+        from locallibrary.asgi import application
+        librarian = await db(User.objects.create_user, username='librarian', password='12345')
+        permission = await db(Permission.objects.get, codename='can_mark_returned')
+        await db(librarian.user_permissions.add, permission)
+        await db(BookInstance.objects.create, book=self.book, status='o', borrower=librarian,
+                 due_back=datetime.date(2030, 1, 2))
+        await db(self.client.login, username='librarian', password='12345')
+        session = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': reverse('export', args=['loans', 'csv']),
+            'query_string': b'', 'server': ('localhost', 80), 'client': ('127.0.0.1', 1),
+            'headers': [
+                (b'host', b'localhost'),
+                (b'cookie', f'{settings.SESSION_COOKIE_NAME}={session}'.encode()),
+            ],
+        })
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(5)
+        self.assertEqual(start['status'], 200)
+        body = b''
+        while True:
+            message = await communicator.receive_output(5)
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        lines = body.decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith(',Dune,1,' + f'{librarian.pk},librarian,2030-01-02'))
+
+    async def test_export_lines_in_own_thread(self):
+        import threading
+        from catalog import exports
+        threads = set()
+
+        def lines():
+            for num in range(3):
+                threads.add(threading.current_thread().name)
+                yield f'{num}\n'
+
+        # Con bucle de eventos: fuera de el y fuera del hilo sincrono
+        self.assertEqual(''.join(exports.in_own_thread(lines(), batch=2)), '0\n1\n2\n')
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads.pop().startswith('catalog-export'))
+
+
+class ApiTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        language = Language.objects.create(iso_code='EN', language='English')
+        genre = Genre.objects.create(name='Fantasy')
+        for num in range(5):
+            book = Book.objects.create(
+                title=f'Book {num}', summary='Summary', isbn=str(num),
+                author=cls.author, language=language,
+            )
+            book.genre.add(genre)
+            BookInstance.objects.create(book=book, status='a' if num % 2 else 'o')
+        cls.book = book
+
+    def test_sparse_fields(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse('api-list', args=['books']), {'fields': 'title'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['results'][0], {'id': Book.objects.order_by('title').first().pk, 'title': 'Book 0'})
+        self.assertNotIn(b' ', resp.content.replace(b'Book ', b''))
+
+    def test_includes_fixed_queries(self):
+        url = reverse('api-list', args=['books'])
+        # Pagina + una consulta por include, sin importar el tamaño
+        with self.assertNumQueries(5):
+            resp = self.client.get(url, {'include': 'author,language,genres,copies'})
+        row = resp.json()['results'][0]
+        self.assertEqual(row['author']['last_name'], 'Smith')
+        self.assertEqual(row['language']['iso_code'], 'EN')
+        self.assertEqual(row['genres'][0]['name'], 'Fantasy')
+        self.assertEqual(len(row['copies']), 1)
+        with self.assertNumQueries(2):
+            resp = self.client.get(reverse('api-list', args=['authors']), {'include': 'books'})
+        self.assertEqual(len(resp.json()['results'][0]['books']), 5)
+
+    def test_cursor_pagination(self):
+        url = reverse('api-list', args=['books'])
+        data = self.client.get(url, {'page_size': 2, 'fields': 'title'}).json()
+        titles = [row['title'] for row in data['results']]
+        while data['next']:
+            data = self.client.get(data['next']).json()
+            titles += [row['title'] for row in data['results']]
+        self.assertEqual(titles, [f'Book {num}' for num in range(5)])
+        self.assertIsNotNone(data['previous'])
+
+    def test_errors(self):
+        url = reverse('api-list', args=['books'])
+        self.assertEqual(self.client.get(url, {'fields': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'include': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'page_size': 1000}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'author': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api-list', args=['nope'])).status_code, 404)
+
+    def test_detail_and_filters(self):
+        resp = self.client.get(reverse('api-detail', args=['books', self.book.pk]), {'include': 'author'})
+        self.assertEqual(resp.json()['author']['first_name'], 'John')
+        self.assertEqual(self.client.get(reverse('api-detail', args=['books', 999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api-detail', args=['copies', 'bad-uuid'])).status_code, 404)
+        resp = self.client.get(reverse('api-list', args=['copies']), {'status': 'a'})
+        self.assertEqual(len(resp.json()['results']), 2)
+        resp = self.client.get(reverse('api-list', args=['copies']), {'book': self.book.pk, 'include': 'book'})
+        self.assertEqual(resp.json()['results'][0]['book']['title'], 'Book 4')
+
+
+class IsbnLookupTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Dune', summary='Summary', isbn='978-0-441-01359-3')
+        BookInstance.objects.create(book=cls.book, status='a')
+        BookInstance.objects.create(book=cls.book, status='o')
+
+    def post(self, data):
+        return self.client.post(reverse('isbn-lookup'), json.dumps(data), content_type='application/json')
+
+    def test_resolves_in_order(self):
+        with self.assertNumQueries(1):
+            resp = self.post({'isbns': ['9780441013593', 'nope', '0441013597']})
+        data = resp.json()
+        self.assertEqual(data['found'], 2)
+        first, missing, isbn10 = data['results']
+        self.assertEqual(first['book']['id'], self.book.pk)
+        self.assertEqual(first['book']['copies_available'], 1)
+        self.assertEqual(first['book']['copies_total'], 2)
+        self.assertEqual(missing, {'isbn': 'nope', 'normalized': None, 'book': None})
+        self.assertEqual(isbn10['normalized'], '9780441013593')
+
+    @override_settings(CATALOG_ISBN_LOOKUP_MAX=2)
+    def test_errors(self):
+        self.assertEqual(self.post({'isbns': ['1', '2', '3']}).status_code, 400)
+        self.assertEqual(self.post({'nope': []}).status_code, 400)
+        self.assertEqual(self.post({'isbns': [1]}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('isbn-lookup')).status_code, 405)
+
+    def test_non_ascii_digits(self):
+        resp = self.post({'isbns': ['12345678²X']})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['results'][0]['normalized'], None)
+
+
+@override_settings(MIDDLEWARE=PROFILED_MIDDLEWARE, CATALOG_PROFILING_SAMPLE_RATE=1)
+class ProfilingMiddlewareTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        language = Language.objects.create(iso_code='EN', language='English')
+        self.book = Book.objects.create(title='Dune', summary='Summary', isbn='1', author=author, language=language)
+
+    def timings(self, response):
+        return {
+            part.split(';')[0]: part for part in response['Server-Timing'].split(', ')
+        }
+
+    def test_server_timing_and_log(self):
+        with self.assertLogs('catalog.profiling', 'INFO') as logs:
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.get(reverse('book-detail', args=[self.book.pk]))
+        timings = self.timings(resp)
+        self.assertEqual(set(timings), {'total', 'view', 'db', 'tpl', 'mw'})
+        self.assertIn(f'desc="{len(queries)} queries"', timings['db'])
+        self.assertNotEqual(timings['tpl'], 'tpl;dur=0.0')
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'book-detail')
+        self.assertEqual(line['queries'], len(queries))
+        self.assertEqual(line['status'], 200)
+
+    @override_settings(CATALOG_PROFILING_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        resp = self.client.get(reverse('books'))
+        self.assertNotIn('Server-Timing', resp)
+
+
+import os
+import re
+import tempfile
+from catalog import metrics
+
+class MetricsTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(CATALOG_METRICS_DIR=self.directory, CATALOG_METRICS_FLUSH_SECONDS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+        metrics.registry.reset()
+        cache.clear()
+        language = Language.objects.create(iso_code='EN', language='English')
+        book = Book.objects.create(title='Dune', summary='Summary', isbn='1', language=language)
+        BookInstance.objects.create(book=book, status='o', due_back=datetime.date.today() - datetime.timedelta(days=1))
+        BookInstance.objects.create(book=book, status='a')
+
+    def value(self, text, series):
+        match = re.search('^' + re.escape(series) + r' (\S+)$', text, re.M)
+        return float(match.group(1)) if match else None
+
+    def test_exposition(self):
+        self.client.get(reverse('books'))
+        self.client.get(reverse('books'))
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        resp = self.client.get(reverse('metrics'))
+        self.assertEqual(resp['Content-Type'], metrics.CONTENT_TYPE)
+        text = resp.content.decode()
+        self.assertEqual(self.value(text, 'catalog_http_requests_total{view="books",method="GET",status="200"}'), 2)
+        self.assertEqual(self.value(text, 'catalog_http_request_duration_seconds_count{view="books"}'), 2)
+        self.assertEqual(self.value(text, 'catalog_http_request_duration_seconds_bucket{view="books",le="+Inf"}'), 2)
+        self.assertGreater(self.value(text, 'catalog_db_queries_total{view="books"}'), 0)
+        # El segundo index sale de la cache
+        self.assertGreater(self.value(text, 'catalog_cache_requests_total{result="hit"}'), 0)
+        self.assertGreater(self.value(text, 'catalog_cache_hit_ratio'), 0)
+        self.assertEqual(self.value(text, 'catalog_active_loans'), 1)
+        self.assertEqual(self.value(text, 'catalog_overdue_loans'), 1)
+
+    def test_sums_worker_files(self):
+        self.client.get(reverse('books'))
+        metrics.registry.flush(force=True)
+        # Otro worker con su propio fichero
+        with open(os.path.join(self.directory, 'metrics-999999.json'), 'w') as stream:
+            json.dump(metrics.registry.snapshot(), stream)
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertEqual(self.value(text, 'catalog_http_requests_total{view="books",method="GET",status="200"}'), 2)
+
+    def test_no_files_without_directory(self):
+        with override_settings(CATALOG_METRICS_DIR=''):
+            self.client.get(reverse('books'))
+            text = self.client.get(reverse('metrics')).content.decode()
+        self.assertEqual(self.value(text, 'catalog_http_requests_total{view="books",method="GET",status="200"}'), 1)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @override_settings(CATALOG_METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        resp = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(resp.status_code, 200)
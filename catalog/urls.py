@@ -1,6 +1,6 @@
 from django.conf.urls import url
 
-from . import views
+from . import async_views, views
 
 
 urlpatterns = [
@@ -9,9 +9,18 @@ urlpatterns = [
     url(r'^book/(?P<pk>\d+)$', views.BookDetailView.as_view(), name='book-detail'),
     url(r'^authors/$', views.AuthorListView.as_view(), name='authors'),#Para las vistas basadas en clases de Django, accedemos a una función de vista apropiada llamando al método de clase as_view()
     url(r'^author/(?P<pk>\d+)$', views.AuthorDetailView.as_view(), name='author-detail'),
+    url(r'^search/$', views.search, name='search'),
+    url(r'^autocomplete/$', views.autocomplete_lookup, name='autocomplete'),
     url(r'^mybooks/$', views.LoanedBooksByUserListView.as_view(), name='my-borrowed'),
     url(r'^allborrowed/$', views.AllLoanedBooksListView.as_view(), name='all-borrowed'),
     url(r'^book/(?P<pk>[-\w]+)/renew/$', views.renew_book_librarian, name='renew-book-librarian'),
+    url(r'^overdue/$', views.OverdueReportView.as_view(), name='overdue-report'),
+    url(r'^allborrowed/bulk/$', views.BulkLoanView.as_view(), name='bulk-loans'),
+    url(r'^export/(?P<dataset>\w+)\.(?P<file_format>\w+)$', views.export_dataset, name='export'),
+    url(r'^api/isbn-lookup/$', views.isbn_lookup, name='isbn-lookup'),
+    url(r'^api/stats/$', async_views.api_stats, name='api-stats'),
+    url(r'^api/(?P<resource>\w+)/$', views.api_list, name='api-list'),
+    url(r'^api/(?P<resource>\w+)/(?P<pk>[-\w]+)/$', views.api_detail, name='api-detail'),
 ]
 
 urlpatterns += [
@@ -25,6 +34,15 @@ urlpatterns += [
     url(r'^book/(?P<pk>\d+)/update/$', views.BookUpdate.as_view(), name='book_update'),
     url(r'^book/(?P<pk>\d+)/delete/$', views.BookDelete.as_view(), name='book_delete'),
 ]
+
+# Versiones asincronas de solo lectura (ASGI, ver catalog/async_views.py)
+urlpatterns += [
+    url(r'^async/$', async_views.index, name='async-index'),
+    url(r'^async/books/$', async_views.book_list, name='async-books'),
+    url(r'^async/book/(?P<pk>\d+)$', async_views.book_detail, name='async-book-detail'),
+    url(r'^async/authors/$', async_views.author_list, name='async-authors'),
+    url(r'^async/author/(?P<pk>\d+)$', async_views.author_detail, name='async-author-detail'),
+]
 """
 Reto de listar por año, mes, día pendiente
 """
@@ -1,61 +1,106 @@
 from django.shortcuts import render
 from django.views import generic
-from .models import Book, Author, Genre, BookInstance, Language
+from .models import Book, Author, BookInstance
+from .stats import get_index_stats
+from .pagination import CursorPaginationMixin
+from .search import search_books, search_authors
+from django.core.paginator import Paginator
+from django.http import JsonResponse
+from . import autocomplete, conditional, fragments
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+# Cookie firmada con el contador de visitas del index
+VISITS_COOKIE_NAME = 'num_visits'
+VISITS_COOKIE_SALT = 'catalog.index.visits'
+VISITS_COOKIE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Resultados de busqueda
+SEARCH_PAGE_SIZE = 10
+SEARCH_MAX_AUTHORS = 10
+AUTOCOMPLETE_MAX_LIMIT = 20
 
 # Create your views here.
 def index(request):
     """
     Función vista para la pagina de inicio.
     """
-    # Contadores de books y copias de books
-    num_books = Book.objects.all().count()
-    num_instances = BookInstance.objects.all().count()
-    # Obtenemos copias disponibles
-    num_instances_available = BookInstance.objects.filter(
-        status__exact='a' 
-    ).count()
-    num_authors = Author.objects.count() # .all() está implicito
-    num_genres = Genre.objects.count()
-    num_titles_search = Book.objects.filter(
-        title__icontains='harry'
-    ).count() # consultar porque no es case-sensitive si no uso la i
-    
-    # Numero de visitas a esta view, como está contado en la variable de sesión.
-    num_visits = request.session.get('num_visits', 0)
-    request.session['num_visits'] = num_visits + 1
+    # Contadores del catalogo: una sola consulta agregada, cacheada
+    # e invalidada por señales (ver catalog/stats.py)
+    stats = get_index_stats()
+    
+    # Numero de visitas a esta view, guardado en una cookie firmada.
+    # Asi una visita anonima no escribe la fila de sesion en la bbdd.
+    try:
+        num_visits = int(request.get_signed_cookie(
+            VISITS_COOKIE_NAME, default=0, salt=VISITS_COOKIE_SALT
+        ))
+    except ValueError:
+        num_visits = 0
     
     # Renderizando plantilla index.html con datos obtenidos
-    return render(
+    response = render(
         request,
         'index.html',
         context={
-            'num_books': num_books,
-            'num_instances': num_instances,
-            'num_instances_available': num_instances_available,
-            'num_authors' : num_authors,
-            'num_genres': num_genres,
-            'num_titles_search': num_titles_search,
+            'num_books': stats['num_books'],
+            'num_instances': stats['num_instances'],
+            'num_instances_available': stats['num_instances_available'],
+            'num_authors' : stats['num_authors'],
+            'num_genres': stats['num_genres'],
+            'num_titles_search': stats['num_titles_search'],
             'num_visits': num_visits
         }
     )
+    response.set_signed_cookie(
+        VISITS_COOKIE_NAME,
+        num_visits + 1,
+        salt=VISITS_COOKIE_SALT,
+        max_age=VISITS_COOKIE_MAX_AGE,
+        httponly=True,
+        samesite='Lax',
+    )
+    return response
     
-class BookListView(generic.ListView):
+@method_decorator(condition(etag_func=conditional.book_list_etag), name='dispatch')
+class BookListView(CursorPaginationMixin, generic.ListView):
     """
     Clase usada para listar todos los books
     Recordar uso de generic.ListView
     """
     model = Book
     context_object_name = 'book_list' # nombre de la variable a pasar al template
-    queryset = Book.objects.all() 
+    queryset = Book.objects.for_list()
     template_name = 'books/list.html'
     paginate_by = 5 # Paginar para solo cargar los 5 primeros records
+    cursor_ordering = ('title',) # ?cursor= para paginar por cursor
     
+@method_decorator(condition(
+    etag_func=conditional.book_etag,
+    last_modified_func=conditional.book_last_modified,
+), name='dispatch')
 class BookDetailView(generic.DetailView):
     model = Book
+    # Generos y copias se cargan dentro de los fragmentos cacheados:
+    # solo se consultan cuando hay que volver a renderizarlos
+    queryset = Book.objects.for_list()
     template_name = 'books/detail-view.html'
     context_object_name = 'book'
     
-class AuthorListView(generic.ListView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        book = self.object
+        context['copies'] = book.bookinstance_set.all()
+        context['fragment_timeout'] = fragments.timeout()
+        context['fragment_version'] = fragments.get_versions(
+            fragments.scope('book', book.pk),
+            fragments.scope('author', book.author_id),
+            fragments.GLOBAL,
+        )
+        return context
+    
+@method_decorator(condition(etag_func=conditional.author_list_etag), name='dispatch')
+class AuthorListView(CursorPaginationMixin, generic.ListView):
     """
     Clase para listar todos los autores
     """
@@ -63,8 +108,13 @@ class AuthorListView(generic.ListView):
     context_object_name = 'authors_list'
     queryset = Author.objects.all()
     paginate_by = 5
+    cursor_ordering = ('last_name', 'first_name')
     template_name = 'authors/list.html'
     
+@method_decorator(condition(
+    etag_func=conditional.author_etag,
+    last_modified_func=conditional.author_last_modified,
+), name='dispatch')
 class AuthorDetailView(generic.DetailView):
     """
     Clase para mostrar detalles de cada autor
@@ -72,12 +122,65 @@ class AuthorDetailView(generic.DetailView):
     """
     
     model = Author
+    queryset = Author.objects.all()
     context_object_name = 'author'
     template_name = 'authors/detail-view.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        author = self.object
+        # Lazy: solo se consulta si el fragmento no esta en cache
+        context['books'] = author.book_set.select_related('language')
+        context['fragment_timeout'] = fragments.timeout()
+        context['fragment_version'] = fragments.get_versions(
+            fragments.scope('author', author.pk),
+            fragments.GLOBAL,
+        )
+        return context
+
+def search(request):
+    """
+    Busqueda de libros y autores sobre el indice de texto completo
+    (ver catalog/search.py). Libros paginados por relevancia.
+    """
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search_books(query), SEARCH_PAGE_SIZE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(
+        request,
+        'search/results.html',
+        context={
+            'query': query,
+            'paginator': paginator,
+            'page_obj': page_obj,
+            'is_paginated': page_obj.has_other_pages(),
+            'book_list': page_obj.object_list,
+            'author_list': search_authors(query)[:SEARCH_MAX_AUTHORS],
+        }
+    )
+
+def autocomplete_lookup(request):
+    """
+    Sugerencias JSON de titulos y autores para escribir-y-buscar.
+    ?q=texto&kind=book|author (opcional)&limit=n
+    """
+    kind = request.GET.get('kind') or None
+    if kind is not None and kind not in autocomplete.KINDS:
+        return JsonResponse({'error': 'kind must be book or author'}, status=400)
+    try:
+        limit = min(int(request.GET.get('limit', 10)), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        limit = 10
+    results = autocomplete.lookup(request.GET.get('q', ''), kind=kind, limit=max(limit, 1))
+    return JsonResponse({'results': results})
 
 from django.contrib.auth.mixins import PermissionRequiredMixin, LoginRequiredMixin
+from django.db.models import (
+    Count, DateField, DurationField, ExpressionWrapper, Min, Value
+)
     
-class LoanedBooksByUserListView(LoginRequiredMixin, generic.ListView):
+class LoanedBooksByUserListView(LoginRequiredMixin, CursorPaginationMixin,
+                                generic.ListView):
     """
     Generic class-based for listing books on loan to current
     user. LoginRequiredMixing allows authentication
@@ -85,30 +188,62 @@ class LoanedBooksByUserListView(LoginRequiredMixin, generic.ListView):
     model = BookInstance
     template_name = 'user/borrowed_list.html'
     paginate_by = 5
+    cursor_ordering = ('due_back',)
     
     def get_queryset(self):
-        return BookInstance.objects.filter(
+        return BookInstance.objects.for_list().filter(
             borrower=self.request.user
-        ).filter(
-            status__exact='o'
-        ).order_by('due_back')
+        ).on_loan().with_overdue().order_by(*self.get_ordering())
         
-class AllLoanedBooksListView(LoginRequiredMixin,
-                             PermissionRequiredMixin, generic.ListView):
+class AllLoanedBooksListView(LoginRequiredMixin, PermissionRequiredMixin,
+                             CursorPaginationMixin, generic.ListView):
     """
     Generic class-based for listing all loaned books per person
     Required permission as a Librarian
     This will show 403 error for unathorized user
+    Paginated by cursor: deep pages cost the same as the first one
     """
     permission_required = 'catalog.can_mark_returned'
     model = BookInstance
     paginate_by = 5
     template_name = 'books/all-loaned.html'
+    cursor_ordering = ('due_back',)
+    pagination_mode = 'cursor'
+    
+    def get_queryset(self):
+        # with_overdue() usa la fecha de hoy: se construye en cada peticion
+        return BookInstance.objects.for_list().on_loan().with_overdue().order_by(
+            *self.get_ordering()
+        )
+
+class OverdueReportView(LoginRequiredMixin, PermissionRequiredMixin,
+                        generic.ListView):
+    """
+    Overdue loans grouped by borrower, computed in the database:
+    one GROUP BY over the overdue rows (status='o' AND due_back < today)
+    """
+    permission_required = 'catalog.can_mark_returned'
+    template_name = 'books/overdue-report.html'
+    context_object_name = 'borrower_list'
+    paginate_by = 20
     
     def get_queryset(self):
-        return BookInstance.objects.filter(
-            status__exact='o'
-        ).order_by('due_back')
+        today = datetime.date.today()
+        return BookInstance.objects.overdue(today).values(
+            'borrower', 'borrower__username'
+        ).annotate(
+            num_overdue=Count('id'),
+            oldest_due_back=Min('due_back'),
+            max_overdue=ExpressionWrapper(
+                Value(today, output_field=DateField()) - Min('due_back'),
+                output_field=DurationField()
+            ),
+        ).order_by('oldest_due_back', 'borrower')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['total_overdue'] = BookInstance.objects.overdue().count()
+        return context
         
 # class AllLoanedBooksListView(LoginRequiredMixin, generic.ListView):
 #     """
@@ -137,7 +272,10 @@ from django.http import HttpResponseRedirect
 from django.urls import reverse
 import datetime
 
-from .forms import RenewBookForm, RenewBookModelForm
+from .forms import RenewBookModelForm, BulkLoanForm, BookForm
+from . import loans
+from django import forms
+from django.core.exceptions import ValidationError
 
 @permission_required('catalog.can_mark_returned')
 def renew_book_librarian(request, pk):
@@ -145,7 +283,7 @@ def renew_book_librarian(request, pk):
     View function for renewing a specific BookInstance by librarian
     Using ModelForm
     """
-    book_inst=get_object_or_404(BookInstance, pk = pk)
+    book_inst=get_object_or_404(BookInstance.objects.for_list().with_overdue(), pk = pk)
 
     # If this is a POST request then process the Form data
     if request.method == 'POST':
@@ -207,6 +345,212 @@ def renew_book_librarian(request, pk):
 #         {'form': form, 'bookinst':book_inst}
 #         )
 
+class BulkLoanView(LoginRequiredMixin, PermissionRequiredMixin,
+                   CursorPaginationMixin, generic.ListView):
+    """
+    Renew or mark returned many loaned copies at once.
+    GET lists the loans (cursor paginated) with checkboxes, POST
+    applies the action with one UPDATE per outcome (see catalog/loans.py)
+    and reports the rows that failed without aborting the batch.
+    """
+    permission_required = 'catalog.can_mark_returned'
+    model = BookInstance
+    paginate_by = 50
+    template_name = 'catalog/bookinstance_bulk.html'
+    cursor_ordering = ('due_back',)
+    pagination_mode = 'cursor'
+    
+    def get_queryset(self):
+        # with_overdue() usa la fecha de hoy: se construye en cada peticion
+        return BookInstance.objects.for_list().on_loan().with_overdue().order_by(
+            *self.get_ordering()
+        )
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.setdefault('form', BulkLoanForm(initial={
+            'action': BulkLoanForm.RENEW,
+            'due_back': datetime.date.today() + datetime.timedelta(weeks=3),
+        }))
+        return context
+    
+    def post(self, request, *args, **kwargs):
+        form = BulkLoanForm(request.POST)
+        result = None
+        if form.is_valid():
+            pks = request.POST.getlist('ids')
+            if form.cleaned_data['action'] == BulkLoanForm.RENEW:
+                result = loans.bulk_renew(
+                    pks, form.cleaned_data['due_back'], self.get_row_dates(pks)
+                )
+            else:
+                result = loans.bulk_return(pks)
+        self.object_list = self.get_queryset()
+        return self.render_to_response(
+            self.get_context_data(form=form, result=result)
+        )
+    
+    def get_row_dates(self, pks):
+        """
+        Optional per-row renewal dates (due_back_<id>). An unparseable
+        date is passed as None so that row fails in bulk_renew.
+        """
+        field = forms.DateField()
+        dates = {}
+        for pk in pks:
+            value = self.request.POST.get(f'due_back_{pk}')
+            if not value:
+                continue
+            try:
+                key = BookInstance._meta.pk.to_python(pk)
+            except ValidationError:
+                continue # bulk_renew reports the invalid id
+            try:
+                dates[key] = field.clean(value)
+            except ValidationError:
+                dates[key] = None
+        return dates
+
+"""
+Exportaciones en streaming (CSV / NDJSON)
+"""
+from django.http import StreamingHttpResponse, Http404
+from . import exports
+
+@permission_required('catalog.can_mark_returned')
+def export_dataset(request, dataset, file_format):
+    """
+    Streams a whole dataset (books, copies or loans) without
+    loading it in memory. See catalog/exports.py
+    """
+    if dataset not in exports.DATASETS or file_format not in exports.FORMATS:
+        raise Http404('Unknown export')
+    response = StreamingHttpResponse(
+        exports.in_own_thread(exports.iter_lines(dataset, file_format)),
+        content_type=exports.FORMATS[file_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{dataset}.{file_format}"'
+    )
+    return response
+
+"""
+API JSON de solo lectura (ver catalog/api.py)
+"""
+from . import api
+
+# JSON compacto: sin espacios
+API_JSON_PARAMS = {'separators': (',', ':')}
+
+def _api_error(message, status=400):
+    return JsonResponse({'error': message}, status=status, json_dumps_params=API_JSON_PARAMS)
+
+def _cursor_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return f'{request.path}?{params.urlencode()}'
+
+def api_list(request, resource):
+    """
+    Paginated list of a catalog resource, see catalog/api.py
+    """
+    if resource not in api.RESOURCES:
+        return _api_error('Unknown resource', status=404)
+    try:
+        results, next_cursor, previous_cursor = api.list_objects(
+            api.RESOURCES[resource], request.GET
+        )
+    except api.ApiError as exc:
+        return _api_error(str(exc))
+    return JsonResponse({
+        'results': results,
+        'next': _cursor_url(request, next_cursor),
+        'previous': _cursor_url(request, previous_cursor),
+    }, json_dumps_params=API_JSON_PARAMS)
+
+def api_detail(request, resource, pk):
+    if resource not in api.RESOURCES:
+        return _api_error('Unknown resource', status=404)
+    try:
+        data = api.get_object(api.RESOURCES[resource], pk, request.GET)
+    except api.ApiError as exc:
+        return _api_error(str(exc))
+    if data is None:
+        return _api_error('Not found', status=404)
+    return JsonResponse(data, json_dumps_params=API_JSON_PARAMS)
+
+import json
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from .isbn import normalize as normalize_isbn
+
+# Maximo de ISBN por peticion de isbn_lookup
+ISBN_LOOKUP_MAX = 5000
+
+@csrf_exempt
+@require_POST
+def isbn_lookup(request):
+    """
+    Resolves many ISBNs (any ISBN-10/13 format) in one call.
+    POST {"isbns": [...]} -> one result per ISBN, in the same order,
+    with the book id, title and availability (or null)
+    """
+    try:
+        isbns = json.loads(request.body)['isbns']
+    except (ValueError, KeyError, TypeError):
+        return _api_error('Expected a JSON body {"isbns": [...]}')
+    maximum = getattr(settings, 'CATALOG_ISBN_LOOKUP_MAX', ISBN_LOOKUP_MAX)
+    if not isinstance(isbns, list) or not all(isinstance(isbn, str) for isbn in isbns):
+        return _api_error('isbns must be a list of strings')
+    if len(isbns) > maximum:
+        return _api_error(f'At most {maximum} ISBNs per request')
+    books = Book.objects.only(
+        'id', 'title', 'isbn_normalized', 'copies_available', 'copies_on_loan',
+        'copies_maintenance', 'copies_reserved', 'next_due_back',
+    ).lookup_isbns(isbns)
+    results = []
+    for isbn in isbns:
+        code = normalize_isbn(isbn)
+        book = books.get(code)
+        results.append({
+            'isbn': isbn,
+            'normalized': code,
+            'book': book and {
+                'id': book.pk,
+                'title': book.title,
+                'url': book.get_absolute_url(),
+                'copies_available': book.copies_available,
+                'copies_total': book.copies_total,
+                'next_due_back': book.next_due_back,
+            },
+        })
+    return JsonResponse({
+        'results': results,
+        'found': sum(1 for row in results if row['book']),
+    }, json_dumps_params=API_JSON_PARAMS)
+
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from . import metrics as catalog_metrics
+
+def metrics(request):
+    """
+    Prometheus metrics of every worker process, see catalog/metrics.py
+    """
+    token = getattr(settings, 'CATALOG_METRICS_TOKEN', '')
+    if token and not constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    # El proceso que responde vuelca antes lo suyo
+    catalog_metrics.registry.flush(force=True)
+    return HttpResponse(
+        catalog_metrics.render(catalog_metrics.merged(), catalog_metrics.loan_counts()),
+        content_type=catalog_metrics.CONTENT_TYPE,
+    )
+
 """
 Generic Editing Views
 """
@@ -240,13 +584,13 @@ Falta agregar en la lista de autores links a: Crear, editar, eliminar
 class BookCreate(LoginRequiredMixin,PermissionRequiredMixin, CreateView):
     permission_required = 'catalog.can_mark_returned'
     model = Book
-    fields = '__all__'
+    form_class = BookForm
     
     
 class BookUpdate(LoginRequiredMixin,PermissionRequiredMixin,UpdateView):
     permission_required = 'catalog.can_mark_returned'
     model = Book
-    fields = '__all__'
+    form_class = BookForm
     
     
 class BookDelete(LoginRequiredMixin,PermissionRequiredMixin,DeleteView):
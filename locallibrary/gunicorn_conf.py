@@ -0,0 +1,60 @@
+"""
+Configuracion de gunicorn (ver Procfile). Por defecto sirve la
+aplicacion WSGI con workers sync:
+
+    gunicorn locallibrary.wsgi -c locallibrary/gunicorn_conf.py
+
+ASGI es opcional: con workers de uvicorn (requirements-asgi.txt) y la
+aplicacion ASGI. El -k de la linea de comandos manda sobre este
+fichero:
+
+    gunicorn locallibrary.asgi:application -c locallibrary/gunicorn_conf.py \
+        -k uvicorn.workers.UvicornWorker
+
+Con ASGI cada worker es un bucle de eventos: las vistas asincronas
+(catalog/async_views.py) atienden muchas conexiones a la vez y
+esperan a la bbdd en su pool de hilos (CATALOG_ASYNC_DB_THREADS).
+Las vistas sincronas siguen funcionando, una a la vez por worker.
+Las exportaciones en streaming generan sus lineas en un hilo propio
+(ver catalog/exports.py).
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+worker_class = 'sync'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+bind = '0.0.0.0:' + os.environ.get('PORT', '8000')
+keepalive = 5
+timeout = 30
+graceful_timeout = 30
+accesslog = '-'
+errorlog = '-'
+
+
+# Directorio de metricas creado para este arranque (ver on_starting)
+temporary_metrics_dir = None
+
+
+def on_starting(server):
+    """
+    Directorio de las metricas de los workers (ver catalog/metrics.py):
+    el de CATALOG_METRICS_DIR, vaciado, o uno temporal para este
+    arranque que se borra al parar. Se fija antes de cargar settings
+    y los workers lo heredan.
+    """
+    global temporary_metrics_dir
+    if not os.environ.get('CATALOG_METRICS_DIR'):
+        temporary_metrics_dir = tempfile.mkdtemp(prefix='locallibrary-metrics-')
+        os.environ['CATALOG_METRICS_DIR'] = temporary_metrics_dir
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'locallibrary.settings')
+    django.setup()
+    from catalog import metrics
+    metrics.clear_store()
+
+
+def on_exit(server):
+    if temporary_metrics_dir:
+        shutil.rmtree(temporary_metrics_dir, ignore_errors=True)
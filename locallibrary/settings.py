@@ -47,7 +47,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Metricas de /metrics (ver catalog/metrics.py)
+    'catalog.metrics.MetricsMiddleware',
+    'catalog.middleware.AsyncWhiteNoiseMiddleware',
+    'catalog.routers.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,11 +59,19 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Perfilado por peticion con Server-Timing (ver catalog/profiling.py).
+# Fraccion de peticiones medidas, de 0 (desactivado) a 1
+CATALOG_PROFILING_SAMPLE_RATE = float(os.environ.get('CATALOG_PROFILING_SAMPLE_RATE', 0))
+if CATALOG_PROFILING_SAMPLE_RATE > 0:
+    # Justo despues de SecurityMiddleware: mide el resto de la pila
+    MIDDLEWARE.insert(1, 'catalog.profiling.ProfilingMiddleware')
+
 ROOT_URLCONF = 'locallibrary.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que ademas mide el render (catalog/profiling.py)
+        'BACKEND': 'catalog.profiling.ProfilingDjangoTemplates',
         'DIRS': [
             # os.path.join(BASE_DIR, 'templates'),
             './templates',
@@ -87,9 +98,26 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Conexion persistente: los PRAGMA se aplican una vez por proceso
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_SQLITE_CONN_MAX_AGE', 600)),
     }
 }
 
+# PRAGMAs de cada conexion SQLite (ver catalog/sqlite.py).
+# 'stock' deja los valores por defecto de SQLite (journal DELETE,
+# synchronous FULL); 'wal' es el perfil para varios workers.
+SQLITE_PROFILES = {
+    'stock': {},
+    'wal': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'busy_timeout': 5000,
+        'cache_size': -20000,
+        'mmap_size': 134217728,
+    },
+}
+SQLITE_PRAGMAS = SQLITE_PROFILES[os.environ.get('DJANGO_SQLITE_PROFILE', 'wal')]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -137,6 +165,120 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Redirect to home URL after login (Default redirects to /accounts/profile/)
 LOGIN_REDIRECT_URL = '/'
 
+# Los tests usan una cache en un directorio temporal
+TEST_RUNNER = 'catalog.tests.runner.CatalogTestRunner'
+
+# Cache compartida por defecto: ficheros en disco, que ven todos los
+# workers de la maquina (con varias maquinas, memcached o redis):
+#   DJANGO_CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache
+#   DJANGO_CACHE_LOCATION=127.0.0.1:11211
+# LocMemCache es de cada proceso: una invalidacion solo llega al
+# worker que la hace, asi que con ella no se cachean fragmentos.
+# MeteredCache delega en OPTIONS['BACKEND'] y cuenta aciertos y fallos
+# para /metrics (ver catalog/metrics.py)
+CACHE_BACKEND = os.environ.get(
+    'DJANGO_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'
+)
+CATALOG_SHARED_CACHE = CACHE_BACKEND != 'django.core.cache.backends.locmem.LocMemCache'
+CACHES = {
+    'default': {
+        'BACKEND': 'catalog.metrics.MeteredCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', str(BASE_DIR / 'cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'BACKEND': CACHE_BACKEND,
+            'MAX_ENTRIES': int(os.environ.get('DJANGO_CACHE_MAX_ENTRIES', 10000)),
+        },
+    }
+}
+
+# Perfiles de sesion. Por defecto db. cached_db lee la sesion de la
+# cache y solo escribe en la bbdd cuando cambia; exige una cache
+# compartida: con una de cada proceso, un logout o un cycle_key en un
+# worker no llegaria a los demas, que seguirian leyendo la sesion
+# antigua. 'cookie' guarda la sesion firmada en el navegador (sin tabla).
+SESSION_PROFILES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_PROFILE = os.environ.get('DJANGO_SESSION_PROFILE', 'db')
+if SESSION_PROFILE == 'cached_db' and not CATALOG_SHARED_CACHE:
+    from django.core.exceptions import ImproperlyConfigured
+    raise ImproperlyConfigured(
+        'DJANGO_SESSION_PROFILE=cached_db needs a shared cache (not LocMemCache)'
+    )
+SESSION_ENGINE = SESSION_PROFILES[SESSION_PROFILE]
+
+# Metricas de Prometheus en /metrics (ver catalog/metrics.py). Cada
+# proceso vuelca sus contadores a un fichero de este directorio, que
+# debe ser propio del despliegue. Sin el no se escribe nada y /metrics
+# solo cuenta su proceso; gunicorn crea uno temporal si falta
+CATALOG_METRICS_DIR = os.environ.get('CATALOG_METRICS_DIR', '')
+CATALOG_METRICS_FLUSH_SECONDS = float(os.environ.get('CATALOG_METRICS_FLUSH_SECONDS', 1))
+# Si se define, /metrics exige "Authorization: Bearer <token>"
+CATALOG_METRICS_TOKEN = os.environ.get('CATALOG_METRICS_TOKEN', '')
+
+# Segundos que se guardan los fragmentos de las fichas de libro y
+# autor (se invalidan antes por version, ver catalog/fragments.py).
+# Sin cache compartida no se guardan
+CATALOG_FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('CATALOG_FRAGMENT_CACHE_TIMEOUT', 3600))
+
+# Permisos resueltos de cada usuario en la cache compartida
+# (ver catalog/backends.py). Con una cache de cada proceso quitar un
+# permiso solo se notaria en un worker: se usa ModelBackend
+AUTHENTICATION_BACKENDS = [
+    'catalog.backends.CachedModelBackend' if CATALOG_SHARED_CACHE
+    else 'django.contrib.auth.backends.ModelBackend'
+]
+CATALOG_PERMISSION_CACHE_TIMEOUT = int(os.environ.get('CATALOG_PERMISSION_CACHE_TIMEOUT', 300))
+
+# Hilos de los pools de bbdd y cache de las vistas asincronas
+# (ver catalog/async_views.py), por proceso
+CATALOG_ASYNC_DB_THREADS = int(os.environ.get('CATALOG_ASYNC_DB_THREADS', 8))
+CATALOG_ASYNC_CACHE_THREADS = int(os.environ.get('CATALOG_ASYNC_CACHE_THREADS', 4))
+
+# Segundos que se cachean los contadores de la pagina de inicio
+CATALOG_STATS_CACHE_TIMEOUT = int(os.environ.get('CATALOG_STATS_CACHE_TIMEOUT', 60))
+
+# Filas por pagina de la API JSON (ver catalog/api.py)
+CATALOG_API_PAGE_SIZE = int(os.environ.get('CATALOG_API_PAGE_SIZE', 50))
+CATALOG_API_MAX_PAGE_SIZE = int(os.environ.get('CATALOG_API_MAX_PAGE_SIZE', 200))
+# ISBN por peticion de /catalog/api/isbn-lookup/
+CATALOG_ISBN_LOOKUP_MAX = int(os.environ.get('CATALOG_ISBN_LOOKUP_MAX', 5000))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Una linea JSON por peticion perfilada
+        'catalog.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Registro de consultas por huella y consultas lentas con EXPLAIN
+# (ver catalog/querylog.py y `manage.py query_report`)
+CATALOG_QUERY_LOG = bool(int(os.environ.get('CATALOG_QUERY_LOG', 0)))
+CATALOG_QUERY_LOG_FILE = os.environ.get('CATALOG_QUERY_LOG_FILE', str(BASE_DIR / 'queries.log'))
+CATALOG_QUERY_LOG_SLOW_MS = float(os.environ.get('CATALOG_QUERY_LOG_SLOW_MS', 100))
+CATALOG_QUERY_LOG_FLUSH_SECONDS = int(os.environ.get('CATALOG_QUERY_LOG_FLUSH_SECONDS', 60))
+if CATALOG_QUERY_LOG:
+    MIDDLEWARE.insert(1, 'catalog.querylog.QueryLogMiddleware')
+    # Con varios workers conviene un fichero por proceso: la rotacion
+    # no se coordina entre procesos
+    LOGGING['handlers']['querylog'] = {
+        'class': 'logging.handlers.RotatingFileHandler',
+        'filename': CATALOG_QUERY_LOG_FILE,
+        'maxBytes': 10 * 1024 * 1024,
+        'backupCount': 5,
+    }
+    LOGGING['loggers']['catalog.querylog'] = {
+        'handlers': ['querylog'], 'level': 'INFO', 'propagate': False,
+    }
+
 # Allow email testing
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
@@ -146,6 +288,22 @@ import dj_database_url
 db_from_env = dj_database_url.config(conn_max_age=500)
 DATABASES['default'].update(db_from_env)
 
+# Replicas de lectura (ver catalog/routers.py), separadas por comas:
+#   DATABASE_REPLICA_URLS=postgres://replica1/...,postgres://replica2/...
+# En local sirve otro fichero SQLite copiado con `manage.py sync_replica`:
+#   DATABASE_REPLICA_URLS=sqlite:///db-replica.sqlite3
+# En los tests las replicas apuntan a la bbdd de test de default.
+CATALOG_READ_REPLICAS = []
+for num, url in enumerate(filter(None, (
+        url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')))):
+    alias = f'replica{num + 1}'
+    DATABASES[alias] = dj_database_url.parse(url, conn_max_age=500)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    CATALOG_READ_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['catalog.routers.ReplicaRouter']
+# Segundos que se leen del primario tras una escritura
+CATALOG_REPLICA_PIN_SECONDS = int(os.environ.get('CATALOG_REPLICA_PIN_SECONDS', 15))
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/1.10/howto/static-files/
 
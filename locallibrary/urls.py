@@ -19,10 +19,11 @@ from django.urls import path
 from django.urls import include
 #Add URL maps to redirect the base URL to our application
 from django.views.generic import RedirectView
+from catalog import views as catalog_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    
+    path('metrics', catalog_views.metrics, name='metrics'),
 ]
 
 urlpatterns += [